@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Benchmark of the energy gate: inference skipped and detection changes
+
+Replays each wav through a VADHandler (inline inference, as the server runs it) with
+and without the energy gate and reports the fraction of frames that skipped inference,
+the processing time, and how the speech_start / speech_end events differ: their number,
+and the fraction of frames labelled speech or non-speech the same by both runs.
+
+The gate holds the model's recurrent state over skipped frames, so frames after them
+see a slightly different state. Decisions close to the threshold can flip, which is
+the same sensitivity the model has to any change in preceding audio (compare the
+events of a wav as is and as a call without the gate).
+
+Every wav is replayed as is and as a "call": with `--listen-s` seconds of background
+noise at `--noise-db` dBFS before it, like a user listening to the agent before
+answering, which is where the gate saves the most.
+
+Usage: python bench_gate.py [--wavs silero/en.wav silero/test1.wav] [--seconds 60]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import wave
+
+import numpy as np
+
+import vad_server
+from resampler import PolyphaseResampler
+from silero.utils_vad import load_silero_vad_onnx
+
+logger = logging.getLogger('bench_gate')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MESSAGE_SECONDS = 0.1
+
+
+def read_wav(path, seconds):
+    """int16 samples of the first `seconds` of a mono wav, at 16kHz"""
+    with wave.open(path) as f:
+        rate = f.getframerate()
+        # read a fixed amount rather than trusting the header's frame count
+        audio = np.frombuffer(f.readframes(int(seconds * rate)), dtype=np.int16)
+    if rate != vad_server.SAMPLING_RATE:
+        resampler = PolyphaseResampler(rate, vad_server.SAMPLING_RATE)
+        audio = np.concatenate([resampler.process(audio), resampler.flush()])
+    return audio
+
+
+def with_listening(audio, listen_s, noise_db, seed=0):
+    noise = np.random.default_rng(seed).standard_normal(int(listen_s * vad_server.SAMPLING_RATE))
+    noise *= 32768 * 10 ** (noise_db / 20)
+    return np.concatenate([noise.astype(np.int16), audio])
+
+
+def replay(model, audio, gate_options):
+    """(events, frames, gated frames, seconds spent) of one replay through a VADHandler"""
+    vad_server.energy_gate_options = gate_options
+    handler = vad_server.VADHandler(model.new_numpy_stream(vad_server.SAMPLING_RATE))
+    step = int(MESSAGE_SECONDS * vad_server.SAMPLING_RATE) * 2
+    data = audio.tobytes()
+
+    events = []
+    started = time.perf_counter()
+    for i in range(0, len(data), step):
+        events.extend((e['type'], e['sample']) for e in handler.process_audio(data[i:i + step]))
+    elapsed = time.perf_counter() - started
+
+    gated = handler.energy_gate.skipped_frames if handler.energy_gate else 0
+    return events, handler.frames_processed, gated, elapsed
+
+
+def speech_frames(events, num_frames):
+    """Boolean speech label of every frame, from speech_start / speech_end events"""
+    labels = np.zeros(num_frames, dtype=bool)
+    start = None
+    for kind, sample in events:
+        if kind == 'speech_start':
+            start = sample // vad_server.CHUNK_SIZE
+        elif start is not None:
+            labels[start:sample // vad_server.CHUNK_SIZE] = True
+            start = None
+    if start is not None:
+        labels[start:] = True
+    return labels
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Energy gate benchmark")
+    parser.add_argument('--wavs', nargs='+',
+                        default=[os.path.join(HERE, 'silero', 'en.wav'), os.path.join(HERE, 'silero', 'test1.wav')])
+    parser.add_argument('--seconds', type=float, default=60.0, help="Audio replayed from each wav")
+    parser.add_argument('--listen-s', type=float, default=20.0,
+                        help="Background noise before the speech in the call variant")
+    parser.add_argument('--noise-db', type=float, default=-60.0, help="Level of that noise in dBFS")
+    parser.add_argument('--margin-db', type=float, default=10.0)
+    parser.add_argument('--max-db', type=float, default=-45.0)
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--output', default=None, help="Also write the results as JSON to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logging.getLogger('vad_server').setLevel(logging.WARNING)
+    model = load_silero_vad_onnx(args.model_path)
+    gate_options = {'margin_db': args.margin_db, 'max_db': args.max_db}
+
+    results = []
+    for path in args.wavs:
+        audio = read_wav(path, args.seconds)
+        for variant, samples in [('as is', audio), ('call', with_listening(audio, args.listen_s, args.noise_db))]:
+            reference, frames, _, baseline_s = replay(model, samples, None)
+            events, _, gated, gated_s = replay(model, samples, gate_options)
+            agreement = (speech_frames(reference, frames) == speech_frames(events, frames)).mean()
+            result = {
+                'wav': os.path.basename(path),
+                'variant': variant,
+                'audio_s': round(len(samples) / vad_server.SAMPLING_RATE, 1),
+                'frames': frames,
+                'skipped_fraction': round(gated / frames, 3),
+                'time_s': round(baseline_s, 3),
+                'gated_time_s': round(gated_s, 3),
+                'events': len(reference),
+                'gated_events': len(events),
+                'speech_agreement': round(float(agreement), 4),
+            }
+            results.append(result)
+            logger.info(f"{result['wav']} ({variant}, {result['audio_s']}s): skipped {result['skipped_fraction']:.1%} "
+                        f"of {frames} frames, {baseline_s:.2f}s -> {gated_s:.2f}s, "
+                        f"{len(reference)} -> {len(events)} events, {agreement:.2%} of frames labelled the same")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
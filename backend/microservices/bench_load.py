@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""Real-time load test of the VAD websocket server
+
+For every client count, starts vad_server.py on its own port, then opens that many
+connections which replay the bundled en.wav / test1.wav (round robin) in 100ms int16
+chunks at real-time pace, like AudioProcessor.receiveRawAudioChunk. Every replay ends
+with a reset, and the audio is replayed until --duration-s is over.
+
+Recorded per client count:
+- connect latency (connect until connection_ready)
+- speech_start / speech_end latency, from the moment the audio deciding the event was
+  captured (the end of the event's frame, on a clock where the 100ms chunk is sent as
+  soon as it is complete) until the event is received. `send` latencies are measured
+  from sending the chunk completing that frame instead, i.e. without the chunking delay
+- events compared against an offline replay of the same audio through a VADHandler,
+  configured from the server arguments (--max-speech-s, --energy-gate ...) like the server
+- CPU and RSS of the server process tree (Linux /proc), total and per stream
+- how late the harness itself sent chunks, results are only meaningful while it is low
+
+Results are written as JSON. Arguments not known to this script are passed to the server.
+
+Usage: python bench_load.py --clients 1 10 50 [--duration-s 60] [-o results.json] [--max-batch-size 8 ...]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+import wave
+
+import numpy as np
+import websockets
+
+import vad_server
+from resampler import PolyphaseResampler
+from silero.utils_vad import load_silero_vad_onnx
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stderr)]
+)
+logger = logging.getLogger(__name__)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_AUDIO = [os.path.join(HERE, 'silero', 'en.wav'), os.path.join(HERE, 'silero', 'test1.wav')]
+
+SAMPLING_RATE = 16000
+FRAME_SIZE = 512
+CHUNK_SECONDS = 0.1
+CHUNK_SAMPLES = int(SAMPLING_RATE * CHUNK_SECONDS)
+
+
+def load_pcm16k(path):
+    """int16 mono samples of a 16-bit PCM wav, resampled to 16kHz"""
+    with wave.open(path) as f:
+        channels, sample_width, rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+        data = f.readframes(f.getnframes())
+    if sample_width != 2:
+        raise ValueError(f"{path}: only 16-bit PCM is supported")
+
+    audio = np.frombuffer(data, dtype=np.int16)
+    if channels > 1:
+        audio = audio[:len(audio) // channels * channels].reshape(-1, channels).mean(axis=1)
+        audio = np.clip(np.round(audio), -32768, 32767).astype(np.int16)
+    if rate != SAMPLING_RATE:
+        resampler = PolyphaseResampler(rate, SAMPLING_RATE)
+        audio = np.concatenate([resampler.process(audio), resampler.flush()])
+    return audio
+
+
+def expected_events(model, audio):
+    """(type, frame, sample) of the events the server should send for `audio`
+
+    The audio goes through a VADHandler in the clients' 100ms chunks, so it must be
+    configured like the server first (see main).
+    """
+    handler = vad_server.VADHandler(model.new_numpy_stream(SAMPLING_RATE))
+    step = CHUNK_SAMPLES * 2
+    data = audio.tobytes()
+    events = []
+    for i in range(0, len(data), step):
+        events.extend((e['type'], e['frame'], e['sample']) for e in handler.process_audio(data[i:i + step])
+                      if e['type'] in ('speech_start', 'speech_end'))
+    return events
+
+
+def percentiles(values):
+    """p50 / p95 / p99 / max of seconds, in milliseconds"""
+    if not values:
+        return None
+    values = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'count': len(values), 'p50': round(p50, 2), 'p95': round(p95, 2),
+            'p99': round(p99, 2), 'max': round(float(values.max()), 2)}
+
+
+class ProcessTree:
+    """CPU time and RSS of a process and all its descendants, read from /proc"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf('SC_CLK_TCK')
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+
+    def _pids(self):
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+        pids, todo = [], [self.pid]
+        while todo:
+            pid = todo.pop()
+            pids.append(pid)
+            todo.extend(children.get(pid, []))
+        return pids
+
+    def usage(self):
+        """(cpu seconds, rss bytes)"""
+        cpu, rss = 0.0, 0
+        for pid in self._pids():
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                with open(f'/proc/{pid}/statm') as f:
+                    resident = int(f.read().split()[1])
+            except (OSError, IndexError, ValueError):
+                continue  # exited meanwhile
+            cpu += (int(fields[11]) + int(fields[12])) / self.ticks  # utime + stime
+            rss += resident * self.page_size
+        return cpu, rss
+
+
+class ClientStats:
+    def __init__(self):
+        self.connect = []
+        self.latency = {'speech_start': [], 'speech_end': []}
+        self.send_latency = {'speech_start': [], 'speech_end': []}
+        self.send_lag = []
+        self.expected_events = 0
+        self.received_events = 0
+        self.mismatched_replays = 0
+        self.replays = 0
+        self.errors = []
+
+
+async def run_client(url, audio, expected, duration_s, start_delay, stats):
+    await asyncio.sleep(start_delay)
+    started = time.perf_counter()
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.recv()  # connection_ready
+        stats.connect.append(time.perf_counter() - started)
+
+        events = []
+        reset_ack = asyncio.Event()
+
+        async def receive():
+            async for message in ws:
+                received = time.perf_counter()
+                message = json.loads(message)
+                if isinstance(message, dict) and message.get('type') == 'reset_ack':
+                    reset_ack.set()
+                    continue
+                if isinstance(message, dict) and 'error' in message:
+                    stats.errors.append(message['error'])
+                    continue
+                for event in message if isinstance(message, list) else [message]:
+                    if event.get('type') in stats.latency:
+                        events.append((event['type'], event['frame'], event['sample'], received))
+
+        receiver = asyncio.create_task(receive())
+        deadline = time.perf_counter() + duration_s
+        finished = False
+        try:
+            while not finished and time.perf_counter() < deadline:
+                events.clear()
+                reset_ack.clear()
+
+                # chunk k is complete (and sent) at t0 + k * CHUNK_SECONDS
+                t0 = time.perf_counter()
+                send_times = []
+                for k in range(0, -(-len(audio) // CHUNK_SAMPLES)):
+                    target = t0 + k * CHUNK_SECONDS
+                    if target >= deadline:
+                        finished = True
+                        break
+                    await asyncio.sleep(max(0.0, target - time.perf_counter()))
+                    now = time.perf_counter()
+                    stats.send_lag.append(now - target)
+                    await ws.send(audio[k * CHUNK_SAMPLES:(k + 1) * CHUNK_SAMPLES].tobytes())
+                    send_times.append(now)
+
+                await ws.send(json.dumps({'type': 'reset'}))
+                await asyncio.wait_for(reset_ack.wait(), timeout=30)
+
+                # audio sample p was captured at t0 - CHUNK_SECONDS + p / SAMPLING_RATE
+                sent_samples = min(len(audio), len(send_times) * CHUNK_SAMPLES)
+                want = [e for e in expected if (e[1] + 1) * FRAME_SIZE <= sent_samples]
+                got = [e[:3] for e in events]
+                stats.replays += 1
+                stats.expected_events += len(want)
+                stats.received_events += len(got)
+                if got != want:
+                    stats.mismatched_replays += 1
+
+                for kind, frame, _, received in events:
+                    frame_end = (frame + 1) * FRAME_SIZE
+                    stats.latency[kind].append(received - (t0 - CHUNK_SECONDS + frame_end / SAMPLING_RATE))
+                    chunk = (frame_end - 1) // CHUNK_SAMPLES
+                    if chunk < len(send_times):
+                        stats.send_latency[kind].append(received - send_times[chunk])
+        finally:
+            receiver.cancel()
+
+
+async def run_clients(url, audios, num_clients, duration_s, ramp_s):
+    stats = ClientStats()
+    tasks = [
+        run_client(url, *audios[i % len(audios)], duration_s, ramp_s * i / max(1, num_clients), stats)
+        for i in range(num_clients)
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    stats.errors.extend(f"{type(r).__name__}: {r}" for r in results if isinstance(r, Exception))
+    return stats
+
+
+def start_server(port, server_args):
+    process = subprocess.Popen([sys.executable, os.path.join(HERE, 'vad_server.py'), '--port', str(port), *server_args],
+                               cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f'http://localhost:{port}/ready', timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            pass
+        time.sleep(0.25)
+    process.kill()
+    raise RuntimeError("Server didn't become ready in time")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_level(num_clients, audios, args, server_args):
+    url = args.url
+    process = tree = None
+    if not url:
+        process = start_server(args.port, server_args)
+        tree = ProcessTree(process.pid)
+        url = f'ws://localhost:{args.port}/'
+
+    try:
+        idle_rss = tree.usage()[1] if tree else None
+        peak_rss = idle_rss
+
+        async def measure():
+            nonlocal peak_rss
+            cpu_start, wall_start = (tree.usage()[0] if tree else 0.0), time.perf_counter()
+            clients = asyncio.create_task(run_clients(url, audios, num_clients, args.duration_s, args.ramp_s))
+            while not clients.done():
+                await asyncio.wait([clients], timeout=1.0)
+                if tree:
+                    peak_rss = max(peak_rss, tree.usage()[1])
+            cpu_end, wall_end = (tree.usage()[0] if tree else 0.0), time.perf_counter()
+            return clients.result(), cpu_end - cpu_start, wall_end - wall_start
+
+        stats, cpu_seconds, wall_seconds = asyncio.run(measure())
+    finally:
+        if process:
+            stop_server(process)
+
+    result = {
+        'clients': num_clients,
+        'duration_s': args.duration_s,
+        'connect_ms': percentiles(stats.connect),
+        'speech_start_ms': percentiles(stats.latency['speech_start']),
+        'speech_end_ms': percentiles(stats.latency['speech_end']),
+        'speech_start_send_ms': percentiles(stats.send_latency['speech_start']),
+        'speech_end_send_ms': percentiles(stats.send_latency['speech_end']),
+        'events': {'expected': stats.expected_events, 'received': stats.received_events,
+                   'replays': stats.replays, 'mismatched_replays': stats.mismatched_replays},
+        'client_send_lag_ms': percentiles(stats.send_lag),
+        'errors': stats.errors[:10],
+        'error_count': len(stats.errors),
+    }
+    if tree:
+        cpu_percent = 100 * cpu_seconds / wall_seconds
+        result['server'] = {
+            'cpu_percent': round(cpu_percent, 1),
+            'cpu_percent_per_stream': round(cpu_percent / num_clients, 3),
+            'rss_mb_idle': round(idle_rss / 2**20, 1),
+            'rss_mb_peak': round(peak_rss / 2**20, 1),
+            'rss_mb_per_stream': round((peak_rss - idle_rss) / 2**20 / num_clients, 3),
+        }
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Real-time load test of the VAD websocket server, "
+                                                 "other arguments are passed to vad_server.py")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 50],
+                        help="Concurrent clients of each run")
+    parser.add_argument('--duration-s', type=float, default=60, help="Audio replayed by each client per run")
+    parser.add_argument('--ramp-s', type=float, default=2.0, help="Clients start spread over this time")
+    parser.add_argument('--audio', nargs='+', default=DEFAULT_AUDIO, help="16-bit PCM wav files to replay")
+    parser.add_argument('--port', type=int, default=8799, help="Port of the server started for each run")
+    parser.add_argument('--url', default=None,
+                        help="Test an already running server instead (no CPU / RSS measurements)")
+    parser.add_argument('--max-p99-ms', type=float, default=None,
+                        help="Report the most clients keeping speech_end p99 latency under this")
+    parser.add_argument('-o', '--output', default=None, help="JSON results file (default: stdout)")
+    return parser.parse_known_args()
+
+
+def main():
+    args, server_args = parse_args()
+
+    # the reference replay detects speech with the server's model and options, e.g. segments
+    # split at --max-speech-s or quiet frames skipped by --energy-gate
+    server_options = vad_server.build_parser().parse_known_args(server_args)[0]
+    vad_server.configure_streams(server_options)
+    model = load_silero_vad_onnx(server_options.model_path)
+    audios = []
+    for path in args.audio:
+        audio = load_pcm16k(path)
+        audios.append((audio, expected_events(model, audio)))
+    logger.info(f"Replaying {', '.join(os.path.basename(p) for p in args.audio)}, server args: {server_args}")
+
+    results = []
+    for num_clients in args.clients:
+        logger.info(f"{num_clients} clients for {args.duration_s:.0f}s")
+        result = run_level(num_clients, audios, args, server_args)
+        results.append(result)
+        end, server = result['speech_end_ms'] or {}, result.get('server', {})
+        logger.info(f"{num_clients} clients: speech_end p50 {end.get('p50')}ms p99 {end.get('p99')}ms, "
+                    f"{result['events']['mismatched_replays']} mismatched replays, "
+                    f"cpu {server.get('cpu_percent')}%, rss {server.get('rss_mb_peak')}MB")
+
+    report = {'server_args': server_args, 'audio': args.audio, 'results': results}
+    if args.max_p99_ms is not None:
+        within = [r['clients'] for r in results
+                  if r['speech_end_ms'] and r['speech_end_ms']['p99'] <= args.max_p99_ms
+                  and not r['events']['mismatched_replays'] and not r['error_count']]
+        report['max_p99_ms'] = args.max_p99_ms
+        report['max_clients_within_slo'] = max(within, default=0)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Cold start benchmark of the VAD server runtime
+
+Every run is a fresh interpreter that imports the server modules, loads the onnx model and
+runs a first inference, reporting the time of each step and the peak RSS of the process.
+The "torch" variant imports torch and torchaudio first, which is what every server (and
+process pool worker) paid when they were imported at module level.
+
+Usage: python bench_startup.py [--runs 5] [--model-path silero_vad.onnx]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in the child interpreter, prints one JSON line
+CHILD = r'''
+import json, resource, sys, time
+started = time.perf_counter()
+if {with_torch}:
+    import torch, torchaudio
+imported_torch = time.perf_counter()
+
+import numpy as np
+import vad_server
+from silero.utils_vad import load_silero_vad_onnx
+imported = time.perf_counter()
+
+model = load_silero_vad_onnx({model_path!r})
+loaded = time.perf_counter()
+
+stream = model.new_numpy_stream(16000)
+stream(np.zeros(512, dtype=np.float32), 16000)
+inferred = time.perf_counter()
+
+print(json.dumps({{
+    'torch_import_s': imported_torch - started,
+    'server_import_s': imported - imported_torch,
+    'model_load_s': loaded - imported,
+    'first_inference_s': inferred - loaded,
+    'total_s': inferred - started,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'torch_loaded': 'torch' in sys.modules,
+}}))
+'''
+
+
+def run_once(with_torch, model_path):
+    code = CHILD.format(with_torch=with_torch, model_path=model_path)
+    result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark(with_torch, runs, model_path):
+    results = [run_once(with_torch, model_path) for _ in range(runs)]
+    summary = {key: statistics.median(r[key] for r in results)
+               for key in results[0] if key != 'torch_loaded'}
+    summary['torch_loaded'] = any(r['torch_loaded'] for r in results)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start time and memory of the VAD server runtime")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per variant (medians are reported)")
+    parser.add_argument('--model-path', default=None, help="Onnx model file (default: bundled with silero-vad)")
+    args = parser.parse_args()
+
+    variants = {'onnx only': False}
+    if importlib.util.find_spec('torch') and importlib.util.find_spec('torchaudio'):
+        variants['torch'] = True
+
+    report = {name: benchmark(with_torch, args.runs, args.model_path) for name, with_torch in variants.items()}
+
+    print(f"{'':>10} {'total':>9} {'imports':>9} {'model':>9} {'1st run':>9} {'max rss':>10}  torch loaded")
+    for name, r in report.items():
+        print(f"{name:>10} {r['total_s']:>8.3f}s {r['torch_import_s'] + r['server_import_s']:>8.3f}s "
+              f"{r['model_load_s']:>8.3f}s {r['first_inference_s']:>8.3f}s {r['max_rss_mb']:>7.1f} MB  "
+              f"{r['torch_loaded']}")
+    if 'torch' in report:
+        onnx, torch = report['onnx only'], report['torch']
+        print(f"saved {torch['total_s'] - onnx['total_s']:.3f}s and "
+              f"{torch['max_rss_mb'] - onnx['max_rss_mb']:.1f} MB per process")
+    print(json.dumps(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class EnergyGate:
+    """Decides which frames of an idle stream are quiet enough to skip inference for
+
+    Frame energy (RMS in dBFS) is computed for all frames of a message at once and
+    compared against an adaptive noise floor: the floor follows quieter frames down
+    (smoothed by `fall`, so a single dropout doesn't pull it to digital silence) and
+    rises by at most `rise_db_per_s` otherwise, so it settles on the background level
+    and tracks slow changes of it.
+
+    A frame is quiet when it is less than `margin_db` above the floor and below `max_db`
+    in absolute terms, so speech-level frames always reach the model, even before the
+    floor has settled. Only the leading quiet frames of a message are skipped, and only
+    while the stream is not in speech: once a frame needs the model, the ones after it
+    may depend on its result.
+    """
+
+    def __init__(self, frame_seconds, margin_db=10.0, max_db=-45.0, rise_db_per_s=3.0, fall=0.2):
+        self.margin_db = margin_db
+        self.max_db = max_db
+        self.rise_per_frame = rise_db_per_s * frame_seconds
+        self.fall = fall
+
+        self.floor = None  # noise floor in dBFS, None until the first frame
+        self.frames = 0
+        self.skipped_frames = 0
+
+    def reset(self):
+        self.floor = None
+
+    def leading_quiet_frames(self, frames, in_speech):
+        """Number of frames at the start of `frames` (float32 arrays) whose inference can be skipped"""
+        if not frames:
+            return 0
+        stacked = np.stack(frames)
+        energies = 10 * np.log10(np.einsum('ij,ij->i', stacked, stacked) / stacked.shape[1] + 1e-10)
+
+        skip = 0
+        gating = not in_speech
+        for energy in energies.tolist():
+            if self.floor is None:
+                quiet = False
+                self.floor = energy
+            else:
+                quiet = energy < min(self.floor + self.margin_db, self.max_db)
+                if energy < self.floor:
+                    self.floor += self.fall * (energy - self.floor)
+                else:
+                    self.floor = min(energy, self.floor + self.rise_per_frame)
+
+            if gating and quiet:
+                skip += 1
+            else:
+                gating = False
+
+        self.frames += len(frames)
+        self.skipped_frames += skip
+        return skip
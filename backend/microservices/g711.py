@@ -0,0 +1,41 @@
+"""G.711 µ-law and A-law decoding through 256 entry lookup tables
+
+Every 8-bit code maps to one 16-bit linear sample, so decoding a whole message is a
+single vectorized table lookup. The float32 tables hold the same samples already
+scaled like PCMRingBuffer scales int16 audio, so codes can be expanded straight
+into the frame buffer.
+"""
+import numpy as np
+
+from ring_buffer import INT16_SCALE
+
+ENCODINGS = ('pcm16', 'mulaw', 'alaw')
+
+
+def _mulaw_table():
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+def _alaw_table():
+    codes = np.arange(256, dtype=np.int32) ^ 0x55
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = np.where(exponent == 0, (mantissa << 4) + 8, ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0))
+    return np.where(codes & 0x80, magnitude, -magnitude).astype(np.int16)
+
+
+INT16_TABLES = {'mulaw': _mulaw_table(), 'alaw': _alaw_table()}
+FLOAT32_TABLES = {encoding: table * INT16_SCALE for encoding, table in INT16_TABLES.items()}
+
+
+def bytes_per_sample(encoding):
+    return 2 if encoding == 'pcm16' else 1
+
+
+def decode(codes, encoding):
+    """int16 samples of G.711 `codes` (uint8 array)"""
+    return INT16_TABLES[encoding][codes]
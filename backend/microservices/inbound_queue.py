@@ -0,0 +1,127 @@
+import asyncio
+import time
+from collections import deque
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'catch_up')
+
+# Kinds of queued items
+AUDIO = 'audio'
+COMMAND = 'command'
+GAP = 'gap'
+
+
+class InboundQueue:
+    """Bounded queue of the messages received on one connection, sized in audio samples
+
+    The connection reads the websocket into the queue while the handler processes it,
+    so a client sending faster than real time only fills its own queue. What happens
+    when more than `max_samples` of audio are waiting depends on the policy:
+
+    block        the reader stops reading the websocket until there is room again
+                 (TCP backpressure to the client, nothing is lost)
+    drop_oldest  the oldest queued audio is dropped. It is replaced by a GAP item
+                 with its number of samples, so the stream clock can skip it and
+                 timestamps still match the client's audio
+    catch_up     like block, but the handler takes all queued audio at once, running
+                 the backlog through the model in one call and answering it with one
+                 outbound message
+
+    Commands (text messages) are queued too, so they apply in order with the audio.
+    Audio messages are counted in samples of `bytes_per_sample` bytes (1 for G.711).
+    """
+
+    def __init__(self, max_samples, policy='block', bytes_per_sample=2):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}, expected one of {OVERFLOW_POLICIES}")
+        self.max_samples = max_samples
+        self.policy = policy
+        self.bytes_per_sample = bytes_per_sample
+
+        self._items = deque()  # [kind, payload, time received], payload is bytes, str or a number of samples
+        self._samples = 0      # queued audio samples (gaps not included)
+        self._closed = False
+        self._changed = asyncio.Event()
+
+        self.dropped_samples = 0
+
+    @property
+    def queued_samples(self):
+        return self._samples
+
+    def close(self):
+        """Stop the queue, get() returns None from now on"""
+        self._closed = True
+        self._changed.set()
+
+    async def put(self, message):
+        if isinstance(message, str):
+            self._append(COMMAND, message)
+            return
+
+        num_samples = len(message) // self.bytes_per_sample
+        if self.policy == 'drop_oldest':
+            self._append(AUDIO, message)
+            self._samples += num_samples
+            self._drop_oldest()
+            return
+
+        # a single message larger than the queue still goes in once the queue is empty
+        while self._samples and self._samples + num_samples > self.max_samples and not self._closed:
+            await self._wait()
+        self._append(AUDIO, message)
+        self._samples += num_samples
+
+    async def get(self):
+        """Next (kind, payload, time received), None once closed
+
+        With catch_up, consecutive queued audio messages come out joined as one, with the
+        time the first of them was received.
+        """
+        while not self._items and not self._closed:
+            await self._wait()
+        if self._closed:
+            return None
+
+        kind, payload, received = self._items.popleft()
+        if kind == AUDIO:
+            self._samples -= len(payload) // self.bytes_per_sample
+            if self.policy == 'catch_up' and self._items and self._items[0][0] == AUDIO:
+                chunks = [payload]
+                while self._items and self._items[0][0] == AUDIO:
+                    chunks.append(self._items.popleft()[1])
+                    self._samples -= len(chunks[-1]) // self.bytes_per_sample
+                payload = b''.join(chunks)
+        self._notify()
+        return kind, payload, received
+
+    def _append(self, kind, payload):
+        self._items.append([kind, payload, time.perf_counter()])
+        self._notify()
+
+    def _drop_oldest(self):
+        for item in self._items:
+            if self._samples <= self.max_samples:
+                break
+            # keep the newest message even if it doesn't fit on its own
+            if item[0] != AUDIO or item is self._items[-1]:
+                continue
+            num_samples = len(item[1]) // self.bytes_per_sample
+            item[0], item[1] = GAP, num_samples
+            self._samples -= num_samples
+            self.dropped_samples += num_samples
+
+        # merge consecutive gaps
+        merged = deque()
+        for item in self._items:
+            if item[0] == GAP and merged and merged[-1][0] == GAP:
+                merged[-1][1] += item[1]
+            else:
+                merged.append(item)
+        self._items = merged
+
+    def _notify(self):
+        self._changed.set()
+
+    async def _wait(self):
+        self._changed.clear()
+        await self._changed.wait()
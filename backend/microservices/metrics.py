@@ -0,0 +1,150 @@
+"""In-process metrics of the VAD server, exposed in the Prometheus text format
+
+Metrics are only updated from the event loop thread, once per message or batch of
+frames rather than per frame (Histogram.observe takes a count), so updating them costs
+a few additions per message and needs no locking. Values that are cheap to read but
+change with every frame (e.g. buffered audio) are collected at scrape time instead.
+"""
+import asyncio
+import bisect
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds, from a fraction of a frame inference up to whole seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+
+    def samples(self):
+        """(name suffix, labels, value) of every sample of the metric"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for suffix, labels, value in self.samples():
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            lines.append(f'{self.name}{suffix}{{{label_text}}} {_format(value)}' if label_text
+                         else f'{self.name}{suffix} {_format(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name, help):
+        super().__init__(name, help)
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        return [('', (), self.value)]
+
+
+class Gauge(Metric):
+    """Gauge either set directly, or read from `function` at scrape time"""
+    type = 'gauge'
+
+    def __init__(self, name, help, function=None):
+        super().__init__(name, help)
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def samples(self):
+        return [('', (), self.function() if self.function else self.value)]
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value, count=1):
+        """Record `count` observations of `value` at once (e.g. the mean of a batch)"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += count
+        self.sum += value * count
+
+    def samples(self):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            samples.append(('_bucket', (('le', _format(bound)),), cumulative))
+        samples.append(('_sum', (), self.sum))
+        samples.append(('_count', (), cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+
+def _format(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+async def monitor_event_loop_lag(histogram, gauge, interval=0.5):
+    """Measure how late the event loop wakes up a sleeping task, until cancelled"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - started - interval)
+        histogram.observe(lag)
+        gauge.set(lag)
+
+
+REGISTRY = Registry()
+
+INFERENCE_SECONDS = REGISTRY.register(Histogram(
+    'vad_inference_seconds', 'Duration of one onnx session run (per frame, or per batch when batching)'))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    'vad_batch_size', 'Frames per batched session run', buckets=(1, 2, 4, 8, 16, 32, 64, 128)))
+EVENT_LATENCY_SECONDS = REGISTRY.register(Histogram(
+    'vad_event_latency_seconds', 'Time from receiving audio to sending the results produced from it'))
+EVENT_LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    'vad_event_loop_lag_seconds', 'Delay of the event loop in waking up a sleeping task'))
+EVENT_LOOP_LAG_LAST = REGISTRY.register(Gauge(
+    'vad_event_loop_lag_last_seconds', 'Last measured event loop lag'))
+
+ACTIVE_CONNECTIONS = REGISTRY.register(Gauge(
+    'vad_active_connections', 'Open websocket connections'))
+FRAMES = REGISTRY.register(Counter(
+    'vad_frames_total', 'Audio frames run through the model'))
+SPEECH_SEGMENTS = REGISTRY.register(Counter(
+    'vad_speech_segments_total', 'Speech segments emitted (speech_end events)'))
+GATED_FRAMES = REGISTRY.register(Counter(
+    'vad_gated_frames_total', 'Quiet audio frames the energy gate skipped inference for'))
+DROPPED_SAMPLES = REGISTRY.register(Counter(
+    'vad_dropped_samples_total', 'Audio samples dropped by full inbound queues'))
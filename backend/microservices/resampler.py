@@ -0,0 +1,23 @@
+import numpy as np
+
+from silero.utils_vad import StreamingResampler
+
+
+class PolyphaseResampler(StreamingResampler):
+    """Streaming rational resampler of int16 PCM, from `input_rate` to `output_rate`
+
+    StreamingResampler with the output rounded and clipped back to int16, see there
+    for the filter and how chunks are stitched together.
+    """
+
+    def process(self, audio_int16):
+        """Resample the next chunk, returns the int16 output samples that became available"""
+        output = super().process(audio_int16.astype(np.float32))
+        return np.clip(np.rint(output), -32768, 32767).astype(np.int16)
+
+    def skip(self, num_samples):
+        """Advance over `num_samples` input samples that never arrived, returns the output samples to skip
+
+        The missing audio reads as silence, like in VADHandler.skip.
+        """
+        return len(self.process(np.zeros(num_samples, dtype=np.int16)))
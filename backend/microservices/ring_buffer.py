@@ -0,0 +1,75 @@
+import numpy as np
+
+INT16_SCALE = np.float32(1 / 32768)
+
+
+class PCMRingBuffer:
+    """Fixed-capacity float32 ring buffer for incoming 16-bit PCM
+
+    Incoming int16 audio is converted to float32 once per write, straight into a
+    preallocated buffer. The capacity is a multiple of the frame size and frames are
+    always read from frame-aligned offsets, so a frame never wraps around the end of
+    the buffer and is handed out as a zero-copy view.
+
+    Views stay valid until the next write. The buffer only grows if a single write
+    doesn't fit, which doesn't happen with the regular 100ms messages.
+    """
+
+    def __init__(self, frame_size, capacity_frames=64):
+        self.frame_size = frame_size
+        self._buffer = np.zeros(frame_size * capacity_frames, dtype=np.float32)
+        self._read = 0   # read position, always frame aligned
+        self._size = 0   # number of buffered samples
+
+    def __len__(self):
+        return self._size
+
+    def write(self, audio_int16):
+        """Append int16 samples, converting them to float32 in [-1, 1)"""
+        for source, target in self._reserve(len(audio_int16)):
+            np.multiply(audio_int16[source], INT16_SCALE, out=self._buffer[target], dtype=np.float32)
+
+    def write_lookup(self, codes, table):
+        """Append 8-bit codes (e.g. G.711), expanded to float32 through a 256 entry table"""
+        for source, target in self._reserve(len(codes)):
+            np.take(table, codes[source], out=self._buffer[target])
+
+    def _reserve(self, n):
+        """Make room for `n` samples, returns (source slice, buffer slice) pairs to write them to"""
+        if self._size + n > len(self._buffer):
+            self._grow(self._size + n)
+
+        capacity = len(self._buffer)
+        start = (self._read + self._size) % capacity
+        first = min(n, capacity - start)
+        self._size += n
+        slices = [(slice(0, first), slice(start, start + first))]
+        if first < n:
+            slices.append((slice(first, n), slice(0, n - first)))
+        return slices
+
+    def frames(self):
+        """Yield every complete frame as a view into the buffer, consuming it"""
+        capacity = len(self._buffer)
+        while self._size >= self.frame_size:
+            start = self._read
+            self._read = (self._read + self.frame_size) % capacity
+            self._size -= self.frame_size
+            yield self._buffer[start:start + self.frame_size]
+
+    def clear(self):
+        self._read = 0
+        self._size = 0
+
+    def _grow(self, min_size):
+        frames = -(-min_size // self.frame_size)
+        buffer = np.zeros(2 * frames * self.frame_size, dtype=np.float32)
+
+        # move the unread samples to the start of the new buffer
+        capacity = len(self._buffer)
+        first = min(self._size, capacity - self._read)
+        buffer[:first] = self._buffer[self._read:self._read + first]
+        buffer[first:self._size] = self._buffer[:self._size - first]
+
+        self._buffer = buffer
+        self._read = 0
@@ -0,0 +1,141 @@
+import numpy as np
+
+CAPTURE_MODES = ('end', 'stream')
+
+
+class SegmentCapture:
+    """Rolling window of a connection's recent int16 audio, to cut speech segments from
+
+    Positions are stream sample indices, the same clock as VADIterator's timestamps.
+    Outside of speech only the last `pre_roll` samples before the processed position are
+    kept (the padded start of the next segment lies there). From a segment start on,
+    audio is kept until the segment ends, up to `max_samples`: beyond that the oldest
+    audio is dropped and the segment is marked truncated.
+
+    In 'stream' mode audio of an ongoing segment is handed out as it arrives (see
+    take_streamed) and only what wasn't handed out yet is kept. In 'end' mode it is
+    handed out at speech pauses (see peek_segment) and when the segment ends. Either way
+    every piece continues the previous one, so the audio of a segment is handed out once.
+    A segment split by the max speech duration ends in the past, so the audio already
+    handed out past its end stays with it and the next segment starts after that audio.
+    """
+
+    def __init__(self, mode='end', max_samples=30 * 16000, pre_roll=16000):
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture mode {mode!r}, expected one of {CAPTURE_MODES}")
+        self.mode = mode
+        self.max_samples = max_samples
+        self.pre_roll = pre_roll
+
+        self._buffer = np.zeros(2 * (max_samples + pre_roll), dtype=np.int16)
+        self._offset = 0  # kept audio is _buffer[_offset:_offset + _size]
+        self._start = 0   # stream position of _buffer[_offset]
+        self._size = 0
+        self.segment_start = None  # stream position where the current segment starts
+        self.truncated = False
+        self._streamed = None      # stream position up to which the segment was handed out
+        self._handed_out = 0       # stream position up to which any segment was handed out
+
+    @property
+    def end(self):
+        """Stream position right after the last written sample"""
+        return self._start + self._size
+
+    def write(self, audio_int16):
+        self._reserve(len(audio_int16))
+        end = self._offset + self._size
+        self._buffer[end:end + len(audio_int16)] = audio_int16
+        self._size += len(audio_int16)
+
+    def skip(self, num_samples):
+        """Advance over audio that never arrived, it reads as silence"""
+        self._reserve(num_samples)
+        end = self._offset + self._size
+        self._buffer[end:end + num_samples] = 0
+        self._size += num_samples
+
+    def start_segment(self, position):
+        position = max(position, self._handed_out)
+        self.segment_start = max(position, self._start)
+        self.truncated = position < self._start
+        self._streamed = self.segment_start
+
+    def end_segment(self, position):
+        """(start, int16 audio, truncated) of the segment ending at `position`, start <= position
+
+        The audio is what wasn't handed out by take_streamed / peek_segment yet, all of the
+        segment if nothing was.
+        """
+        # a segment started after audio already handed out can end before it (split in a
+        # past pause), it is then empty and ends where it started
+        start = min(self._streamed, position)
+        audio = self._slice(start, max(start, position))
+        if self.mode == 'stream':
+            self._handed_out = max(self._handed_out, start + len(audio))
+        segment = start, audio, self.truncated
+        self.segment_start = self._streamed = None
+        self.truncated = False
+        return segment
+
+    def peek_segment(self, position):
+        """(start, int16 audio, truncated) of the ongoing segment up to `position`, keeping it going
+
+        Hands out the audio since the previous piece, the next one continues at `position`.
+        """
+        start = self._streamed
+        end = max(start, position)
+        self._streamed = self._handed_out = end
+        return start, self._slice(start, end), self.truncated
+
+    def take_streamed(self):
+        """(start, int16 audio) of the ongoing segment received since the last call, None if nothing is new"""
+        if self.segment_start is None or self._streamed >= self.end:
+            return None
+        start = self._streamed
+        self._streamed = self._handed_out = self.end
+        return start, self._slice(start, self.end)
+
+    def release(self, processed):
+        """Forget audio no longer needed once the VAD has processed up to `processed`"""
+        if self.segment_start is None:
+            keep_from = processed - self.pre_roll
+        elif self.mode == 'stream':
+            keep_from = self._streamed
+        else:
+            keep_from = max(self._streamed, self.end - self.max_samples)
+            if keep_from > self._streamed:
+                self._streamed = keep_from
+                self.truncated = True
+        self._drop_before(keep_from)
+
+    def reset(self):
+        self._offset = 0
+        self._start = 0
+        self._size = 0
+        self._handed_out = 0
+        self.segment_start = self._streamed = None
+        self.truncated = False
+
+    def _slice(self, start, end):
+        start = max(start, self._start)
+        offset = self._offset - self._start
+        return self._buffer[offset + start:offset + end].copy()
+
+    def _drop_before(self, position):
+        drop = min(max(0, position - self._start), self._size)
+        self._offset += drop
+        self._size -= drop
+        self._start += drop
+
+    def _reserve(self, num_samples):
+        if self._offset + self._size + num_samples <= len(self._buffer):
+            return
+        # move the kept audio to the front, which happens once per buffer length of audio
+        if self._size + num_samples <= len(self._buffer):
+            buffer = self._buffer
+        else:
+            # the window is bounded by release(), only a single huge write gets here
+            buffer = np.zeros(2 * (self._size + num_samples), dtype=np.int16)
+        buffer[:self._size] = self._buffer[self._offset:self._offset + self._size]
+        self._buffer = buffer
+        self._offset = 0
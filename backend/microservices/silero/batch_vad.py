@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Batch VAD over a directory (or manifest) of audio files
+
+Files are decoded on a thread pool, inference runs on a process pool with one onnx model
+per worker. Results are appended to a JSONL file as soon as each file is done, one line per
+file: {"path": ..., "duration_s": ..., "speech": [{"start": ..., "end": ...}, ...]}.
+Files already present in the output are skipped, so an interrupted run can be resumed by
+running the same command again. With --cache-dir the speech probabilities are kept on disk,
+so re-running with other VAD parameters (to another output) skips the model pass.
+
+Usage: python batch_vad.py <directory or manifest> -o speech.jsonl [--workers N] [--cache-dir DIR]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from utils_vad import (SpeechProbsCache, get_speech_probs, get_speech_timestamps_from_probs, load_silero_vad_onnx,
+                       read_audio, read_audio_blocks)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.mp3', '.ogg', '.opus', '.m4a')
+
+# Model (and probabilities cache) of an inference worker process, loaded once per worker
+_model = None
+_cache = None
+
+
+def _init_worker(cache_dir=None, cache_max_bytes=None):
+    global _model, _cache
+    _model = load_silero_vad_onnx()
+    if cache_dir:
+        _cache = SpeechProbsCache(cache_dir, max_size_bytes=cache_max_bytes)
+
+
+def _detect(audio, sampling_rate, vad_params):
+    speech_probs = get_speech_probs(audio, _model, sampling_rate, cache=_cache)
+    return get_speech_timestamps_from_probs(speech_probs, len(audio), sampling_rate, **vad_params)
+
+
+def _decode(path, sampling_rate):
+    """Mono float32 audio of a file at sampling_rate
+
+    WAV files are read memory-mapped and resampled by read_audio_blocks, without torchaudio,
+    other formats are decoded by read_audio.
+    """
+    if not path.lower().endswith('.wav'):
+        return read_audio(path, sampling_rate=sampling_rate).numpy()
+    blocks = list(read_audio_blocks(path, sampling_rate=sampling_rate, block_size=sampling_rate * 60))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def list_audio_files(source):
+    """Audio files of a directory (recursive), or the paths listed in a manifest
+
+    A manifest has one path per line, either plain or as a JSON object with a "path" key.
+    Relative paths are resolved against the manifest's directory.
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(AUDIO_EXTENSIONS))
+        return sorted(paths)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            path = json.loads(line)['path'] if line.startswith('{') else line
+            paths.append(os.path.join(base_dir, path))
+    return paths
+
+
+def load_done(output):
+    """Paths that already have a result in the output file (failed files are retried)"""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:  # partially written last line of an interrupted run
+                continue
+            if 'error' not in record:
+                done.add(record['path'])
+    return done
+
+
+def run(paths, output, workers, decode_threads, sampling_rate, vad_params, cache_dir=None, cache_max_bytes=None):
+    done = load_done(output)
+    remaining = [path for path in paths if path not in done]
+    todo = iter(remaining)
+    logger.info(f"{len(paths)} files, {len(paths) - len(remaining)} already done, {len(remaining)} to process")
+
+    # decoded audio waiting for a worker is bounded by the number of files in flight
+    max_in_flight = 2 * workers + decode_threads
+    in_flight = {}
+    files = 0
+    audio_seconds = 0.0
+    started = last_report = time.perf_counter()
+
+    with open(output, 'a') as out, \
+            ThreadPoolExecutor(max_workers=decode_threads, thread_name_prefix='decode') as decoders, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir, cache_max_bytes),
+                                mp_context=multiprocessing.get_context('spawn')) as pool:
+
+        def start_next():
+            path = next(todo, None)
+            if path is not None:
+                in_flight[decoders.submit(_decode, path, sampling_rate)] = ('decode', path, None)
+
+        for _ in range(max_in_flight):
+            start_next()
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, path, duration = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    logger.error(f"Failed to {stage} {path}: {error}")
+                    out.write(json.dumps({'path': path, 'error': error}) + '\n')
+                    out.flush()
+                    start_next()
+                    continue
+
+                if stage == 'decode':
+                    duration = len(result) / sampling_rate
+                    in_flight[pool.submit(_detect, result, sampling_rate, vad_params)] = ('detect', path, duration)
+                    continue
+
+                out.write(json.dumps({'path': path, 'duration_s': round(duration, 3), 'speech': result}) + '\n')
+                out.flush()
+                files += 1
+                audio_seconds += duration
+                start_next()
+
+            now = time.perf_counter()
+            if now - last_report > 10:
+                last_report = now
+                _log_throughput(files, audio_seconds, now - started)
+
+    elapsed = time.perf_counter() - started
+    _log_throughput(files, audio_seconds, elapsed)
+    return {
+        'files': files,
+        'audio_hours': audio_seconds / 3600,
+        'elapsed_s': elapsed,
+        'files_per_s': files / elapsed if elapsed else 0.0,
+        'audio_hours_per_s': audio_seconds / 3600 / elapsed if elapsed else 0.0,
+    }
+
+
+def _log_throughput(files, audio_seconds, elapsed):
+    if not elapsed:
+        return
+    logger.info(f"{files} files, {audio_seconds / 3600:.2f} audio hours in {elapsed:.1f}s: "
+                f"{files / elapsed:.2f} files/s, {audio_seconds / 3600 / elapsed:.4f} audio hours/s "
+                f"({audio_seconds / elapsed:.1f}x real time)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Batch Silero VAD over a directory or manifest of audio files")
+    parser.add_argument('source', help="Directory of audio files, or manifest with one path (or JSON {\"path\": ...}) per line")
+    parser.add_argument('-o', '--output', required=True, help="JSONL file results are appended to")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Inference processes")
+    parser.add_argument('--decode-threads', type=int, default=2, help="Audio decoding threads")
+    parser.add_argument('--sampling-rate', type=int, default=16000, choices=[8000, 16000])
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--min-speech-duration-ms', type=int, default=250)
+    parser.add_argument('--max-speech-duration-s', type=float, default=float('inf'))
+    parser.add_argument('--min-silence-duration-ms', type=int, default=100)
+    parser.add_argument('--speech-pad-ms', type=int, default=30)
+    parser.add_argument('--return-seconds', action='store_true', help="Timestamps in seconds instead of samples")
+    parser.add_argument('--cache-dir', default=None, help="Keep speech probabilities in this directory for later runs")
+    parser.add_argument('--cache-max-gb', type=float, default=1.0, help="Size limit of the cache directory")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    vad_params = {
+        'threshold': args.threshold,
+        'min_speech_duration_ms': args.min_speech_duration_ms,
+        'max_speech_duration_s': args.max_speech_duration_s,
+        'min_silence_duration_ms': args.min_silence_duration_ms,
+        'speech_pad_ms': args.speech_pad_ms,
+        'return_seconds': args.return_seconds,
+    }
+    stats = run(list_audio_files(args.source), args.output, args.workers, args.decode_threads,
+                args.sampling_rate, vad_params,
+                cache_dir=args.cache_dir, cache_max_bytes=int(args.cache_max_gb * (1 << 30)))
+    print(json.dumps(stats))
+
+
+if __name__ == '__main__':
+    main()
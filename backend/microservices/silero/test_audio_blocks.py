@@ -0,0 +1,183 @@
+"""Streaming audio reader (read_audio_blocks), the block fed timestamp pipeline (iter_speech_timestamps)
+and chunk export without copies (iter_chunks, save_chunks)
+
+Run with `python -m pytest test_audio_blocks.py` (or `python test_audio_blocks.py`) from this directory.
+"""
+import os
+import struct
+import tempfile
+import wave
+
+import numpy as np
+import torch
+
+from test_speech_timestamps import HERE, PARAMS, read_wav, synthetic_traces
+from utils_vad import (StreamingResampler, collect_chunks, drop_chunks, get_speech_timestamps,
+                       get_speech_timestamps_from_blocks, get_speech_timestamps_from_probs, iter_chunks,
+                       iter_speech_timestamps, load_silero_vad_onnx, read_audio_blocks, save_chunks)
+
+
+class BlockProbsModel:
+    """Stand-in onnx model whose streams replay a fixed trace of speech probabilities"""
+
+    def __init__(self, probs):
+        self.probs = probs
+
+    def new_numpy_stream(self, sampling_rate):
+        probs = iter(self.probs)
+        stream = lambda x, sr: np.array([[next(probs)]], dtype=np.float32)
+        stream.stream = type('NumpyOnnxState', (), {'num_samples': 512 if sampling_rate == 16000 else 256})
+        return stream
+
+
+def write_wav(path, samples, sampling_rate, format_tag=1):
+    """WAV file of [frames, channels] samples, written as they are (24 bit as [frames, channels, 3] bytes)"""
+    channels = samples.shape[1]
+    sample_width = samples.dtype.itemsize * (3 if samples.ndim == 3 else 1)
+    data = samples.tobytes()
+    fmt = struct.pack('<HHIIHH', format_tag, channels, sampling_rate, sampling_rate * channels * sample_width,
+                      channels * sample_width, 8 * sample_width)
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', 4 + 8 + len(fmt) + 8 + len(data)) + b'WAVE')
+        f.write(b'fmt ' + struct.pack('<I', len(fmt)) + fmt)
+        f.write(b'data' + struct.pack('<I', len(data)) + data)
+
+
+def read_all(path, **params):
+    blocks = list(read_audio_blocks(path, **params))
+    block_size = params.get('block_size', 16000 * 10)
+    assert all(len(block) == block_size for block in blocks[:-1])
+    assert not blocks or 0 < len(blocks[-1]) <= block_size
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def test_sample_formats():
+    rng = np.random.default_rng(0)
+    signal = rng.uniform(-0.9, 0.9, size=(5000, 2))
+    int24 = np.round(signal * (1 << 23)).astype('<i4')
+    # (samples, format tag, tolerance: quantization step or float32 precision)
+    formats = [
+        (np.round(signal * 128 + 128).astype(np.uint8), 1, 1 / 128),
+        (np.round(signal * 32768).astype('<i2'), 1, 1 / 32768),
+        (int24.view(np.uint8).reshape(5000, 2, 4)[..., :3].copy(), 1, 1 / (1 << 23)),
+        (np.round(signal * (1 << 31)).astype('<i4'), 1, 1e-6),
+        (signal.astype('<f4'), 3, 1e-6),
+        (signal.astype('<f8'), 3, 1e-6),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'audio.wav')
+        for samples, format_tag, tolerance in formats:
+            write_wav(path, samples, 16000, format_tag)
+            audio = read_all(path, block_size=1000)
+            assert np.abs(audio - signal.mean(axis=1)).max() <= tolerance
+
+
+def test_resampled_blocks():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'audio.wav')
+        samples = (np.random.default_rng(1).standard_normal((44100, 1)) * 3000).astype('<i2')
+        write_wav(path, samples, 44100)
+
+        resampler = StreamingResampler(44100, 16000)
+        expected = np.concatenate([resampler.process(samples[:, 0] / 32768), resampler.flush()])
+        assert len(expected) == 16000
+        # resampling doesn't depend on where the file is cut into blocks
+        for block_size in [16000, 4097, 512]:
+            assert np.allclose(read_all(path, block_size=block_size), expected, atol=1e-6)
+
+
+def test_unpatched_header():
+    # test1.wav was recorded with a placeholder data size, the data runs to the end of the file
+    with wave.open(os.path.join(HERE, 'test1.wav')) as f:
+        num_samples = len(f.readframes(f.getnframes())) // 2
+    assert len(read_all(os.path.join(HERE, 'test1.wav'))) == num_samples // 3
+
+
+def test_timestamps_from_blocks():
+    model = load_silero_vad_onnx()
+    audio, sampling_rate = read_wav('en.wav')
+    path = os.path.join(HERE, 'en.wav')
+    assert np.array_equal(read_all(path), audio.numpy())
+
+    expected = get_speech_timestamps(audio, model, sampling_rate=sampling_rate)
+    for block_size in [16000 * 10, 1000]:
+        assert get_speech_timestamps_from_blocks(read_audio_blocks(path, block_size=block_size), model) == expected
+    assert get_speech_timestamps_from_blocks(read_audio_blocks(path), model, return_seconds=True) == \
+        get_speech_timestamps(audio, model, return_seconds=True)
+    assert get_speech_timestamps_from_blocks([], model) == get_speech_timestamps(torch.zeros(0), model)
+
+
+def test_iter_same_as_whole():
+    for probs in synthetic_traces():
+        # (probabilities are float32, as scored by the model)
+        probs = np.asarray(list(probs), dtype=np.float32)
+        for audio_length_samples in [512 * len(probs), 512 * len(probs) - 400]:
+            audio = np.zeros(audio_length_samples, dtype=np.float32)
+            for params in PARAMS + [{'speech_pad_ms': 300, 'min_speech_duration_ms': 0}]:
+                expected = get_speech_timestamps_from_probs(probs, audio_length_samples, 16000, **params)
+                for block_size in [512, 1000, 16000]:
+                    blocks = (audio[i:i + block_size] for i in range(0, audio_length_samples, block_size))
+                    assert list(iter_speech_timestamps(blocks, BlockProbsModel(probs), **params)) == expected
+
+
+def test_iter_yields_early():
+    model = load_silero_vad_onnx()
+    received = 0
+
+    def blocks():
+        nonlocal received
+        for block in read_audio_blocks(os.path.join(HERE, 'en.wav'), block_size=2048):
+            received += len(block)
+            yield block
+
+    speeches = [(speech_dict, received) for speech_dict in iter_speech_timestamps(blocks(), model)]
+    # all but the last segment (running to the end of the file) come out within half a second of their end
+    assert len(speeches) > 1
+    assert all(received - speech_dict['end'] < 8000 for speech_dict, received in speeches[:-1])
+
+
+def test_chunks():
+    wav = torch.arange(100, dtype=torch.float32)
+    tss = [{'start': 10, 'end': 20}, {'start': 50, 'end': 55}]
+    # views of wav's storage
+    assert all(chunk.untyped_storage().data_ptr() == wav.untyped_storage().data_ptr() for chunk in iter_chunks(tss, wav))
+    assert collect_chunks(tss, wav).tolist() == list(range(10, 20)) + list(range(50, 55))
+    assert drop_chunks(tss, wav).tolist() == list(range(10)) + list(range(20, 50)) + list(range(55, 100))
+
+    # seconds aren't rounded to whole seconds before converting
+    assert collect_chunks([{'start': 0.25, 'end': 0.5}], wav, seconds=True, sampling_rate=100).tolist() == list(range(25, 50))
+
+    # written in place into a buffer, e.g. a memory-mapped file
+    with tempfile.TemporaryDirectory() as directory:
+        out = np.memmap(os.path.join(directory, 'speech.f32'), dtype=np.float32, mode='w+', shape=(100,))
+        collected = collect_chunks(tss, wav.numpy(), out=out)
+        assert np.shares_memory(collected, out) and collected.tolist() == collect_chunks(tss, wav).tolist()
+        assert drop_chunks(tss, wav.numpy(), out=out).tolist() == drop_chunks(tss, wav).tolist()
+
+
+def test_save_chunks():
+    audio, _ = read_wav('en.wav')
+    tss = get_speech_timestamps(audio, load_silero_vad_onnx())
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'speech.wav')
+        for drop in [False, True]:
+            expected = drop_chunks(tss, audio) if drop else collect_chunks(tss, audio)
+            assert save_chunks(path, tss, audio, drop=drop, piece_size=5000) == len(expected)
+            assert np.array_equal(read_all(path), expected.numpy())
+
+        # int16 samples of the source file, memory-mapped, are copied as they are
+        source = np.memmap(os.path.join(HERE, 'en.wav'), dtype='<i2', mode='r', offset=44)
+        save_chunks(path, tss, source)
+        assert np.array_equal(read_all(path), collect_chunks(tss, audio).numpy())
+
+
+if __name__ == '__main__':
+    test_sample_formats()
+    test_resampled_blocks()
+    test_unpatched_header()
+    test_timestamps_from_blocks()
+    test_iter_same_as_whole()
+    test_iter_yields_early()
+    test_chunks()
+    test_save_chunks()
+    print('ok')
@@ -0,0 +1,107 @@
+"""On-disk speech probabilities cache (SpeechProbsCache)
+
+Run with `python -m pytest test_probs_cache.py` (or `python test_probs_cache.py`) from this directory.
+"""
+import os
+import tempfile
+
+import numpy as np
+import torch
+
+from test_speech_timestamps import read_wav
+from utils_vad import SpeechProbsCache, get_speech_probs, get_speech_timestamps, load_silero_vad_onnx
+
+
+def test_hit_same_as_miss():
+    model = load_silero_vad_onnx()
+    audio, _ = read_wav('en.wav')
+    audio = audio[:16000 * 20]
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SpeechProbsCache(directory)
+        missed = get_speech_probs(audio.numpy(), model, cache=cache)
+        hit = get_speech_probs(audio.numpy(), model, cache=cache)
+        assert isinstance(hit, np.memmap) and np.array_equal(missed, hit)
+        # float16 storage is close to the model's output
+        assert np.abs(hit - get_speech_probs(audio.numpy(), model)).max() < 1e-3
+
+    for params in [{}, {'threshold': 0.3, 'speech_pad_ms': 100}]:
+        # a fresh cache per parameter set, so the first call misses and the second hits
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SpeechProbsCache(directory)
+            missed = get_speech_timestamps(audio, model, cache=cache, **params)
+            assert len(os.listdir(directory)) == 1
+            assert get_speech_timestamps(audio, model, cache=cache, **params) == missed
+
+
+def test_cache_against_no_cache():
+    # Cached probabilities are rounded to float16, so timestamps can differ from a run without
+    # cache, but only when a probability is within the rounding of threshold or neg_threshold
+    model = load_silero_vad_onnx()
+    audio, _ = read_wav('en.wav')
+    audio = audio[:16000 * 20]
+    probs = get_speech_probs(audio.numpy(), model)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SpeechProbsCache(directory)
+        compared = 0
+        for threshold in np.round(np.arange(0.3, 0.705, 0.01), 2):
+            neg_threshold = max(threshold - 0.15, 0.01)
+            cached = get_speech_timestamps(audio, model, cache=cache, threshold=threshold)
+            if np.any(np.abs(probs - threshold) < 1e-3) or np.any(np.abs(probs - neg_threshold) < 1e-3):
+                continue  # results may differ
+            compared += 1
+            assert cached == get_speech_timestamps(audio, model, threshold=threshold)
+        assert compared > 0
+
+
+def test_keys():
+    model = load_silero_vad_onnx()
+    audio = np.random.default_rng(0).uniform(-1, 1, 16000).astype(np.float32)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SpeechProbsCache(directory)
+        key = cache.key(audio, 16000, model)
+        assert cache.key(audio.copy(), 16000, model) == key
+        assert cache.key(audio, 8000, model) != key
+        changed = audio.copy()
+        changed[-1] += 1e-3
+        assert cache.key(changed, 16000, model) != key
+        # torch models are identified by their weights
+        linear = torch.nn.Linear(2, 2)
+        assert cache.key(audio, 16000, linear) not in (key, cache.key(audio, 16000, torch.nn.Linear(2, 2)))
+        assert cache.key(audio, 16000, linear) == cache.key(audio, 16000, linear)
+        # streams are the model they share
+        assert cache.key(audio, 16000, model.new_numpy_stream(16000)) == key
+        assert cache.key(audio, 16000, model.new_stream()) == key
+        try:
+            cache.key(audio, 16000, object())
+        except TypeError:
+            pass
+        else:
+            assert False, "unsupported models are refused"
+
+
+def test_lru_eviction():
+    with tempfile.TemporaryDirectory() as directory:
+        probs = np.zeros(1000, dtype=np.float32)
+        entry_size = 2 * len(probs) + 128  # float16 and the .npy header
+        cache = SpeechProbsCache(directory, max_size_bytes=3 * entry_size)
+        for key in ['a', 'b', 'c']:
+            cache.put(key, probs)
+        os.utime(cache._path('a'), (0, 0))
+        os.utime(cache._path('b'), (1, 1))
+        assert cache.get('a') is not None  # now the most recently used
+        cache.put('d', probs)
+        assert cache.get('b') is None
+        assert all(cache.get(key) is not None for key in ['a', 'c', 'd'])
+
+        # an unreadable entry is a miss
+        with open(cache._path('a'), 'wb') as f:
+            f.write(b'garbage')
+        assert cache.get('a') is None and not os.path.exists(cache._path('a'))
+
+
+if __name__ == '__main__':
+    test_hit_same_as_miss()
+    test_cache_against_no_cache()
+    test_keys()
+    test_lru_eviction()
+    print('ok')
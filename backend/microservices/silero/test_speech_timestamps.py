@@ -0,0 +1,268 @@
+"""Equivalence of the vectorized get_speech_timestamps post-processing with the original per-frame loop
+
+Run with `python -m pytest test_speech_timestamps.py` (or `python test_speech_timestamps.py`) from this directory.
+"""
+import itertools
+import warnings
+import os
+import wave
+from typing import Callable
+
+import numpy as np
+import torch
+
+from utils_vad import get_speech_timestamps, load_silero_vad_onnx, make_visualization
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PARAMS = [
+    {},
+    {'threshold': 0.3},
+    {'threshold': 0.7, 'neg_threshold': 0.6},
+    {'min_silence_duration_ms': 0, 'speech_pad_ms': 0},
+    {'min_silence_duration_ms': 500, 'min_speech_duration_ms': 1000, 'speech_pad_ms': 100},
+    {'max_speech_duration_s': 2},
+    {'max_speech_duration_s': 1, 'min_silence_at_max_speech': 30},
+    {'max_speech_duration_s': 3, 'use_max_poss_sil_at_max_speech': False},
+    {'max_speech_duration_s': 0.1, 'speech_pad_ms': 10},
+    {'return_seconds': True, 'time_resolution': 2},
+]
+
+
+@torch.no_grad()
+def reference_get_speech_timestamps(audio: torch.Tensor,
+                          model,
+                          threshold: float = 0.5,
+                          sampling_rate: int = 16000,
+                          min_speech_duration_ms: int = 250,
+                          max_speech_duration_s: float = float('inf'),
+                          min_silence_duration_ms: int = 100,
+                          speech_pad_ms: int = 30,
+                          return_seconds: bool = False,
+                          time_resolution: int = 1,
+                          visualize_probs: bool = False,
+                          progress_tracking_callback: Callable[[float], None] = None,
+                          neg_threshold: float = None,
+                          window_size_samples: int = 512,
+                          min_silence_at_max_speech: float = 98,
+                          use_max_poss_sil_at_max_speech: bool = True):
+
+    if not torch.is_tensor(audio):
+        try:
+            audio = torch.Tensor(audio)
+        except:
+            raise TypeError("Audio cannot be casted to tensor. Cast it manually")
+
+    if len(audio.shape) > 1:
+        for i in range(len(audio.shape)):  # trying to squeeze empty dimensions
+            audio = audio.squeeze(0)
+        if len(audio.shape) > 1:
+            raise ValueError("More than one dimension in audio. Are you trying to process audio with 2 channels?")
+
+    if sampling_rate > 16000 and (sampling_rate % 16000 == 0):
+        step = sampling_rate // 16000
+        sampling_rate = 16000
+        audio = audio[::step]
+        warnings.warn('Sampling rate is a multiply of 16000, casting to 16000 manually!')
+    else:
+        step = 1
+
+    if sampling_rate not in [8000, 16000]:
+        raise ValueError("Currently silero VAD models support 8000 and 16000 (or multiply of 16000) sample rates")
+
+    window_size_samples = 512 if sampling_rate == 16000 else 256
+    hop_size_samples = int(window_size_samples)
+
+    model.reset_states()
+    min_speech_samples = sampling_rate * min_speech_duration_ms / 1000
+    speech_pad_samples = sampling_rate * speech_pad_ms / 1000
+    max_speech_samples = sampling_rate * max_speech_duration_s - window_size_samples - 2 * speech_pad_samples
+    min_silence_samples = sampling_rate * min_silence_duration_ms / 1000
+    min_silence_samples_at_max_speech = sampling_rate * min_silence_at_max_speech / 1000
+
+    audio_length_samples = len(audio)
+
+    speech_probs = []
+    for current_start_sample in range(0, audio_length_samples, hop_size_samples):
+        chunk = audio[current_start_sample: current_start_sample + window_size_samples]
+        if len(chunk) < window_size_samples:
+            chunk = torch.nn.functional.pad(chunk, (0, int(window_size_samples - len(chunk))))
+        try:
+            speech_prob = model(chunk, sampling_rate).item()
+        except Exception as e:
+            raise
+        speech_probs.append(speech_prob)
+        # caculate progress and seng it to callback function
+        progress = current_start_sample + hop_size_samples
+        if progress > audio_length_samples:
+            progress = audio_length_samples
+        progress_percent = (progress / audio_length_samples) * 100
+        if progress_tracking_callback:
+            progress_tracking_callback(progress_percent)
+
+    triggered = False
+    speeches = []
+    current_speech = {}
+
+    if neg_threshold is None:
+        neg_threshold = max(threshold - 0.15, 0.01)
+    temp_end = 0  # to save potential segment end (and tolerate some silence)
+    prev_end = next_start = 0  # to save potential segment limits in case of maximum segment size reached
+    possible_ends = []
+
+    for i, speech_prob in enumerate(speech_probs):
+        if (speech_prob >= threshold) and temp_end:
+            if temp_end != 0:
+                sil_dur = (hop_size_samples * i) - temp_end
+                if sil_dur > min_silence_samples_at_max_speech:
+                    possible_ends.append((temp_end, sil_dur))
+                temp_end = 0
+            if next_start < prev_end:
+                next_start = hop_size_samples * i
+
+        if (speech_prob >= threshold) and not triggered:
+            triggered = True
+            current_speech['start'] = hop_size_samples * i
+            continue
+
+        if triggered and (hop_size_samples * i) - current_speech['start'] > max_speech_samples:
+            if possible_ends:
+                if use_max_poss_sil_at_max_speech:
+                    prev_end, dur = max(possible_ends, key=lambda x: x[1])  # use the longest possible silence segment in the current speech chunk
+                else:
+                    prev_end, dur = possible_ends[-1]   # use the last possible silence segement
+                current_speech['end'] = prev_end
+                speeches.append(current_speech)
+                current_speech = {}
+                next_start = prev_end + dur
+                if next_start < prev_end + hop_size_samples * i:  # previously reached silence (< neg_thres) and is still not speech (< thres)
+                    #triggered = False
+                    current_speech['start'] = next_start
+                else:
+                    triggered = False
+                    #current_speech['start'] = next_start
+                prev_end = next_start = temp_end = 0
+                possible_ends = []
+            else:
+                current_speech['end'] = hop_size_samples * i
+                speeches.append(current_speech)
+                current_speech = {}
+                prev_end = next_start = temp_end = 0
+                triggered = False
+                possible_ends = []
+                continue
+
+        if (speech_prob < neg_threshold) and triggered:
+            if not temp_end:
+                temp_end = hop_size_samples * i
+            # if ((hop_size_samples * i) - temp_end) > min_silence_samples_at_max_speech:  # condition to avoid cutting in very short silence
+            #     prev_end = temp_end
+            if (hop_size_samples * i) - temp_end < min_silence_samples:
+                continue
+            else:
+                current_speech['end'] = temp_end
+                if (current_speech['end'] - current_speech['start']) > min_speech_samples:
+                    speeches.append(current_speech)
+                current_speech = {}
+                prev_end = next_start = temp_end = 0
+                triggered = False
+                possible_ends = []
+                continue
+
+    if current_speech and (audio_length_samples - current_speech['start']) > min_speech_samples:
+        current_speech['end'] = audio_length_samples
+        speeches.append(current_speech)
+
+    for i, speech in enumerate(speeches):
+        if i == 0:
+            speech['start'] = int(max(0, speech['start'] - speech_pad_samples))
+        if i != len(speeches) - 1:
+            silence_duration = speeches[i+1]['start'] - speech['end']
+            if silence_duration < 2 * speech_pad_samples:
+                speech['end'] += int(silence_duration // 2)
+                speeches[i+1]['start'] = int(max(0, speeches[i+1]['start'] - silence_duration // 2))
+            else:
+                speech['end'] = int(min(audio_length_samples, speech['end'] + speech_pad_samples))
+                speeches[i+1]['start'] = int(max(0, speeches[i+1]['start'] - speech_pad_samples))
+        else:
+            speech['end'] = int(min(audio_length_samples, speech['end'] + speech_pad_samples))
+
+    if return_seconds:
+        audio_length_seconds = audio_length_samples / sampling_rate
+        for speech_dict in speeches:
+            speech_dict['start'] = max(round(speech_dict['start'] / sampling_rate, time_resolution), 0)
+            speech_dict['end'] = min(round(speech_dict['end'] / sampling_rate, time_resolution), audio_length_seconds)
+    elif step > 1:
+        for speech_dict in speeches:
+            speech_dict['start'] *= step
+            speech_dict['end'] *= step
+
+    if visualize_probs:
+        make_visualization(speech_probs, hop_size_samples / sampling_rate)
+
+    return speeches
+
+
+class ProbsModel:
+    """Stand-in model replaying a fixed trace of speech probabilities"""
+
+    def __init__(self, probs):
+        self.probs = probs
+        self.reset_states()
+
+    def reset_states(self):
+        self.i = 0
+
+    def __call__(self, x, sr):
+        prob = self.probs[self.i]
+        self.i += 1
+        return torch.tensor([[prob]])
+
+
+def read_wav(name):
+    with wave.open(os.path.join(HERE, name)) as f:
+        sampling_rate = f.getframerate()
+        audio = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    return torch.from_numpy(audio.astype(np.float32) / 32768), sampling_rate
+
+
+def synthetic_traces():
+    rng = np.random.default_rng(0)
+    yield rng.random(3000)
+    # long runs with noisy edges, the typical shape of real model output
+    runs = np.repeat(rng.random(400) > 0.5, rng.integers(1, 60, 400))
+    yield np.clip(runs * 0.9 + rng.normal(0, 0.2, len(runs)), 0, 1)
+    # values sitting exactly on the thresholds
+    yield rng.choice([0.0, 0.35, 0.5, 0.49999, 1.0], 3000)
+    yield np.ones(1000)
+    yield np.zeros(1000)
+    yield np.array([0.9])
+
+
+def assert_same(audio, model, sampling_rate, params):
+    expected = reference_get_speech_timestamps(audio, model, sampling_rate=sampling_rate, **params)
+    actual = get_speech_timestamps(audio, model, sampling_rate=sampling_rate, **params)
+    assert actual == expected, params
+
+
+def test_synthetic_traces():
+    for probs, params in itertools.product(synthetic_traces(), PARAMS):
+        # odd length, so the last chunk is zero padded
+        audio = torch.zeros(len(probs) * 512 - 100)
+        assert_same(audio, ProbsModel(probs.tolist()), 16000, params)
+
+
+def test_bundled_wavs():
+    model = load_silero_vad_onnx()
+    for name in ['en.wav', 'test1.wav']:
+        audio, sampling_rate = read_wav(name)
+        # run the model once, then check every parameter set on its output
+        probs = model.audio_forward(audio[::sampling_rate // 16000], 16000)[0].tolist()
+        for params in PARAMS:
+            assert_same(audio, ProbsModel(probs), sampling_rate, params)
+
+
+if __name__ == '__main__':
+    test_synthetic_traces()
+    test_bundled_wavs()
+    print('ok')
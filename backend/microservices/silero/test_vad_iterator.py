@@ -0,0 +1,136 @@
+"""Max speech duration splitting and speech pause events of the streaming VADIterator
+
+Run with `python -m pytest test_vad_iterator.py` (or `python test_vad_iterator.py`) from this directory.
+"""
+import numpy as np
+
+from test_speech_timestamps import ProbsModel, synthetic_traces
+from utils_vad import VADIterator
+
+WINDOW = 512
+
+
+def run(probs, **params):
+    """Segments [start, end] produced by an iterator fed the given speech probabilities"""
+    iterator = VADIterator(ProbsModel(probs), **params)
+    segments = []
+    for prob in probs:
+        speech_dict = iterator.process_speech_prob(prob, WINDOW)
+        if not speech_dict:
+            continue
+        if 'end' in speech_dict:
+            assert segments and segments[-1][1] is None
+            segments[-1][1] = speech_dict['end']
+        if 'start' in speech_dict:
+            assert not segments or segments[-1][1] is not None
+            segments.append([speech_dict['start'], None])
+    return segments
+
+
+def frames(*runs):
+    """Probabilities of consecutive (probability, number of frames) runs"""
+    return [prob for prob, count in runs for _ in range(count)]
+
+
+def test_no_limit_unchanged():
+    probs = frames((1.0, 400), (0.0, 10))
+    assert run(probs) == [[0, 400 * WINDOW + 480]]
+
+
+def test_split_at_longest_pause():
+    # speech with a 4 and a 10 frame pause, longer than 3s in total
+    probs = frames((1.0, 40), (0.0, 4), (1.0, 20), (0.0, 10), (1.0, 60), (0.0, 10))
+    # (long min silence, so none of the pauses ends the segment by itself)
+    segments = run(probs, max_speech_duration_s=3, min_silence_duration_ms=1000)
+    longest_pause_start = 64 * WINDOW
+    assert segments[0] == [0, longest_pause_start + 480]
+    assert segments[1][0] == longest_pause_start + 10 * WINDOW - 480
+    # the shorter pause comes before the split, it is not used again
+    assert len(segments) == 2
+
+
+def test_split_at_last_pause():
+    probs = frames((1.0, 40), (0.0, 10), (1.0, 20), (0.0, 4), (1.0, 60), (0.0, 10))
+    segments = run(probs, max_speech_duration_s=3, min_silence_duration_ms=1000,
+                   use_max_poss_sil_at_max_speech=False)
+    assert segments[0][1] == 70 * WINDOW + 480
+
+
+def test_split_at_ongoing_pause():
+    # still silent when the limit is reached: the segment ends there, without waiting for min silence
+    probs = frames((1.0, 86), (0.0, 10), (1.0, 10), (0.0, 20))
+    segments = run(probs, max_speech_duration_s=3, min_silence_duration_ms=1000)
+    assert segments[0] == [0, 86 * WINDOW + 480]
+    assert segments[1][0] == 96 * WINDOW - 480
+
+
+def test_cut_without_pause():
+    probs = frames((1.0, 500), (0.0, 10))
+    segments = run(probs, max_speech_duration_s=2)
+    assert len(segments) > 1
+    # consecutive pieces, nothing lost or repeated at the cuts
+    for previous, segment in zip(segments, segments[1:]):
+        assert previous[1] == segment[0]
+
+
+def test_segments_bounded():
+    for probs in synthetic_traces():
+        for max_speech_duration_s in [0.5, 1, 3]:
+            segments = run(list(probs), max_speech_duration_s=max_speech_duration_s)
+            closed = [(start, end) for start, end in segments if end is not None]
+            assert all(end - start <= max_speech_duration_s * 16000 + WINDOW for start, end in closed)
+            bounds = np.array([bound for segment in segments for bound in segment if bound is not None])
+            assert np.all(np.diff(bounds) >= 0)
+
+
+def test_pause_events():
+    probs = frames((1.0, 20), (0.0, 2), (1.0, 20), (0.0, 10))
+    iterator = VADIterator(ProbsModel(probs), speech_pause_events=True)
+    events = [speech_dict for speech_dict in (iterator.process_speech_prob(prob, WINDOW) for prob in probs) if speech_dict]
+    assert events == [{'start': 0},
+                      {'pause': 20 * WINDOW + 480}, {'resume': 22 * WINDOW},
+                      {'pause': 42 * WINDOW + 480}, {'end': 42 * WINDOW + 480}]
+
+
+def test_split_at_resumed_pause():
+    # speech resumes on the frame reaching the limit, and the split takes the pause that just
+    # ended: its end settles the pause, there is no resume of it
+    probs = frames((1.0, 80), (0.0, 11), (1.0, 20), (0.0, 10))
+    iterator = VADIterator(ProbsModel(probs), speech_pause_events=True, max_speech_duration_s=3,
+                           min_silence_duration_ms=1000)
+    events = [speech_dict for speech_dict in (iterator.process_speech_prob(prob, WINDOW) for prob in probs) if speech_dict]
+    pause_start = 80 * WINDOW
+    assert events[:3] == [{'start': 0}, {'pause': pause_start + 480},
+                          {'end': pause_start + 480, 'start': pause_start + 11 * WINDOW - 480}]
+
+
+def test_pause_events_dont_change_segments():
+    for probs in synthetic_traces():
+        for params in [{}, {'max_speech_duration_s': 1}, {'min_silence_duration_ms': 0}]:
+            probs = list(probs)
+            iterator = VADIterator(ProbsModel(probs), speech_pause_events=True, **params)
+            paused = None  # end of the pending pause
+            for prob in probs:
+                speech_dict = iterator.process_speech_prob(prob, WINDOW) or {}
+                # a pause is settled by the next end or resume (not both), resumes only follow pauses
+                assert paused is not None or 'resume' not in speech_dict
+                assert not ('resume' in speech_dict and speech_dict.get('end') == paused)
+                if 'resume' in speech_dict or 'end' in speech_dict:
+                    paused = None
+                if 'pause' in speech_dict:
+                    assert paused is None
+                    paused = speech_dict['pause']
+            assert run(probs, speech_pause_events=True, **params) == run(probs, **params)
+
+
+if __name__ == '__main__':
+    test_no_limit_unchanged()
+    test_split_at_longest_pause()
+    test_split_at_last_pause()
+    test_split_at_ongoing_pause()
+    test_cut_without_pause()
+    test_segments_bounded()
+    test_pause_events()
+    test_split_at_resumed_pause()
+    test_pause_events_dont_change_segments()
+    print('ok')
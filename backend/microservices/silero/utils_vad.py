@@ -1,16 +1,124 @@
-import torch
-import torchaudio
+from __future__ import annotations
+
+import functools
+import hashlib
+import importlib
+import math
+import numpy as np
+import os
 from typing import Callable, List
 import warnings
 
+
+class _LazyModule():
+    """Module imported on first attribute access
+
+    Only the torch based helpers (read_audio, save_audio, init_jit_model, get_speech_timestamps,
+    collect_chunks, ...) need torch/torchaudio. The onnx streaming path (NumpyOnnxStream,
+    VADIterator on numpy chunks, get_speech_probs, read_audio_blocks on WAV files) never touches them, so it runs with just
+    numpy and onnxruntime installed and doesn't pay torch's import time and memory.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError as e:
+                raise ImportError(f"{self._name} is required for this function, "
+                                  f"only the onnx streaming path works without it") from e
+        return getattr(self._module, attr)
+
+
+torch = _LazyModule('torch')
+torchaudio = _LazyModule('torchaudio')
+
+
+def _no_grad(func):
+    """torch.no_grad() as a decorator, without importing torch before the first call"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with torch.no_grad():
+            return func(*args, **kwargs)
+    return wrapper
+
+
 languages = ['ru', 'en', 'de', 'es']
 
 
+class OnnxState():
+    """Recurrent state of a single audio stream (kept apart from the shared onnx session)"""
+
+    def __init__(self, batch_size=1):
+        self.reset(batch_size)
+
+    def reset(self, batch_size=1):
+        self.state = torch.zeros((2, batch_size, 128)).float()
+        self.context = torch.zeros(0)
+        self.last_sr = 0
+        self.last_batch_size = 0
+
+
+class NumpyOnnxState():
+    """Preallocated numpy buffers of a stream with a fixed sample rate and batch size
+
+    `input` holds the context followed by the current frame, so the context never has
+    to be concatenated. The recurrent state ping-pongs between two buffers which are
+    bound to the session once (onnxruntime IOBinding), so inference writes the new
+    state and output in place instead of allocating them on every call.
+    """
+
+    def __init__(self, sr: int = 16000, batch_size: int = 1):
+        self.sr = sr
+        self.batch_size = batch_size
+        self.num_samples = 512 if sr == 16000 else 256
+        self.context_size = 64 if sr == 16000 else 32
+
+        self.input = np.zeros((batch_size, self.context_size + self.num_samples), dtype=np.float32)
+        self.states = [np.zeros((2, batch_size, 128), dtype=np.float32) for _ in range(2)]
+        self.current = 0
+        self.output = np.zeros((batch_size, 1), dtype=np.float32)
+        self.sr_array = np.array(sr, dtype=np.int64)
+
+        self._session = None
+        self._bindings = None
+
+    @property
+    def state(self):
+        return self.states[self.current]
+
+    def reset(self):
+        self.input.fill(0)
+        self.state.fill(0)
+
+    def bind(self, session):
+        """Bind the buffers to `session`, one binding per direction of the state ping-pong"""
+        self._bindings = []
+        for i in range(2):
+            binding = session.io_binding()
+            binding.bind_cpu_input('input', self.input)
+            binding.bind_cpu_input('state', self.states[i])
+            binding.bind_cpu_input('sr', self.sr_array)
+            binding.bind_output('output', 'cpu', 0, np.float32, self.output.shape, self.output.ctypes.data)
+            state_out = self.states[1 - i]
+            binding.bind_output('stateN', 'cpu', 0, np.float32, state_out.shape, state_out.ctypes.data)
+            self._bindings.append(binding)
+        self._session = session
+
+    def __getstate__(self):
+        # bindings belong to a session and can't be pickled, they are re-created on first use
+        state = self.__dict__.copy()
+        state['_session'] = None
+        state['_bindings'] = None
+        return state
+
+
 class OnnxWrapper():
 
     def __init__(self, path, force_onnx_cpu=False):
-        import numpy as np
-        global np
         import onnxruntime
 
         opts = onnxruntime.SessionOptions()
@@ -22,13 +130,26 @@ class OnnxWrapper():
         else:
             self.session = onnxruntime.InferenceSession(path, sess_options=opts)
 
-        self.reset_states()
+        self.path = path
+        self._stream = None  # torch state of __call__, created on first use
+        self._fingerprint = None
         if '16k' in path:
             warnings.warn('This model support only 16000 sampling rate!')
             self.sample_rates = [16000]
         else:
             self.sample_rates = [8000, 16000]
 
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the model file, identifies the model in SpeechProbsCache keys"""
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            with open(self.path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
     def _validate_input(self, x, sr: int):
         if x.dim() == 1:
             x = x.unsqueeze(0)
@@ -48,12 +169,23 @@ class OnnxWrapper():
         return x, sr
 
     def reset_states(self, batch_size=1):
-        self._state = torch.zeros((2, batch_size, 128)).float()
-        self._context = torch.zeros(0)
-        self._last_sr = 0
-        self._last_batch_size = 0
+        if self._stream is not None:
+            self._stream.reset(batch_size)
+
+    def new_stream(self):
+        """Create a per-stream model handle that shares this wrapper's onnx session"""
+        return OnnxStream(self)
+
+    def new_numpy_stream(self, sampling_rate: int = 16000):
+        """Create a torch-free per-stream model handle (see NumpyOnnxStream)"""
+        return NumpyOnnxStream(self, sampling_rate)
 
     def __call__(self, x, sr: int):
+        if self._stream is None:
+            self._stream = OnnxState()
+        return self.forward(x, sr, self._stream)
+
+    def forward(self, x, sr: int, stream: OnnxState):
 
         x, sr = self._validate_input(x, sr)
         num_samples = 512 if sr == 16000 else 256
@@ -64,32 +196,78 @@ class OnnxWrapper():
         batch_size = x.shape[0]
         context_size = 64 if sr == 16000 else 32
 
-        if not self._last_batch_size:
-            self.reset_states(batch_size)
-        if (self._last_sr) and (self._last_sr != sr):
-            self.reset_states(batch_size)
-        if (self._last_batch_size) and (self._last_batch_size != batch_size):
-            self.reset_states(batch_size)
+        if not stream.last_batch_size:
+            stream.reset(batch_size)
+        if (stream.last_sr) and (stream.last_sr != sr):
+            stream.reset(batch_size)
+        if (stream.last_batch_size) and (stream.last_batch_size != batch_size):
+            stream.reset(batch_size)
 
-        if not len(self._context):
-            self._context = torch.zeros(batch_size, context_size)
+        if not len(stream.context):
+            stream.context = torch.zeros(batch_size, context_size)
 
-        x = torch.cat([self._context, x], dim=1)
+        x = torch.cat([stream.context, x], dim=1)
         if sr in [8000, 16000]:
-            ort_inputs = {'input': x.numpy(), 'state': self._state.numpy(), 'sr': np.array(sr, dtype='int64')}
+            ort_inputs = {'input': x.numpy(), 'state': stream.state.numpy(), 'sr': np.array(sr, dtype='int64')}
             ort_outs = self.session.run(None, ort_inputs)
             out, state = ort_outs
-            self._state = torch.from_numpy(state)
+            stream.state = torch.from_numpy(state)
         else:
             raise ValueError()
 
-        self._context = x[..., -context_size:]
-        self._last_sr = sr
-        self._last_batch_size = batch_size
+        stream.context = x[..., -context_size:]
+        stream.last_sr = sr
+        stream.last_batch_size = batch_size
 
         out = torch.from_numpy(out)
         return out
 
+    def forward_numpy(self, x: np.ndarray, stream: NumpyOnnxState) -> np.ndarray:
+        """Fast path: run one float32 frame of shape (num_samples,) or (batch_size, num_samples)
+
+        No validation is done, the frame must match the stream's sample rate and batch size.
+        Returns the stream's output buffer of shape (batch_size, 1), which is overwritten
+        by the next call.
+        """
+        context_size = stream.context_size
+        stream.input[:, :context_size] = stream.input[:, -context_size:]
+        stream.input[:, context_size:] = x
+
+        if stream._session is not self.session:
+            stream.bind(self.session)
+        self.session.run_with_iobinding(stream._bindings[stream.current])
+        stream.current = 1 - stream.current
+
+        return stream.output
+
+    def forward_batch(self, xs: List[np.ndarray], streams: List[NumpyOnnxState]) -> np.ndarray:
+        """Run a single inference over frames coming from independent streams
+
+        Every stream contributes exactly one float32 frame and must be a batch_size=1
+        NumpyOnnxState; all streams must share the same sample rate. Per-stream state and
+        context are stacked into one batch and scattered back to the streams afterwards.
+
+        Returns a one dimensional array of speech probabilities, one per stream.
+        """
+        sr = streams[0].sr
+        if any(stream.sr != sr or stream.batch_size != 1 for stream in streams):
+            raise ValueError("Batched streams must share the sampling rate and have batch_size=1")
+        context_size = streams[0].context_size
+
+        x = np.empty((len(streams), context_size + streams[0].num_samples), dtype=np.float32)
+        for i, (frame, stream) in enumerate(zip(xs, streams)):
+            x[i, :context_size] = stream.input[0, -context_size:]
+            x[i, context_size:] = frame
+        state = np.concatenate([stream.state for stream in streams], axis=1)
+
+        out, state = self.session.run(None, {'input': x, 'state': state, 'sr': streams[0].sr_array})
+
+        for i, stream in enumerate(streams):
+            stream.input[0, -context_size:] = x[i, -context_size:]
+            stream.state[...] = state[:, i:i+1]
+
+        return out[:, 0]
+
     def audio_forward(self, x, sr: int):
         outs = []
         x, sr = self._validate_input(x, sr)
@@ -109,6 +287,58 @@ class OnnxWrapper():
         return stacked.cpu()
 
 
+class OnnxStream():
+    """Model handle for a single audio stream
+
+    Exposes the same `__call__` / `reset_states` interface as OnnxWrapper, so it
+    can be passed to VADIterator, but only owns the small recurrent state while the
+    onnx session (and weights) stay shared with the parent wrapper.
+    """
+
+    def __init__(self, wrapper: OnnxWrapper):
+        self.wrapper = wrapper
+        self.sample_rates = wrapper.sample_rates
+        self.stream = OnnxState()
+
+    def reset_states(self, batch_size=1):
+        self.stream.reset(batch_size)
+
+    def __call__(self, x, sr: int):
+        return self.wrapper.forward(x, sr, self.stream)
+
+
+class NumpyOnnxStream():
+    """Torch-free model handle for a single audio stream
+
+    Same interface as OnnxStream, but takes float32 numpy frames and returns numpy
+    arrays. The sample rate (and batch size) are fixed at creation, so inputs are not
+    validated on every call and all buffers are preallocated (see NumpyOnnxState).
+    """
+
+    def __init__(self, wrapper: OnnxWrapper, sampling_rate: int = 16000):
+        if sampling_rate not in wrapper.sample_rates:
+            raise ValueError(f"Supported sampling rates: {wrapper.sample_rates}")
+        self.wrapper = wrapper
+        self.sampling_rate = sampling_rate
+        self.sample_rates = [sampling_rate]
+        self.stream = NumpyOnnxState(sampling_rate)
+
+    def reset_states(self, batch_size=1):
+        self.stream.reset()
+
+    def __call__(self, x: np.ndarray, sr: int):
+        if sr != self.sampling_rate:
+            raise ValueError(f"This stream was created for sampling rate {self.sampling_rate}")
+        return self.wrapper.forward_numpy(x, self.stream)
+
+    def skip(self, x: np.ndarray):
+        """Take frame `x` as the context of the next frame without running the model
+
+        The recurrent state stays as it was after the last frame that was run.
+        """
+        self.stream.input[:, self.stream.context_size:] = x
+
+
 class Validator():
     def __init__(self, url, force_onnx_cpu):
         self.onnx = True if url.endswith('.onnx') else False
@@ -170,13 +400,259 @@ def save_audio(path: str,
     torchaudio.save(path, tensor.unsqueeze(0), sampling_rate, bits_per_sample=16)
 
 
+class StreamingResampler():
+    """Streaming rational resampler of float32 audio, from `input_rate` to `output_rate`
+
+    Same filter as scipy.signal.resample_poly: a Kaiser windowed sinc low-pass at the
+    lower of the two Nyquist frequencies, applied on the input upsampled by `up` and
+    decimated by `down` (output_rate / input_rate = up / down). Only the taps hitting
+    non-zero upsampled samples are evaluated: the filter is split into `up` phases of
+    `taps` coefficients, and every output sample is one dot product of its phase with
+    the last `taps` input samples. All output samples of a chunk are computed at once.
+
+    The filter delay is compensated, so output sample n is at the same time as input
+    sample n * down / up, as if the audio had been recorded at output_rate. The last
+    few output samples of a chunk wait for the next chunk (about `quality` input
+    samples), the history between chunks is kept, so splitting the input into chunks
+    doesn't change the output.
+    """
+
+    def __init__(self, input_rate: int, output_rate: int, quality: int = 10, beta: float = 5.0):
+        divisor = math.gcd(input_rate, output_rate)
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+
+        # filter over the upsampled signal, centered on half_len
+        max_rate = max(self.up, self.down)
+        self.half_len = quality * max_rate
+        t = np.arange(-self.half_len, self.half_len + 1)
+        h = np.sinc(t / max_rate) * np.kaiser(len(t), beta)
+        h *= self.up / h.sum()
+
+        # phases[p] = h[p::up], reversed so it lines up with input samples in time order
+        self.taps = -(-len(h) // self.up)
+        padded = np.zeros(self.taps * self.up)
+        padded[:len(h)] = h
+        self.phases = np.ascontiguousarray(padded.reshape(self.taps, self.up).T[:, ::-1], dtype=np.float32)
+
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)  # input samples before the next chunk
+        self._consumed = 0  # input samples received
+        self._produced = 0  # output samples produced
+
+    def output_samples(self, num_input_samples: int) -> int:
+        """Output samples available once `num_input_samples` input samples were received in total"""
+        # output n needs input (n * down + half_len) // up
+        return max(0, (self.up * num_input_samples - 1 - self.half_len) // self.down + 1)
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """Resample the next chunk, returns the float32 output samples that became available"""
+        from numpy.lib.stride_tricks import sliding_window_view
+
+        received = self._consumed + len(audio)
+        end = self.output_samples(received)
+        buffer = np.concatenate([self._history, np.asarray(audio, dtype=np.float32)])
+
+        n = np.arange(self._produced, end, dtype=np.int64) * self.down + self.half_len
+        # window of output n: input samples (n // up) - taps + 1 ... n // up
+        first = n // self.up - self.taps + 1 - (self._consumed - len(self._history))
+        # (an empty chunk leaves the buffer shorter than a window, and nothing to compute)
+        windows = sliding_window_view(buffer, self.taps) if len(n) else None
+        phases = n % self.up
+        output = np.empty(len(n), dtype=np.float32)
+        # in slices, so the gathered windows stay small for long chunks
+        for i in range(0, len(n), 4096):
+            output[i:i + 4096] = np.einsum('ij,ij->i', self.phases[phases[i:i + 4096]], windows[first[i:i + 4096]])
+
+        self._history = buffer[len(buffer) - len(self._history):]
+        self._consumed = received
+        self._produced = end
+        return output
+
+    def flush(self) -> np.ndarray:
+        """Output samples left at the end of the input (which is continued with silence), then reset
+
+        In total ceil(input samples * up / down) output samples are produced.
+        """
+        remaining = -(-self._consumed * self.up // self.down) - self._produced
+        output = self.process(np.zeros(self.taps, dtype=np.float32))[:max(0, remaining)]
+        self.reset()
+        return output
+
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _open_wav(path: str):
+    """(samples, sampling_rate) of a PCM or float WAV file, None for other files
+
+    samples is the data chunk memory-mapped as [frames, channels] (24 bit samples as
+    [frames, channels, 3] bytes), nothing is read before it is indexed. A data size
+    larger than the file, as left by recorders that never patched the header, is
+    clamped to the end of the file.
+    """
+    import struct
+
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:] != b'WAVE':
+            return None
+        file_size = os.fstat(f.fileno()).st_size
+
+        fmt = None
+        offset = 12
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            chunk_id, size = struct.unpack('<4sI', f.read(8))
+            if chunk_id == b'fmt ':
+                fmt = f.read(min(size, 40))
+            elif chunk_id == b'data':
+                data_offset = offset + 8
+                data_size = min(size, file_size - data_offset)
+                break
+            offset += 8 + size + (size & 1)
+        else:
+            return None
+
+    if fmt is None or len(fmt) < 16:
+        return None
+    format_tag, channels, sampling_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag = struct.unpack('<H', fmt[24:26])[0]
+
+    if format_tag == _WAVE_FORMAT_PCM and bits in (8, 16, 24, 32):
+        dtype = {8: np.uint8, 16: '<i2', 24: np.uint8, 32: '<i4'}[bits]
+    elif format_tag == _WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        dtype = {32: '<f4', 64: '<f8'}[bits]
+    else:
+        return None
+    if channels == 0 or block_align != channels * bits // 8:
+        return None
+
+    shape = (data_size // block_align, channels) + ((3,) if bits == 24 else ())
+    if shape[0] == 0:
+        return np.zeros(shape, dtype=dtype), sampling_rate
+    return np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=shape), sampling_rate
+
+
+def _wav_to_float32(samples: np.ndarray) -> np.ndarray:
+    """float32 [frames, channels] in [-1, 1] of WAV samples as returned by _open_wav"""
+    if samples.ndim == 3:
+        b = samples.astype(np.int32)
+        samples = ((b[..., 0] | (b[..., 1] << 8) | (b[..., 2] << 16)) ^ 0x800000) - 0x800000
+        return samples.astype(np.float32) / (1 << 23)
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float32) - 128) / 128
+    if samples.dtype.kind == 'i':
+        return samples.astype(np.float32) / (1 << (8 * samples.dtype.itemsize - 1))
+    return samples.astype(np.float32)
+
+
+def _decoded_blocks(path: str, frames_per_block: int):
+    """(float32 [frames, channels] block, sampling_rate) of a file WAV parsing can't handle, through torchaudio
+
+    Decodes incrementally with torchaudio's ffmpeg StreamReader where it is available,
+    otherwise the file is decoded at once by torchaudio.load (only then does memory
+    grow with the duration of the file).
+    """
+    try:
+        from torchaudio.io import StreamReader
+    except ImportError:
+        StreamReader = None
+
+    if StreamReader is not None:
+        reader = StreamReader(path)
+        sampling_rate = int(reader.get_src_stream_info(reader.default_audio_stream).sample_rate)
+        reader.add_basic_audio_stream(frames_per_chunk=frames_per_block)
+        for (chunk,) in reader.stream():
+            yield chunk.numpy().astype(np.float32, copy=False), sampling_rate
+    else:
+        wav, sampling_rate = torchaudio.load(path)
+        wav = wav.numpy().T
+        for start in range(0, len(wav), frames_per_block):
+            yield wav[start:start + frames_per_block], sampling_rate
+
+
+def read_audio_blocks(path: str,
+                      sampling_rate: int = 16000,
+                      block_size: int = 16000 * 10):
+    """
+    Read an audio file as consecutive mono float32 blocks of block_size samples at sampling_rate
+
+    The constant memory counterpart of read_audio, for recordings too long to load at
+    once: PCM (8, 16, 24, 32 bit) and float WAV files are memory-mapped and converted
+    a block at a time, other formats are decoded through torchaudio. Channels are
+    averaged and other rates resampled incrementally (see StreamingResampler).
+
+    Every block has block_size samples apart from the last one, which is shorter.
+    Feed them to iter_speech_timestamps (or get_speech_timestamps_from_blocks).
+    """
+    wav = _open_wav(path)
+    if wav is None:
+        source = _decoded_blocks(path, block_size)
+    else:
+        samples, file_sampling_rate = wav
+        frames_per_block = max(1, block_size * file_sampling_rate // sampling_rate)
+        source = ((_wav_to_float32(samples[start:start + frames_per_block]), file_sampling_rate)
+                  for start in range(0, len(samples), frames_per_block))
+
+    block = np.empty(block_size, dtype=np.float32)
+    filled = 0
+    for piece in _resampled_mono(source, sampling_rate):
+        while len(piece):
+            taken = min(len(piece), block_size - filled)
+            block[filled:filled + taken] = piece[:taken]
+            filled += taken
+            piece = piece[taken:]
+            if filled == block_size:
+                yield block
+                block = np.empty(block_size, dtype=np.float32)
+                filled = 0
+    if filled:
+        yield block[:filled]
+
+
+def _resampled_mono(source, sampling_rate: int):
+    """Mono float32 audio at sampling_rate of the ([frames, channels] block, rate) pairs of source"""
+    resampler = None
+    for samples, file_sampling_rate in source:
+        mono = samples.mean(axis=1, dtype=np.float32) if samples.shape[1] > 1 else samples[:, 0]
+        if file_sampling_rate == sampling_rate:
+            yield mono
+            continue
+        if resampler is None:
+            resampler = StreamingResampler(file_sampling_rate, sampling_rate)
+        yield resampler.process(mono)
+    if resampler is not None:
+        yield resampler.flush()
+
+
 def init_jit_model(model_path: str,
-                   device=torch.device('cpu')):
+                   device=None):
+    if device is None:
+        device = torch.device('cpu')
     model = torch.jit.load(model_path, map_location=device)
     model.eval()
     return model
 
 
+def load_silero_vad_onnx(model_path: str = None,
+                         force_onnx_cpu: bool = True) -> OnnxWrapper:
+    """Load the onnx silero VAD model, by default the one bundled with the silero-vad package"""
+    if model_path is None:
+        from importlib.util import find_spec
+        # locate the package without importing it (its __init__ loads the jit model helpers)
+        package_dir = find_spec('silero_vad').submodule_search_locations[0]
+        model_path = os.path.join(package_dir, 'data', 'silero_vad.onnx')
+    return OnnxWrapper(model_path, force_onnx_cpu=force_onnx_cpu)
+
+
 def make_visualization(probs, step):
     import pandas as pd
     pd.DataFrame({'probs': probs},
@@ -187,7 +663,7 @@ def make_visualization(probs, step):
                  colormap='tab20')
 
 
-@torch.no_grad()
+@_no_grad
 def get_speech_timestamps(audio: torch.Tensor,
                           model,
                           threshold: float = 0.5,
@@ -203,7 +679,8 @@ def get_speech_timestamps(audio: torch.Tensor,
                           neg_threshold: float = None,
                           window_size_samples: int = 512,
                           min_silence_at_max_speech: float = 98,
-                          use_max_poss_sil_at_max_speech: bool = True):
+                          use_max_poss_sil_at_max_speech: bool = True,
+                          cache: SpeechProbsCache = None):
 
     """
     This method is used for splitting long audios into speech chunks using silero VAD
@@ -260,11 +737,67 @@ def get_speech_timestamps(audio: torch.Tensor,
     window_size_samples: int (default - 512 samples)
         !!! DEPRECATED, DOES NOTHING !!!
 
+    cache: SpeechProbsCache (default - None)
+        On-disk cache of the speech probabilities: on audio already seen by the same
+        model only the post-processing runs (the model pass is skipped)
+
     Returns
     ----------
     speeches: list of dicts
         list containing ends and beginnings of speech chunks (samples or seconds based on return_seconds)
     """
+    audio, sampling_rate, step = _prepare_audio(audio, sampling_rate)
+
+    window_size_samples = 512 if sampling_rate == 16000 else 256
+    hop_size_samples = int(window_size_samples)
+
+    audio_length_samples = len(audio)
+
+    speech_probs = None
+    if cache is not None:
+        key = cache.key(audio.numpy(), sampling_rate, model)
+        speech_probs = cache.get(key)
+        if speech_probs is not None and progress_tracking_callback:
+            progress_tracking_callback(100)
+
+    if speech_probs is None:
+        model.reset_states()
+        speech_probs = []
+        for current_start_sample in range(0, audio_length_samples, hop_size_samples):
+            chunk = audio[current_start_sample: current_start_sample + window_size_samples]
+            if len(chunk) < window_size_samples:
+                chunk = torch.nn.functional.pad(chunk, (0, int(window_size_samples - len(chunk))))
+            speech_prob = model(chunk, sampling_rate).item()
+            speech_probs.append(speech_prob)
+            # caculate progress and seng it to callback function
+            progress = current_start_sample + hop_size_samples
+            if progress > audio_length_samples:
+                progress = audio_length_samples
+            progress_percent = (progress / audio_length_samples) * 100
+            if progress_tracking_callback:
+                progress_tracking_callback(progress_percent)
+        if cache is not None:
+            speech_probs = cache.put(key, speech_probs)
+
+    return get_speech_timestamps_from_probs(speech_probs, audio_length_samples, sampling_rate, step,
+                                            threshold=threshold,
+                                            min_speech_duration_ms=min_speech_duration_ms,
+                                            max_speech_duration_s=max_speech_duration_s,
+                                            min_silence_duration_ms=min_silence_duration_ms,
+                                            speech_pad_ms=speech_pad_ms,
+                                            return_seconds=return_seconds,
+                                            time_resolution=time_resolution,
+                                            visualize_probs=visualize_probs,
+                                            neg_threshold=neg_threshold,
+                                            min_silence_at_max_speech=min_silence_at_max_speech,
+                                            use_max_poss_sil_at_max_speech=use_max_poss_sil_at_max_speech)
+
+
+def _prepare_audio(audio, sampling_rate: int):
+    """Validate the audio of get_speech_timestamps, casting multiples of 16000 down to 16000
+
+    Returns (audio, sampling_rate, step), where step is the decimation factor applied.
+    """
     if not torch.is_tensor(audio):
         try:
             audio = torch.Tensor(audio)
@@ -288,137 +821,714 @@ def get_speech_timestamps(audio: torch.Tensor,
     if sampling_rate not in [8000, 16000]:
         raise ValueError("Currently silero VAD models support 8000 and 16000 (or multiply of 16000) sample rates")
 
+    return audio, sampling_rate, step
+
+
+def get_speech_timestamps_from_probs(speech_probs,
+                                     audio_length_samples: int,
+                                     sampling_rate: int,
+                                     step: int = 1,
+                                     threshold: float = 0.5,
+                                     min_speech_duration_ms: int = 250,
+                                     max_speech_duration_s: float = float('inf'),
+                                     min_silence_duration_ms: int = 100,
+                                     speech_pad_ms: int = 30,
+                                     return_seconds: bool = False,
+                                     time_resolution: int = 1,
+                                     visualize_probs: bool = False,
+                                     neg_threshold: float = None,
+                                     min_silence_at_max_speech: float = 98,
+                                     use_max_poss_sil_at_max_speech: bool = True):
+    """Post-processing of get_speech_timestamps: speech probabilities to padded speech chunks
+
+    Parameters are the same as in get_speech_timestamps, sampling_rate and audio_length_samples
+    refer to the audio the model actually saw (after casting to 16000), step is the decimation
+    factor applied to get there.
+    """
+    segmenter, speech_pad_samples = _speech_segmenter(sampling_rate,
+                                                      threshold=threshold,
+                                                      min_speech_duration_ms=min_speech_duration_ms,
+                                                      max_speech_duration_s=max_speech_duration_s,
+                                                      min_silence_duration_ms=min_silence_duration_ms,
+                                                      speech_pad_ms=speech_pad_ms,
+                                                      neg_threshold=neg_threshold,
+                                                      min_silence_at_max_speech=min_silence_at_max_speech,
+                                                      use_max_poss_sil_at_max_speech=use_max_poss_sil_at_max_speech)
+    speeches = segmenter.process(speech_probs) + segmenter.finish(audio_length_samples)
+    speeches = _pad_speech_segments(speeches, speech_pad_samples, audio_length_samples)
+
+    if return_seconds:
+        audio_length_seconds = audio_length_samples / sampling_rate
+        for speech_dict in speeches:
+            speech_dict['start'] = max(round(speech_dict['start'] / sampling_rate, time_resolution), 0)
+            speech_dict['end'] = min(round(speech_dict['end'] / sampling_rate, time_resolution), audio_length_seconds)
+    elif step > 1:
+        for speech_dict in speeches:
+            speech_dict['start'] *= step
+            speech_dict['end'] *= step
+
+    if visualize_probs:
+        make_visualization(speech_probs, segmenter.hop_size_samples / sampling_rate)
+
+    return speeches
+
+
+def _speech_segmenter(sampling_rate: int,
+                      threshold: float,
+                      min_speech_duration_ms: int,
+                      max_speech_duration_s: float,
+                      min_silence_duration_ms: int,
+                      speech_pad_ms: int,
+                      neg_threshold: float,
+                      min_silence_at_max_speech: float,
+                      use_max_poss_sil_at_max_speech: bool):
+    """(_SpeechSegmenter, speech_pad_samples) for the parameters of get_speech_timestamps"""
     window_size_samples = 512 if sampling_rate == 16000 else 256
     hop_size_samples = int(window_size_samples)
 
-    model.reset_states()
     min_speech_samples = sampling_rate * min_speech_duration_ms / 1000
     speech_pad_samples = sampling_rate * speech_pad_ms / 1000
     max_speech_samples = sampling_rate * max_speech_duration_s - window_size_samples - 2 * speech_pad_samples
     min_silence_samples = sampling_rate * min_silence_duration_ms / 1000
     min_silence_samples_at_max_speech = sampling_rate * min_silence_at_max_speech / 1000
 
-    audio_length_samples = len(audio)
-
-    speech_probs = []
-    for current_start_sample in range(0, audio_length_samples, hop_size_samples):
-        chunk = audio[current_start_sample: current_start_sample + window_size_samples]
-        if len(chunk) < window_size_samples:
-            chunk = torch.nn.functional.pad(chunk, (0, int(window_size_samples - len(chunk))))
-        try:
-            speech_prob = model(chunk, sampling_rate).item()
-        except Exception as e:
-            import ipdb; ipdb.set_trace()
-        speech_probs.append(speech_prob)
-        # caculate progress and seng it to callback function
-        progress = current_start_sample + hop_size_samples
-        if progress > audio_length_samples:
-            progress = audio_length_samples
-        progress_percent = (progress / audio_length_samples) * 100
-        if progress_tracking_callback:
-            progress_tracking_callback(progress_percent)
-
-    triggered = False
-    speeches = []
-    current_speech = {}
-
     if neg_threshold is None:
         neg_threshold = max(threshold - 0.15, 0.01)
-    temp_end = 0  # to save potential segment end (and tolerate some silence)
-    prev_end = next_start = 0  # to save potential segment limits in case of maximum segment size reached
-    possible_ends = []
-
-    for i, speech_prob in enumerate(speech_probs):
-        if (speech_prob >= threshold) and temp_end:
-            if temp_end != 0:
-                sil_dur = (hop_size_samples * i) - temp_end
-                if sil_dur > min_silence_samples_at_max_speech:
-                    possible_ends.append((temp_end, sil_dur))
-                temp_end = 0
-            if next_start < prev_end:
-                next_start = hop_size_samples * i
-
-        if (speech_prob >= threshold) and not triggered:
-            triggered = True
-            current_speech['start'] = hop_size_samples * i
-            continue
 
-        if triggered and (hop_size_samples * i) - current_speech['start'] > max_speech_samples:
-            if possible_ends:
-                if use_max_poss_sil_at_max_speech:
-                    prev_end, dur = max(possible_ends, key=lambda x: x[1])  # use the longest possible silence segment in the current speech chunk
-                else:
-                    prev_end, dur = possible_ends[-1]   # use the last possible silence segement
-                current_speech['end'] = prev_end
-                speeches.append(current_speech)
-                current_speech = {}
-                next_start = prev_end + dur
-                if next_start < prev_end + hop_size_samples * i:  # previously reached silence (< neg_thres) and is still not speech (< thres)
-                    #triggered = False
-                    current_speech['start'] = next_start
-                else:
-                    triggered = False
-                    #current_speech['start'] = next_start
-                prev_end = next_start = temp_end = 0
-                possible_ends = []
+    segmenter = _SpeechSegmenter(hop_size_samples,
+                                 threshold=threshold,
+                                 neg_threshold=neg_threshold,
+                                 min_speech_samples=min_speech_samples,
+                                 max_speech_samples=max_speech_samples,
+                                 min_silence_samples=min_silence_samples,
+                                 min_silence_samples_at_max_speech=min_silence_samples_at_max_speech,
+                                 use_max_poss_sil_at_max_speech=use_max_poss_sil_at_max_speech)
+    return segmenter, speech_pad_samples
+
+
+class _SpeechSegmenter():
+    """Segmentation pass of get_speech_timestamps (before padding), over consecutive blocks of probabilities
+
+    Runs the per-frame state machine only on the frames where its state can change:
+    threshold crossings, silences long enough to end a segment and max duration splits.
+    The frames in between are skipped with vectorized searches over the sorted indices of
+    speech (>= threshold) and silence (< neg_threshold) frames, so the Python loop runs
+    once per transition instead of once per frame.
+
+    None of the searches goes back before the frame after the last transition, so when a
+    block has no more transitions the machine waits for the next block at its end and no
+    probabilities are kept between blocks.
+    """
+
+    def __init__(self,
+                 hop_size_samples: int,
+                 threshold: float,
+                 neg_threshold: float,
+                 min_speech_samples: float,
+                 max_speech_samples: float,
+                 min_silence_samples: float,
+                 min_silence_samples_at_max_speech: float,
+                 use_max_poss_sil_at_max_speech: bool):
+        self.hop_size_samples = hop_size_samples
+        self.threshold = threshold
+        self.neg_threshold = neg_threshold
+        self.min_speech_samples = min_speech_samples
+        self.max_speech_samples = max_speech_samples
+        self.min_silence_samples = min_silence_samples
+        self.min_silence_samples_at_max_speech = min_silence_samples_at_max_speech
+        self.use_max_poss_sil_at_max_speech = use_max_poss_sil_at_max_speech
+
+        # number of frames after temp_end from which a silence frame ends the segment
+        silence_end_offset = max(0, math.ceil(min_silence_samples / hop_size_samples))
+        while silence_end_offset > 0 and hop_size_samples * (silence_end_offset - 1) >= min_silence_samples:
+            silence_end_offset -= 1
+        while hop_size_samples * silence_end_offset < min_silence_samples:
+            silence_end_offset += 1
+        self.silence_end_offset = silence_end_offset
+
+        self.num_frames = 0  # frames received so far
+        self.triggered = False
+        self.current_speech = {}
+        self.temp_end = 0  # to save potential segment end (and tolerate some silence)
+        self.prev_end = self.next_start = 0  # to save potential segment limits in case of maximum segment size reached
+        self.possible_ends = []
+
+    def process(self, speech_probs) -> List[dict]:
+        """Segments closed by the next block of speech probabilities"""
+        hop_size_samples = self.hop_size_samples
+        threshold = self.threshold
+        neg_threshold = self.neg_threshold
+        min_speech_samples = self.min_speech_samples
+        max_speech_samples = self.max_speech_samples
+        min_silence_samples = self.min_silence_samples
+        min_silence_samples_at_max_speech = self.min_silence_samples_at_max_speech
+        silence_end_offset = self.silence_end_offset
+
+        first_frame = self.num_frames
+        speech_probs = np.asarray(speech_probs, dtype=np.float64)
+        num_frames = first_frame + len(speech_probs)
+        speech_frames = first_frame + np.flatnonzero(speech_probs >= threshold)
+        silence_frames = first_frame + np.flatnonzero(speech_probs < neg_threshold)
+
+        def next_frame(frames, i):
+            pos = np.searchsorted(frames, i)
+            return int(frames[pos]) if pos < len(frames) else num_frames
+
+        def split_frame(speech_start, i):
+            # first frame from i at which the current speech exceeds max_speech_samples
+            if math.isinf(max_speech_samples):
+                return num_frames
+            frame = max(i, math.floor((speech_start + max_speech_samples) / hop_size_samples))
+            while frame < num_frames and (hop_size_samples * frame) - speech_start <= max_speech_samples:
+                frame += 1
+            return frame
+
+        triggered = self.triggered
+        speeches = []
+        current_speech = self.current_speech
+        temp_end = self.temp_end
+        prev_end, next_start = self.prev_end, self.next_start
+        possible_ends = self.possible_ends
+
+        next_i = first_frame
+        while True:
+            # jump to the next frame where the state machine can change
+            if not triggered:
+                i = next_frame(speech_frames, next_i)
+            elif not temp_end:
+                i = min(next_frame(silence_frames, next_i),
+                        split_frame(current_speech['start'], next_i))
             else:
-                current_speech['end'] = hop_size_samples * i
-                speeches.append(current_speech)
-                current_speech = {}
-                prev_end = next_start = temp_end = 0
-                triggered = False
-                possible_ends = []
+                i = min(next_frame(speech_frames, next_i),
+                        next_frame(silence_frames, max(next_i, temp_end // hop_size_samples + silence_end_offset)),
+                        split_frame(current_speech['start'], next_i))
+            if i >= num_frames:
+                break
+            next_i = i + 1
+            speech_prob = speech_probs[i - first_frame]
+
+            if (speech_prob >= threshold) and temp_end:
+                if temp_end != 0:
+                    sil_dur = (hop_size_samples * i) - temp_end
+                    if sil_dur > min_silence_samples_at_max_speech:
+                        possible_ends.append((temp_end, sil_dur))
+                    temp_end = 0
+                if next_start < prev_end:
+                    next_start = hop_size_samples * i
+
+            if (speech_prob >= threshold) and not triggered:
+                triggered = True
+                current_speech['start'] = hop_size_samples * i
                 continue
 
-        if (speech_prob < neg_threshold) and triggered:
-            if not temp_end:
-                temp_end = hop_size_samples * i
-            # if ((hop_size_samples * i) - temp_end) > min_silence_samples_at_max_speech:  # condition to avoid cutting in very short silence
-            #     prev_end = temp_end
-            if (hop_size_samples * i) - temp_end < min_silence_samples:
-                continue
-            else:
-                current_speech['end'] = temp_end
-                if (current_speech['end'] - current_speech['start']) > min_speech_samples:
+            if triggered and (hop_size_samples * i) - current_speech['start'] > max_speech_samples:
+                if possible_ends:
+                    if self.use_max_poss_sil_at_max_speech:
+                        prev_end, dur = max(possible_ends, key=lambda x: x[1])  # use the longest possible silence segment in the current speech chunk
+                    else:
+                        prev_end, dur = possible_ends[-1]   # use the last possible silence segement
+                    current_speech['end'] = prev_end
                     speeches.append(current_speech)
-                current_speech = {}
-                prev_end = next_start = temp_end = 0
-                triggered = False
-                possible_ends = []
-                continue
+                    current_speech = {}
+                    next_start = prev_end + dur
+                    if next_start < prev_end + hop_size_samples * i:  # previously reached silence (< neg_thres) and is still not speech (< thres)
+                        #triggered = False
+                        current_speech['start'] = next_start
+                    else:
+                        triggered = False
+                        #current_speech['start'] = next_start
+                    prev_end = next_start = temp_end = 0
+                    possible_ends = []
+                else:
+                    current_speech['end'] = hop_size_samples * i
+                    speeches.append(current_speech)
+                    current_speech = {}
+                    prev_end = next_start = temp_end = 0
+                    triggered = False
+                    possible_ends = []
+                    continue
+
+            if (speech_prob < neg_threshold) and triggered:
+                if not temp_end:
+                    temp_end = hop_size_samples * i
+                # if ((hop_size_samples * i) - temp_end) > min_silence_samples_at_max_speech:  # condition to avoid cutting in very short silence
+                #     prev_end = temp_end
+                if (hop_size_samples * i) - temp_end < min_silence_samples:
+                    continue
+                else:
+                    current_speech['end'] = temp_end
+                    if (current_speech['end'] - current_speech['start']) > min_speech_samples:
+                        speeches.append(current_speech)
+                    current_speech = {}
+                    prev_end = next_start = temp_end = 0
+                    triggered = False
+                    possible_ends = []
+                    continue
+
+        self.num_frames = num_frames
+        self.triggered = triggered
+        self.current_speech = current_speech
+        self.temp_end = temp_end
+        self.prev_end, self.next_start = prev_end, next_start
+        self.possible_ends = possible_ends
+        return speeches
+
+    def next_speech_start(self):
+        """(start, certain) bounding the start of the next segment to be closed
+
+        The start of the open segment, certain when it is long enough to be kept whatever
+        comes next (a split keeps it too), otherwise a lower bound: a dropped segment is
+        followed by later ones. Without an open segment, the next one starts at a frame
+        not received yet.
+        """
+        position = self.hop_size_samples * self.num_frames
+        if not self.current_speech:
+            return position, False
+        start = self.current_speech['start']
+        # the segment can't end before a pending silence, or before the frames received so far
+        return start, (self.temp_end or position) - start > self.min_speech_samples
+
+    def finish(self, audio_length_samples: int) -> List[dict]:
+        """The segment still open at the end of the audio, if long enough"""
+        current_speech = self.current_speech
+        self.current_speech = {}
+        if current_speech and (audio_length_samples - current_speech['start']) > self.min_speech_samples:
+            current_speech['end'] = audio_length_samples
+            return [current_speech]
+        return []
+
+
+def _pad_speech_segments(speeches: List[dict],
+                         speech_pad_samples: float,
+                         audio_length_samples: int) -> List[dict]:
+    """Padding pass of get_speech_timestamps
+
+    Every segment is padded by speech_pad_samples on each side, except when the gap to the
+    next segment is shorter than two paddings, then the gap is split evenly between them.
+    """
+    if not speeches:
+        return speeches
+
+    starts = np.array([speech['start'] for speech in speeches], dtype=np.int64)
+    ends = np.array([speech['end'] for speech in speeches], dtype=np.int64)
+
+    silence_durations = starts[1:] - ends[:-1]
+    short_silences = silence_durations < 2 * speech_pad_samples
+    half_silences = silence_durations // 2
+
+    padded_starts = np.empty(len(starts), dtype=np.float64)
+    padded_starts[0] = max(0, starts[0] - speech_pad_samples)
+    padded_starts[1:] = np.maximum(0, np.where(short_silences,
+                                               starts[1:] - half_silences,
+                                               starts[1:] - speech_pad_samples))
+
+    padded_ends = np.minimum(audio_length_samples, ends + speech_pad_samples)
+    padded_ends[:-1] = np.where(short_silences, ends[:-1] + half_silences, padded_ends[:-1])
+
+    # astype truncates towards zero like int()
+    return [{'start': start, 'end': end}
+            for start, end in zip(padded_starts.astype(np.int64).tolist(),
+                                  padded_ends.astype(np.int64).tolist())]
+
+
+def _pad_speech_segment(speech: dict,
+                        previous_end: int,
+                        next_start: int,
+                        speech_pad_samples: float,
+                        audio_length_samples: int) -> dict:
+    """Padding of a single segment as in _pad_speech_segments, given its neighbours (None for none)"""
+    start, end = speech['start'], speech['end']
+    if previous_end is not None and start - previous_end < 2 * speech_pad_samples:
+        padded_start = max(0, start - (start - previous_end) // 2)
+    else:
+        padded_start = max(0, start - speech_pad_samples)
+    if next_start is not None and next_start - end < 2 * speech_pad_samples:
+        padded_end = end + (next_start - end) // 2
+    else:
+        padded_end = min(audio_length_samples, end + speech_pad_samples)
+    return {'start': int(padded_start), 'end': int(padded_end)}
 
-    if current_speech and (audio_length_samples - current_speech['start']) > min_speech_samples:
-        current_speech['end'] = audio_length_samples
-        speeches.append(current_speech)
-
-    for i, speech in enumerate(speeches):
-        if i == 0:
-            speech['start'] = int(max(0, speech['start'] - speech_pad_samples))
-        if i != len(speeches) - 1:
-            silence_duration = speeches[i+1]['start'] - speech['end']
-            if silence_duration < 2 * speech_pad_samples:
-                speech['end'] += int(silence_duration // 2)
-                speeches[i+1]['start'] = int(max(0, speeches[i+1]['start'] - silence_duration // 2))
-            else:
-                speech['end'] = int(min(audio_length_samples, speech['end'] + speech_pad_samples))
-                speeches[i+1]['start'] = int(max(0, speeches[i+1]['start'] - speech_pad_samples))
-        else:
-            speech['end'] = int(min(audio_length_samples, speech['end'] + speech_pad_samples))
 
-    if return_seconds:
-        audio_length_seconds = audio_length_samples / sampling_rate
-        for speech_dict in speeches:
+class SpeechProbsCache():
+    """Opt-in on-disk cache of per-frame speech probabilities, for re-running the post-processing
+
+    Entries are keyed by a hash of the audio content, its sampling rate and the model
+    (see OnnxWrapper.fingerprint), so any change of the audio or the model misses, and
+    stored as .npy files of `dtype` (float16 halves the size, probabilities change by
+    less than 0.001), which are memory-mapped when read. Results with a cache are the
+    same whether it hits or misses, as the probabilities are rounded to `dtype` either
+    way. Least recently used entries are deleted when the files exceed max_size_bytes.
+
+    Writes are atomic, so processes can share a directory.
+    """
+
+    def __init__(self, directory: str, max_size_bytes: int = 1 << 30, dtype=np.float16):
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        self.dtype = np.dtype(dtype)
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, audio: np.ndarray, sampling_rate: int, model) -> str:
+        """Cache key of the probabilities of one dimensional float32 audio at sampling_rate by model"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f'{_model_fingerprint(model)}:{sampling_rate}:{self.dtype.str}:'.encode())
+        digest.update(np.ascontiguousarray(audio, dtype=np.float32).data)
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """The cached probabilities (memory-mapped, read only), None if not cached"""
+        path = self._path(key)
+        try:
+            os.utime(path)  # the modification time orders the entries for eviction
+            return np.load(path, mmap_mode='r')
+        except FileNotFoundError:  # never cached, or evicted by another process
+            return None
+        except ValueError:  # not a .npy file, store again
+            os.remove(path)
+            return None
+
+    def put(self, key: str, speech_probs) -> np.ndarray:
+        """Cache speech_probs under key, returns them rounded to the cache dtype"""
+        speech_probs = np.asarray(speech_probs, dtype=self.dtype)
+        path = self._path(key)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            np.save(f, speech_probs)
+        os.replace(temp_path, path)
+        self._evict()
+        return speech_probs
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.npy')
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npy'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def _model_fingerprint(model) -> str:
+    """Identity of a model for SpeechProbsCache: the hash of an onnx model file, or of a torch model's weights
+
+    Streams (OnnxStream, NumpyOnnxStream) are identified by the OnnxWrapper they share.
+    """
+    if isinstance(model, (OnnxStream, NumpyOnnxStream)):
+        model = model.wrapper  # per-stream handles share their wrapper's model
+    if isinstance(model, OnnxWrapper):
+        return model.fingerprint
+    if isinstance(model, torch.nn.Module):
+        digest = hashlib.sha256()
+        for name, tensor in model.state_dict().items():
+            digest.update(name.encode())
+            digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+        return digest.hexdigest()
+    raise TypeError(f"Can't identify a {type(model).__name__} model for the speech probabilities cache")
+
+
+def get_speech_probs(audio: np.ndarray,
+                     model: OnnxWrapper,
+                     sampling_rate: int = 16000,
+                     cache: SpeechProbsCache = None) -> np.ndarray:
+    """
+    Per-frame speech probabilities of a whole audio, through the torch-free fast path
+
+    audio: np.ndarray, one dimensional float32 audio at 8000 or 16000
+    model: onnx model (OnnxWrapper), a fresh stream is used so its state starts from zero
+    cache: SpeechProbsCache, looked up first and filled on a miss (default - None, no cache)
+
+    Returns a float32 array with one probability per 512 (256 for 8000) samples frame,
+    the last frame being zero padded (an array of the cache's dtype with a cache).
+    """
+    if cache is not None:
+        key = cache.key(audio, sampling_rate, model)
+        speech_probs = cache.get(key)
+        if speech_probs is None:
+            speech_probs = cache.put(key, get_speech_probs(audio, model, sampling_rate))
+        return speech_probs
+
+    stream = model.new_numpy_stream(sampling_rate)
+    num_samples = stream.stream.num_samples
+    num_frames = -(-len(audio) // num_samples)
+    if len(audio) % num_samples:
+        audio = np.pad(audio, (0, num_frames * num_samples - len(audio)))
+    audio = np.ascontiguousarray(audio, dtype=np.float32)
+
+    probs = np.empty(num_frames, dtype=np.float32)
+    for i in range(num_frames):
+        probs[i] = stream(audio[i * num_samples:(i + 1) * num_samples], sampling_rate).item()
+    return probs
+
+
+def _block_speech_probs(blocks, model: OnnxWrapper, sampling_rate: int = 16000):
+    """(speech probabilities, samples) of every block, frames spanning two blocks are scored with the later one
+
+    Only the samples of an incomplete last frame are carried between blocks, the zero
+    padded last frame is scored at the end (with 0 samples), like in get_speech_probs.
+    """
+    stream = model.new_numpy_stream(sampling_rate)
+    num_samples = stream.stream.num_samples
+    carried = np.zeros(0, dtype=np.float32)
+    for block in blocks:
+        block = np.asarray(block, dtype=np.float32)
+        audio = np.concatenate([carried, block]) if len(carried) else block
+        num_frames = len(audio) // num_samples
+        probs = np.empty(num_frames, dtype=np.float32)
+        for i in range(num_frames):
+            probs[i] = stream(audio[i * num_samples:(i + 1) * num_samples], sampling_rate).item()
+        carried = audio[num_frames * num_samples:]
+        yield probs, len(block)
+    if len(carried):
+        frame = np.pad(carried, (0, num_samples - len(carried)))
+        yield np.array([stream(frame, sampling_rate).item()], dtype=np.float32), 0
+
+
+def iter_speech_timestamps(blocks,
+                           model: OnnxWrapper,
+                           threshold: float = 0.5,
+                           sampling_rate: int = 16000,
+                           min_speech_duration_ms: int = 250,
+                           max_speech_duration_s: float = float('inf'),
+                           min_silence_duration_ms: int = 100,
+                           speech_pad_ms: int = 30,
+                           return_seconds: bool = False,
+                           time_resolution: int = 1,
+                           progress_tracking_callback: Callable[[float], None] = None,
+                           neg_threshold: float = None,
+                           min_silence_at_max_speech: float = 98,
+                           use_max_poss_sil_at_max_speech: bool = True):
+    """
+    get_speech_timestamps of audio given as consecutive blocks, yielding every speech chunk as soon as it is final
+
+    Blocks (one dimensional float32 at 8000 or 16000, of any length, e.g. from
+    read_audio_blocks) are scored as they come and segmented right away, nothing of
+    them is kept. A closed segment waits for what can still change its padding: the
+    start of the next segment when it may come closer than two paddings, and the
+    end of the audio when it may come before the padded end. With a long enough
+    min_speech_duration_ms that is typically a few hundred ms after its end.
+
+    The chunks are the ones of get_speech_timestamps on the concatenated blocks, with
+    the same parameters, apart from progress_tracking_callback, which gets the number
+    of seconds processed so far (the total isn't known in advance).
+    """
+    segmenter, speech_pad_samples = _speech_segmenter(sampling_rate,
+                                                      threshold=threshold,
+                                                      min_speech_duration_ms=min_speech_duration_ms,
+                                                      max_speech_duration_s=max_speech_duration_s,
+                                                      min_silence_duration_ms=min_silence_duration_ms,
+                                                      speech_pad_ms=speech_pad_ms,
+                                                      neg_threshold=neg_threshold,
+                                                      min_silence_at_max_speech=min_silence_at_max_speech,
+                                                      use_max_poss_sil_at_max_speech=use_max_poss_sil_at_max_speech)
+
+    def padded(speech, next_start, audio_length_samples):
+        speech_dict = _pad_speech_segment(speech, previous_end, next_start, speech_pad_samples, audio_length_samples)
+        if return_seconds:
             speech_dict['start'] = max(round(speech_dict['start'] / sampling_rate, time_resolution), 0)
-            speech_dict['end'] = min(round(speech_dict['end'] / sampling_rate, time_resolution), audio_length_seconds)
-    elif step > 1:
-        for speech_dict in speeches:
-            speech_dict['start'] *= step
-            speech_dict['end'] *= step
+            speech_dict['end'] = min(round(speech_dict['end'] / sampling_rate, time_resolution),
+                                     audio_length_samples / sampling_rate)
+        return speech_dict
+
+    pending = []  # closed segments, not padded yet
+    previous_end = None  # end of the last yielded segment, before padding
+    audio_length_samples = 0
+    for probs, num_samples in _block_speech_probs(blocks, model, sampling_rate):
+        audio_length_samples += num_samples
+        pending.extend(segmenter.process(probs))
+        # (the zero padded last frame reaches past the audio, everything left is settled by finish)
+        while pending and num_samples:
+            speech = pending[0]
+            if len(pending) > 1:
+                next_start, certain = pending[1]['start'], True
+            else:
+                next_start, certain = segmenter.next_speech_start()
+            if not certain and next_start - speech['end'] < 2 * speech_pad_samples:
+                break
+            speech_dict = padded(speech, next_start if certain else None, audio_length_samples)
+            if return_seconds and speech_dict['end'] == audio_length_samples / sampling_rate:
+                break  # rounded up to the audio received so far, it depends on where the audio ends
+            yield speech_dict
+            previous_end = speech['end']
+            pending.pop(0)
+        if progress_tracking_callback:
+            progress_tracking_callback(audio_length_samples / sampling_rate)
 
-    if visualize_probs:
-        make_visualization(speech_probs, hop_size_samples / sampling_rate)
+    pending.extend(segmenter.finish(audio_length_samples))
+    for i, speech in enumerate(pending):
+        yield padded(speech, pending[i + 1]['start'] if i + 1 < len(pending) else None, audio_length_samples)
+        previous_end = speech['end']
 
-    return speeches
+
+def get_speech_timestamps_from_blocks(blocks, model: OnnxWrapper, **kwargs) -> List[dict]:
+    """
+    get_speech_timestamps of audio given as consecutive blocks, e.g. by read_audio_blocks
+
+    The list of iter_speech_timestamps, memory doesn't depend on the length of the audio.
+    Keyword arguments are the ones of iter_speech_timestamps.
+    """
+    return list(iter_speech_timestamps(blocks, model, **kwargs))
+
+
+# Model of a sharding worker process, loaded once per worker
+_shard_model = None
+
+
+def _init_shard_worker(model_path: str = None):
+    global _shard_model
+    _shard_model = load_silero_vad_onnx(model_path)
+
+
+def _shard_speech_probs(audio: np.ndarray, sampling_rate: int, warmup_frames: int) -> np.ndarray:
+    """Speech probabilities of one shard, dropping the first warmup_frames (state warm-up only)"""
+    return get_speech_probs(audio, _shard_model, sampling_rate)[warmup_frames:]
+
+
+def get_speech_probs_sharded(audio,
+                             sampling_rate: int = 16000,
+                             num_workers: int = None,
+                             shard_duration_s: float = 300,
+                             warmup_duration_s: float = 10,
+                             model_path: str = None) -> np.ndarray:
+    """
+    Per-frame speech probabilities of a long audio, computed in parallel shards
+
+    The audio is split into shards of shard_duration_s that are processed by a pool of
+    num_workers processes, each with its own onnx model. Every shard starts from a fresh
+    model state, which is warmed up on the last warmup_duration_s of the previous shard
+    before its own frames are scored. The probabilities are then stitched back together.
+
+    Warm-up makes the result close to, but not exactly the same as, a sequential pass,
+    see sharding_drift to pick a warm-up length.
+
+    Parameters
+    ----------
+    audio: torch.Tensor or np.ndarray, one dimensional
+        Audio at sampling_rate (multiples of 16000 are casted to 16000 like in get_speech_timestamps)
+
+    num_workers: int (default - os.cpu_count())
+        Size of the process pool
+
+    shard_duration_s: float (default - 300 seconds)
+        Duration of the audio scored by one shard
+
+    warmup_duration_s: float (default - 10 seconds)
+        Overlap taken from the previous shard to warm up the recurrent state
+
+    model_path: str (default - None)
+        Path of the onnx model, the one bundled with silero-vad if None
+
+    Returns
+    ----------
+    speech_probs: np.ndarray
+        float32 speech probability of every window_size_samples frame (the last one zero padded)
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    audio, sampling_rate, _ = _prepare_audio(audio, sampling_rate)
+    audio = audio.numpy().astype(np.float32)
+
+    num_samples = 512 if sampling_rate == 16000 else 256
+    num_frames = -(-len(audio) // num_samples)
+    audio = np.pad(audio, (0, num_frames * num_samples - len(audio)))
+
+    if math.isinf(shard_duration_s):
+        shard_frames = max(1, num_frames)
+    else:
+        shard_frames = max(1, round(shard_duration_s * sampling_rate / num_samples))
+    warmup_frames = max(0, round(warmup_duration_s * sampling_rate / num_samples))
+
+    shards = []
+    for first_frame in range(0, num_frames, shard_frames):
+        warmup = min(warmup_frames, first_frame)
+        last_frame = min(first_frame + shard_frames, num_frames)
+        shards.append((audio[(first_frame - warmup) * num_samples:last_frame * num_samples], warmup))
+
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, len(shards)))
+
+    with ProcessPoolExecutor(max_workers=num_workers,
+                             initializer=_init_shard_worker,
+                             initargs=(model_path,),
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(_shard_speech_probs, shard, sampling_rate, warmup) for shard, warmup in shards]
+        speech_probs = [future.result() for future in futures]
+
+    return np.concatenate(speech_probs) if speech_probs else np.zeros(0, dtype=np.float32)
+
+
+def get_speech_timestamps_sharded(audio,
+                                  sampling_rate: int = 16000,
+                                  num_workers: int = None,
+                                  shard_duration_s: float = 300,
+                                  warmup_duration_s: float = 10,
+                                  model_path: str = None,
+                                  **kwargs):
+    """
+    get_speech_timestamps for long audios, with the model pass sharded across processes
+
+    See get_speech_probs_sharded for the sharding parameters, other keyword arguments
+    (threshold, min_speech_duration_ms, return_seconds, ...) are the ones of get_speech_timestamps.
+    """
+    speech_probs = get_speech_probs_sharded(audio, sampling_rate,
+                                            num_workers=num_workers,
+                                            shard_duration_s=shard_duration_s,
+                                            warmup_duration_s=warmup_duration_s,
+                                            model_path=model_path)
+    audio, model_sampling_rate, step = _prepare_audio(audio, sampling_rate)
+    return get_speech_timestamps_from_probs(speech_probs, len(audio), model_sampling_rate, step, **kwargs)
+
+
+def sharding_drift(audio,
+                   sampling_rate: int = 16000,
+                   warmup_durations_s: List[float] = (0, 1, 5, 10, 30),
+                   shard_duration_s: float = 60,
+                   num_workers: int = None,
+                   model_path: str = None,
+                   threshold: float = 0.5) -> List[dict]:
+    """
+    How far sharded speech probabilities drift from a sequential pass, for several warm-up lengths
+
+    Returns one dict per warm-up length with the max / mean absolute probability difference,
+    the fraction of frames landing on the other side of threshold, and whether
+    get_speech_timestamps (default parameters apart from threshold) gives the same chunks.
+    """
+    sequential = get_speech_probs_sharded(audio, sampling_rate, num_workers=1,
+                                          shard_duration_s=float('inf'), model_path=model_path)
+    prepared, model_sampling_rate, step = _prepare_audio(audio, sampling_rate)
+    expected = get_speech_timestamps_from_probs(sequential, len(prepared), model_sampling_rate, step, threshold=threshold)
+
+    report = []
+    for warmup_duration_s in warmup_durations_s:
+        sharded = get_speech_probs_sharded(audio, sampling_rate,
+                                           num_workers=num_workers,
+                                           shard_duration_s=shard_duration_s,
+                                           warmup_duration_s=warmup_duration_s,
+                                           model_path=model_path)
+        diff = np.abs(sharded.astype(np.float64) - sequential)
+        actual = get_speech_timestamps_from_probs(sharded, len(prepared), model_sampling_rate, step, threshold=threshold)
+        report.append({
+            'warmup_duration_s': warmup_duration_s,
+            'max_abs_diff': float(diff.max()) if len(diff) else 0.0,
+            'mean_abs_diff': float(diff.mean()) if len(diff) else 0.0,
+            'flipped_frames': float(np.mean((sharded >= threshold) != (sequential >= threshold))) if len(diff) else 0.0,
+            'same_timestamps': actual == expected,
+        })
+    return report
 
 
 class VADIterator:
@@ -427,7 +1537,11 @@ class VADIterator:
                  threshold: float = 0.5,
                  sampling_rate: int = 16000,
                  min_silence_duration_ms: int = 100,
-                 speech_pad_ms: int = 30
+                 speech_pad_ms: int = 30,
+                 max_speech_duration_s: float = float('inf'),
+                 min_silence_at_max_speech: float = 98,
+                 use_max_poss_sil_at_max_speech: bool = True,
+                 speech_pause_events: bool = False
                  ):
 
         """
@@ -449,6 +1563,24 @@ class VADIterator:
 
         speech_pad_ms: int (default - 30 milliseconds)
             Final speech chunks are padded by speech_pad_ms each side
+
+        max_speech_duration_s: float (default - inf)
+            Speech chunks are not allowed to get longer than max_speech_duration_s: once exceeded, the
+            chunk is split at the longest pause (see use_max_poss_sil_at_max_speech) of more than
+            min_silence_at_max_speech since its start, or cut right away if there is none.
+            If speech goes on after the pause, the iterator returns {'end': ..., 'start': ...}:
+            the end of the split chunk and the start of the next one, which is already in progress.
+
+        min_silence_at_max_speech: float (default - 98ms)
+            Minimum silence duration in ms which is used to avoid abrupt cuts when max_speech_duration_s is reached
+
+        use_max_poss_sil_at_max_speech: bool (default - True)
+            Whether to use the maximum possible silence at max_speech_duration_s or not. If not, the last silence is used.
+
+        speech_pause_events: bool (default - False)
+            Return {'pause': ...} on the first silent chunk of a pause in speech, with the end the speech chunk
+            will get if the silence lasts min_silence_duration_ms. It is followed either by that {'end': ...}
+            or by {'resume': ...} (the sample where speech went on) when speech comes back before.
         """
 
         self.model = model
@@ -460,6 +1592,10 @@ class VADIterator:
 
         self.min_silence_samples = sampling_rate * min_silence_duration_ms / 1000
         self.speech_pad_samples = sampling_rate * speech_pad_ms / 1000
+        self.max_speech_samples = sampling_rate * max_speech_duration_s - 2 * self.speech_pad_samples
+        self.min_silence_samples_at_max_speech = sampling_rate * min_silence_at_max_speech / 1000
+        self.use_max_poss_sil_at_max_speech = use_max_poss_sil_at_max_speech
+        self.speech_pause_events = speech_pause_events
         self.reset_states()
 
     def reset_states(self):
@@ -468,12 +1604,15 @@ class VADIterator:
         self.triggered = False
         self.temp_end = 0
         self.current_sample = 0
+        self.speech_start = 0  # unpadded start of the current speech chunk
+        self.possible_ends = []  # (start, duration) of the pauses in the current speech chunk
+        self.paused = False  # a 'pause' was returned and not followed by 'end' / 'resume' yet
 
-    @torch.no_grad()
     def __call__(self, x, return_seconds=False, time_resolution: int = 1):
         """
-        x: torch.Tensor
-            audio chunk (see examples in repo)
+        x: torch.Tensor or np.ndarray
+            audio chunk (see examples in repo). float32 numpy chunks passed to an iterator
+            built on a NumpyOnnxStream skip torch entirely
 
         return_seconds: bool (default - False)
             whether return timestamps in seconds (default - samples)
@@ -482,6 +1621,14 @@ class VADIterator:
             time resolution of speech coordinates when requested as seconds
         """
 
+        if isinstance(x, np.ndarray) and isinstance(self.model, NumpyOnnxStream):
+            speech_prob = self.model(x, self.sampling_rate).item()
+            return self.process_speech_prob(speech_prob, x.shape[-1], return_seconds, time_resolution)
+
+        return self._call_torch(x, return_seconds, time_resolution)
+
+    @_no_grad
+    def _call_torch(self, x, return_seconds=False, time_resolution: int = 1):
         if not torch.is_tensor(x):
             try:
                 x = torch.Tensor(x)
@@ -489,36 +1636,164 @@ class VADIterator:
                 raise TypeError("Audio cannot be casted to tensor. Cast it manually")
 
         window_size_samples = len(x[0]) if x.dim() == 2 else len(x)
-        self.current_sample += window_size_samples
-
         speech_prob = self.model(x, self.sampling_rate).item()
 
+        return self.process_speech_prob(speech_prob, window_size_samples, return_seconds, time_resolution)
+
+    def process_speech_prob(self, speech_prob: float, window_size_samples: int,
+                            return_seconds=False, time_resolution: int = 1):
+        """
+        Advance the iterator with a speech probability computed outside of it (e.g. by batched inference)
+
+        speech_prob: float
+            model output for the next audio chunk of this stream
+
+        window_size_samples: int
+            number of samples in that chunk
+        """
+        self.current_sample += window_size_samples
+        resumed = None
+        resumed_pause = None
+
         if (speech_prob >= self.threshold) and self.temp_end:
+            # temp_end is the end of the first silent chunk of the pause
+            pause = self.current_sample - self.temp_end
+            if pause > self.min_silence_samples_at_max_speech:
+                self.possible_ends.append((self.temp_end - window_size_samples, pause))
+            if self.paused:
+                self.paused = False
+                resumed = {'resume': self._timestamp(self.current_sample - window_size_samples, return_seconds, time_resolution)}
+                resumed_pause = self.temp_end - window_size_samples
             self.temp_end = 0
 
         if (speech_prob >= self.threshold) and not self.triggered:
             self.triggered = True
+            self.speech_start = self.current_sample - window_size_samples
+            self.possible_ends = []
             speech_start = max(0, self.current_sample - self.speech_pad_samples - window_size_samples)
             return {'start': int(speech_start) if not return_seconds else round(speech_start / self.sampling_rate, time_resolution)}
 
+        if self.triggered and self.current_sample - self.speech_start > self.max_speech_samples:
+            return self._split_speech(window_size_samples, return_seconds, time_resolution, resumed, resumed_pause)
+
         if (speech_prob < self.threshold - 0.15) and self.triggered:
             if not self.temp_end:
                 self.temp_end = self.current_sample
             if self.current_sample - self.temp_end < self.min_silence_samples:
+                if self.speech_pause_events and not self.paused:
+                    self.paused = True
+                    speech_end = self.temp_end + self.speech_pad_samples - window_size_samples
+                    return {'pause': self._timestamp(speech_end, return_seconds, time_resolution)}
                 return None
             else:
                 speech_end = self.temp_end + self.speech_pad_samples - window_size_samples
                 self.temp_end = 0
                 self.triggered = False
+                self.paused = False
                 return {'end': int(speech_end) if not return_seconds else round(speech_end / self.sampling_rate, time_resolution)}
 
-        return None
+        return resumed
+
+    def _timestamp(self, sample, return_seconds=False, time_resolution: int = 1):
+        return int(sample) if not return_seconds else round(sample / self.sampling_rate, time_resolution)
+
+    def _split_speech(self, window_size_samples: int, return_seconds=False, time_resolution: int = 1,
+                      resumed=None, resumed_pause=None):
+        """End the current speech chunk, which got longer than max_speech_duration_s
+
+        Splits at the best pause since the chunk's start, including the one going on (which
+        ends the chunk like a regular end, and is used even when shorter than
+        min_silence_at_max_speech if there is no other), else cuts at the current sample.
+
+        `resumed` is the {'resume': ...} of this chunk, for the pause starting at `resumed_pause`.
+        It is returned along with the split, unless the split is at that very pause: its 'end'
+        then settles the 'pause' returned before, instead of the resume.
+        """
+        possible_ends = self.possible_ends
+        if self.temp_end:
+            ongoing = (self.temp_end - window_size_samples, self.current_sample - self.temp_end)
+            if ongoing[1] > self.min_silence_samples_at_max_speech or not possible_ends:
+                possible_ends = possible_ends + [ongoing]
+
+        if not possible_ends:
+            speech_end = next_start = self.speech_start = self.current_sample
+        else:
+            if self.use_max_poss_sil_at_max_speech:
+                pause_start, pause = max(possible_ends, key=lambda x: x[1])
+            else:
+                pause_start, pause = possible_ends[-1]
+            if pause < 2 * self.speech_pad_samples:
+                speech_end = next_start = pause_start + pause // 2
+            else:
+                speech_end = pause_start + self.speech_pad_samples
+                next_start = pause_start + pause - self.speech_pad_samples
+
+            if self.temp_end and pause_start == self.temp_end - window_size_samples:
+                # split at the ongoing pause: the chunk just ends, the next one starts when speech resumes
+                self.temp_end = 0
+                self.triggered = False
+                self.paused = False
+                self.possible_ends = []
+                return {'end': int(speech_end) if not return_seconds else round(speech_end / self.sampling_rate, time_resolution)}
+
+            self.speech_start = pause_start + pause
+            self.possible_ends = [(start, duration) for start, duration in self.possible_ends if start > pause_start]
+            if pause_start == resumed_pause:
+                resumed = None
+
+        speech_dict = {**(resumed or {}),
+                       'end': self._timestamp(speech_end, return_seconds, time_resolution),
+                       'start': self._timestamp(next_start, return_seconds, time_resolution)}
+        if self.paused:
+            # the ended chunk settles the pause returned before, which goes on in the new chunk
+            speech_dict['pause'] = self._timestamp(self.temp_end + self.speech_pad_samples - window_size_samples,
+                                                   return_seconds, time_resolution)
+        return speech_dict
+
+
+def iter_chunks(tss: List[dict],
+                wav,
+                seconds: bool = False,
+                sampling_rate: int = None,
+                drop: bool = False):
+    """Views of the audio chunks of a longer audio clip, in order, without copying
+
+    Yields wav[start:end] for every chunk of tss, or with drop=True the audio before,
+    between and after them. wav can be anything sliced into views: a torch.Tensor, a
+    numpy array, or a np.memmap of a file too long to load. Coordinates are samples,
+    or seconds with seconds=True (then sampling_rate is required).
+    """
+    if seconds and not sampling_rate:
+        raise ValueError('sampling_rate must be provided when seconds is True')
+
+    _tss = _seconds_to_samples_tss(tss, sampling_rate) if seconds else tss
+
+    if not drop:
+        for i in _tss:
+            yield wav[i['start']:i['end']]
+        return
+
+    cur_start = 0
+    for i in _tss:
+        yield wav[cur_start:i['start']]
+        cur_start = i['end']
+    yield wav[cur_start:]
+
+
+def _copy_chunks(chunks, out):
+    """Copy chunks one after the other into out, returns the filled part of out"""
+    position = 0
+    for chunk in chunks:
+        out[position:position + len(chunk)] = chunk
+        position += len(chunk)
+    return out[:position]
 
 
 def collect_chunks(tss: List[dict],
                    wav: torch.Tensor,
                    seconds: bool = False,
-                   sampling_rate: int = None) -> torch.Tensor:
+                   sampling_rate: int = None,
+                   out=None) -> torch.Tensor:
     """Collect audio chunks from a longer audio clip
 
     This method extracts audio chunks from an audio clip, using a list of
@@ -536,12 +1811,16 @@ def collect_chunks(tss: List[dict],
         Whether input coordinates are passed as seconds or samples.
     sampling_rate: int (default - None)
         Input audio sampling rate. Required if seconds is True.
+    out: torch.Tensor or np.ndarray (default - None)
+        Buffer to write the chunks to (e.g. a np.memmap of an output file), as
+        long as the collected audio at least. Then wav can also be a numpy array
+        and nothing else is allocated, see iter_chunks and save_chunks.
 
     Returns
     -------
     torch.Tensor, one dimensional
         One dimensional float torch.Tensor of the concatenated clipped audio
-        chunks.
+        chunks (the filled part of out if given).
 
     Raises
     ------
@@ -549,22 +1828,17 @@ def collect_chunks(tss: List[dict],
         Raised if sampling_rate is not provided when seconds is True.
 
     """
-    if seconds and not sampling_rate:
-        raise ValueError('sampling_rate must be provided when seconds is True')
-
-    chunks = list()
-    _tss = _seconds_to_samples_tss(tss, sampling_rate) if seconds else tss
-
-    for i in _tss:
-        chunks.append(wav[i['start']:i['end']])
-
-    return torch.cat(chunks)
+    chunks = iter_chunks(tss, wav, seconds, sampling_rate)
+    if out is not None:
+        return _copy_chunks(chunks, out)
+    return torch.cat(list(chunks))
 
 
 def drop_chunks(tss: List[dict],
                 wav: torch.Tensor,
                 seconds: bool = False,
-                sampling_rate: int = None) -> torch.Tensor:
+                sampling_rate: int = None,
+                out=None) -> torch.Tensor:
     """Drop audio chunks from a longer audio clip
 
     This method extracts audio chunks from an audio clip, using a list of
@@ -582,12 +1856,14 @@ def drop_chunks(tss: List[dict],
         Whether input coordinates are passed as seconds or samples.
     sampling_rate: int (default - None)
         Input audio sampling rate. Required if seconds is True.
+    out: torch.Tensor or np.ndarray (default - None)
+        Buffer to write the remaining audio to, as in collect_chunks.
 
     Returns
     -------
     torch.Tensor, one dimensional
         One dimensional float torch.Tensor of the input audio minus the dropped
-        chunks.
+        chunks (the filled part of out if given).
 
     Raises
     ------
@@ -595,25 +1871,47 @@ def drop_chunks(tss: List[dict],
         Raised if sampling_rate is not provided when seconds is True.
 
     """
-    if seconds and not sampling_rate:
-        raise ValueError('sampling_rate must be provided when seconds is True')
+    chunks = iter_chunks(tss, wav, seconds, sampling_rate, drop=True)
+    if out is not None:
+        return _copy_chunks(chunks, out)
+    return torch.cat(list(chunks))
 
-    chunks = list()
-    cur_start = 0
-
-    _tss = _seconds_to_samples_tss(tss, sampling_rate) if seconds else tss
-
-    for i in _tss:
-        chunks.append((wav[cur_start: i['start']]))
-        cur_start = i['end']
 
-    return torch.cat(chunks)
+def save_chunks(path: str,
+                tss: List[dict],
+                wav,
+                sampling_rate: int = 16000,
+                seconds: bool = False,
+                drop: bool = False,
+                piece_size: int = 1 << 16) -> int:
+    """Write the audio chunks of tss (or the audio without them if drop) to a 16 bit WAV file in one pass
+
+    Like save_audio(path, collect_chunks(...)) without the collected audio ever being in
+    memory: chunks are read from wav (float in [-1, 1], or int16 samples written as
+    they are, e.g. a np.memmap of the source file) and written piece_size samples at a
+    time. Returns the number of samples written.
+    """
+    import wave
+
+    written = 0
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sampling_rate)
+        for chunk in iter_chunks(tss, wav, seconds, sampling_rate, drop=drop):
+            for start in range(0, len(chunk), piece_size):
+                piece = np.asarray(chunk[start:start + piece_size])
+                if piece.dtype != np.int16:
+                    piece = np.clip(np.rint(piece * 32768), -32768, 32767).astype(np.int16)
+                f.writeframes(piece.astype('<i2', copy=False).tobytes())
+                written += len(piece)
+    return written
 
 
 def _seconds_to_samples_tss(tss: List[dict], sampling_rate: int) -> List[dict]:
     """Convert coordinates expressed in seconds to sample coordinates.
     """
     return [{
-        'start': round(crd['start']) * sampling_rate,
-        'end': round(crd['end']) * sampling_rate
-    } for crd in tss]
\ No newline at end of file
+        'start': round(crd['start'] * sampling_rate),
+        'end': round(crd['end'] * sampling_rate)
+    } for crd in tss]
@@ -0,0 +1,107 @@
+import logging
+import multiprocessing
+import multiprocessing.connection
+import signal
+import time
+
+logger = logging.getLogger(__name__)
+
+# A worker exiting sooner than this after its start counts as a crash loop
+MIN_UPTIME_S = 5.0
+MAX_RESTART_DELAY_S = 30.0
+
+
+class WorkerSupervisor:
+    """Runs `num_workers` copies of `target(*args, worker_index, readiness)` in worker processes and keeps them running
+
+    Workers are started with spawn, so each loads its own model and all they share with
+    the supervisor is `readiness`, one flag per worker that the worker sets while it
+    accepts connections. The supervisor clears the flag of a worker that exits, so any
+    worker can tell whether all of them are ready. A worker that exits is restarted,
+    with an exponential backoff while workers keep dying right after their start.
+
+    On SIGTERM or SIGINT the supervisor stops restarting, forwards SIGTERM to the workers
+    so they drain (stop accepting, let open sessions finish) and waits for them for up to
+    `drain_timeout` + `kill_grace` seconds before killing what is left.
+    """
+
+    def __init__(self, target, args, num_workers, drain_timeout=20.0, kill_grace=10.0):
+        self.target = target
+        self.args = args
+        self.num_workers = num_workers
+        self.drain_timeout = drain_timeout
+        self.kill_grace = kill_grace
+
+        self._context = multiprocessing.get_context('spawn')
+        self.readiness = self._context.RawArray('b', num_workers)
+        self._workers = {}   # slot -> (process, start time)
+        self._restart_at = {}  # slot -> time the slot's next worker may start
+        self._delays = {}    # slot -> current restart delay
+        self._stopping = False
+
+    def run(self):
+        previous = {sig: signal.signal(sig, self._request_stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            for slot in range(self.num_workers):
+                self._start(slot)
+            while not self._stopping:
+                self._wait_and_restart()
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            self._stop_workers()
+
+    def _request_stop(self, signum, frame):
+        if not self._stopping:
+            logger.info(f"Received {signal.Signals(signum).name}, draining workers")
+        self._stopping = True
+
+    def _start(self, slot):
+        process = self._context.Process(target=self.target, args=(*self.args, slot, self.readiness),
+                                        name=f'vad-worker-{slot}')
+        process.start()
+        self._workers[slot] = (process, time.monotonic())
+        logger.info(f"Started worker {slot} (pid {process.pid})")
+
+    def _wait_and_restart(self):
+        now = time.monotonic()
+        timeout = min([at - now for at in self._restart_at.values()], default=1.0)
+        sentinels = [process.sentinel for process, _ in self._workers.values()]
+        multiprocessing.connection.wait(sentinels, timeout=max(0.0, min(timeout, 1.0)))
+        if self._stopping:
+            return
+
+        now = time.monotonic()
+        for slot, (process, started) in list(self._workers.items()):
+            if process.is_alive():
+                continue
+            del self._workers[slot]
+            self.readiness[slot] = 0  # it may have died without clearing it
+            uptime = now - started
+            if uptime < MIN_UPTIME_S:
+                delay = min(2 * self._delays.get(slot, 0.5), MAX_RESTART_DELAY_S)
+            else:
+                delay = 0.0
+            self._delays[slot] = delay or 0.5
+            self._restart_at[slot] = now + delay
+            logger.warning(f"Worker {slot} (pid {process.pid}) exited with code {process.exitcode} "
+                           f"after {uptime:.1f}s, restarting in {delay:.1f}s")
+
+        for slot, at in list(self._restart_at.items()):
+            if at <= now:
+                del self._restart_at[slot]
+                self._start(slot)
+
+    def _stop_workers(self):
+        processes = [process for process, _ in self._workers.values() if process.is_alive()]
+        for process in processes:
+            process.terminate()  # SIGTERM, the worker drains its connections
+
+        deadline = time.monotonic() + self.drain_timeout + self.kill_grace
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Worker {process.name} (pid {process.pid}) didn't stop in time, killing it")
+                process.kill()
+                process.join()
+        logger.info("All workers stopped")
@@ -0,0 +1,99 @@
+"""Energy gate of idle VAD streams (EnergyGate)
+
+Run with `python -m pytest test_energy_gate.py` (or `python test_energy_gate.py`) from this directory.
+"""
+import numpy as np
+
+from energy_gate import EnergyGate
+
+FRAME_SIZE = 512
+FRAME_SECONDS = FRAME_SIZE / 16000
+
+rng = np.random.default_rng(0)
+
+
+def frames(db, count=1):
+    """`count` frames of noise at exactly `db` dBFS (RMS)"""
+    noise = rng.standard_normal((count, FRAME_SIZE))
+    noise *= 10 ** (db / 20) / np.sqrt(np.mean(noise ** 2, axis=1, keepdims=True))
+    return list(noise.astype(np.float32))
+
+
+def settled_gate(db=-60.0, **options):
+    gate = EnergyGate(FRAME_SECONDS, **options)
+    gate.leading_quiet_frames(frames(db, 50), in_speech=False)
+    return gate
+
+
+def test_skips_background_while_idle():
+    gate = EnergyGate(FRAME_SECONDS)
+    # nothing to compare the first frame with
+    assert gate.leading_quiet_frames(frames(-60), in_speech=False) == 0
+    assert gate.leading_quiet_frames(frames(-60, 10), in_speech=False) == 10
+    assert abs(gate.floor + 60) < 0.1
+    assert (gate.frames, gate.skipped_frames) == (11, 10)
+    assert gate.leading_quiet_frames([], in_speech=False) == 0
+
+
+def test_loud_frames_reach_the_model():
+    gate = settled_gate()
+    # less than margin_db above the floor is quiet, more isn't
+    assert gate.leading_quiet_frames(frames(-52), in_speech=False) == 1
+    assert gate.leading_quiet_frames(frames(-48), in_speech=False) == 0
+    # above max_db is never quiet, however loud the background is
+    loud = settled_gate(-40.0)
+    assert loud.leading_quiet_frames(frames(-40, 5), in_speech=False) == 0
+
+
+def test_only_leading_frames():
+    gate = settled_gate()
+    # the frames after one that needs the model may depend on its result
+    assert gate.leading_quiet_frames(frames(-60, 3) + frames(-20) + frames(-60, 3), in_speech=False) == 3
+
+
+def test_no_gating_in_speech():
+    gate = settled_gate()
+    assert gate.leading_quiet_frames(frames(-60, 10), in_speech=True) == 0
+    # the floor keeps adapting meanwhile
+    floor = gate.floor
+    gate.leading_quiet_frames(frames(-80, 10), in_speech=True)
+    assert gate.floor < floor - 10
+    assert gate.leading_quiet_frames(frames(-80, 3), in_speech=False) == 3
+
+
+def test_floor_adaptation():
+    gate = settled_gate()
+    # follows quieter frames down, smoothed by `fall`
+    gate.leading_quiet_frames(frames(-70), in_speech=False)
+    assert abs(gate.floor - (-60 + 0.2 * -10)) < 0.1
+    gate.leading_quiet_frames(frames(-70, 40), in_speech=False)
+    assert abs(gate.floor + 70) < 0.1
+    # a single dropout to digital silence only pulls it part of the way
+    gate.leading_quiet_frames([np.zeros(FRAME_SIZE, dtype=np.float32)], in_speech=False)
+    assert -90 < gate.floor < -70
+
+    # rises by at most rise_db_per_s towards louder background
+    gate = settled_gate(-70.0)
+    gate.leading_quiet_frames(frames(-55, 31), in_speech=False)  # about a second
+    assert abs(gate.floor - (-70 + 3.0 * 31 * FRAME_SECONDS)) < 0.1
+    # which it ends up skipping once it is within the margin
+    assert gate.leading_quiet_frames(frames(-55), in_speech=False) == 0
+    gate.leading_quiet_frames(frames(-55, 100), in_speech=False)
+    assert gate.leading_quiet_frames(frames(-55), in_speech=False) == 1
+
+
+def test_reset():
+    gate = settled_gate()
+    gate.reset()
+    assert gate.floor is None
+    assert gate.leading_quiet_frames(frames(-60), in_speech=False) == 0
+
+
+if __name__ == '__main__':
+    test_skips_background_while_idle()
+    test_loud_frames_reach_the_model()
+    test_only_leading_frames()
+    test_no_gating_in_speech()
+    test_floor_adaptation()
+    test_reset()
+    print('ok')
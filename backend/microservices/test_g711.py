@@ -0,0 +1,77 @@
+"""G.711 µ-law / A-law decoding of the VAD server input (g711)
+
+Run with `python -m pytest test_g711.py` (or `python test_g711.py`) from this directory.
+"""
+import warnings
+
+import numpy as np
+
+import g711
+from ring_buffer import INT16_SCALE
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        import audioop  # removed in Python 3.13
+except ImportError:
+    audioop = None
+
+CODES = np.arange(256, dtype=np.uint8)
+
+# (code, sample) of both ends and the zeros, as decoded by audioop
+KNOWN = {
+    'mulaw': [(0x00, -32124), (0x7F, 0), (0x80, 32124), (0xFF, 0), (0x0F, -16764), (0x70, -120)],
+    'alaw': [(0xD5, 8), (0x55, -8), (0x80, 5504), (0x00, -5504), (0x2A, -32256), (0xAA, 32256)],
+}
+
+
+def mulaw_reference(code):
+    """Sample of a µ-law code from its segment and step, as G.711 defines them (14 bit, scaled to 16)"""
+    code = ~code & 0xFF
+    segment, step = (code >> 4) & 0x07, code & 0x0F
+    magnitude = (2 * step + 33) * 2 ** segment - 33
+    return 4 * (-magnitude if code & 0x80 else magnitude)
+
+
+def alaw_reference(code):
+    """Sample of an A-law code from its segment and step, as G.711 defines them (13 bit, scaled to 16)"""
+    code ^= 0x55
+    segment, step = (code >> 4) & 0x07, code & 0x0F
+    magnitude = 2 * step + 1 if segment == 0 else (2 * step + 33) * 2 ** (segment - 1)
+    return 8 * (magnitude if code & 0x80 else -magnitude)
+
+
+def test_all_codes():
+    for encoding, reference in [('mulaw', mulaw_reference), ('alaw', alaw_reference)]:
+        decoded = g711.decode(CODES, encoding)
+        assert decoded.dtype == np.int16
+        assert decoded.tolist() == [reference(code) for code in range(256)]
+        for code, sample in KNOWN[encoding]:
+            assert decoded[code] == sample
+
+        # the sign bit mirrors the sample
+        assert np.array_equal(decoded[CODES ^ 0x80], -decoded)
+        # the float32 table is the int16 one scaled like PCMRingBuffer
+        assert np.array_equal(g711.FLOAT32_TABLES[encoding], (decoded * INT16_SCALE).astype(np.float32))
+
+
+def test_same_as_audioop():
+    if audioop is None:
+        print("audioop isn't available, skipped the comparison with it")
+        return
+    for encoding, decode in [('mulaw', audioop.ulaw2lin), ('alaw', audioop.alaw2lin)]:
+        expected = np.frombuffer(decode(CODES.tobytes(), 2), dtype='<i2')
+        assert np.array_equal(g711.decode(CODES, encoding), expected)
+
+
+def test_message():
+    codes = np.frombuffer(bytes([0xFF, 0x80, 0x00, 0x7F]), dtype=np.uint8)
+    assert g711.decode(codes, 'mulaw').tolist() == [0, 32124, -32124, 0]
+    assert [g711.bytes_per_sample(encoding) for encoding in g711.ENCODINGS] == [2, 1, 1]
+
+
+if __name__ == '__main__':
+    test_all_codes()
+    test_same_as_audioop()
+    test_message()
+    print('ok')
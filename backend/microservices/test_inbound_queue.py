@@ -0,0 +1,138 @@
+"""Per-connection inbound queue of the VAD server (InboundQueue)
+
+Run with `python -m pytest test_inbound_queue.py` (or `python test_inbound_queue.py`) from this directory.
+"""
+import asyncio
+
+from inbound_queue import AUDIO, COMMAND, GAP, InboundQueue
+
+
+def audio(num_samples, value=0):
+    return bytes([value]) * (2 * num_samples)
+
+
+async def drain(queue):
+    """(kind, payload) of everything queued"""
+    items = []
+    while queue._items:
+        kind, payload, _ = await queue.get()
+        items.append((kind, payload))
+    return items
+
+
+def test_block():
+    async def run():
+        queue = InboundQueue(100, 'block')
+        await queue.put(audio(60))
+        await queue.put('{"type": "stats"}')  # commands don't count
+        put = asyncio.create_task(queue.put(audio(60)))
+        await asyncio.sleep(0.01)
+        assert not put.done() and queue.queued_samples == 60
+
+        # room again once the handler takes a message, nothing was lost
+        kind, payload, _ = await queue.get()
+        assert (kind, payload) == (AUDIO, audio(60))
+        kind, payload, _ = await queue.get()
+        assert (kind, payload) == (COMMAND, '{"type": "stats"}')
+        await asyncio.wait_for(put, 1)
+        assert queue.queued_samples == 60 and queue.dropped_samples == 0
+
+        # a single message larger than the queue goes in once the queue is empty
+        big = asyncio.create_task(queue.put(audio(500)))
+        await asyncio.sleep(0.01)
+        assert not big.done()
+        await queue.get()
+        await asyncio.wait_for(big, 1)
+        assert queue.queued_samples == 500
+    asyncio.run(run())
+
+
+def test_drop_oldest():
+    async def run():
+        queue = InboundQueue(100, 'drop_oldest')
+        await queue.put(audio(40, 1))
+        await queue.put(audio(40, 2))
+        await queue.put('{"type": "reset"}')
+        await queue.put(audio(40, 3))
+        # never blocks: the oldest audio became a gap of its samples
+        assert queue.queued_samples == 80 and queue.dropped_samples == 40
+        await queue.put(audio(40, 4))
+        await queue.put(audio(150, 5))
+        # the newest message stays even though it doesn't fit, consecutive gaps are merged
+        # (not across commands, which stay in order)
+        assert queue.dropped_samples == 160 and queue.queued_samples == 150
+        assert await drain(queue) == [(GAP, 80), (COMMAND, '{"type": "reset"}'), (GAP, 80), (AUDIO, audio(150, 5))]
+        assert queue.queued_samples == 0
+    asyncio.run(run())
+
+
+def test_catch_up():
+    async def run():
+        queue = InboundQueue(200, 'catch_up')
+        for value in [1, 2, 3]:
+            await queue.put(audio(30, value))
+        await queue.put('{"type": "stats"}')
+        await queue.put(audio(30, 4))
+        first_received = queue._items[0][2]
+
+        # queued audio comes out joined up to the next command, with the first message's time
+        assert await queue.get() == (AUDIO, audio(30, 1) + audio(30, 2) + audio(30, 3), first_received)
+        assert queue.queued_samples == 30
+        assert await drain(queue) == [(COMMAND, '{"type": "stats"}'), (AUDIO, audio(30, 4))]
+
+        # blocks like block when full
+        await queue.put(audio(190))
+        put = asyncio.create_task(queue.put(audio(20)))
+        await asyncio.sleep(0.01)
+        assert not put.done() and queue.dropped_samples == 0
+        await queue.get()
+        await asyncio.wait_for(put, 1)
+    asyncio.run(run())
+
+
+def test_bytes_per_sample():
+    async def run():
+        queue = InboundQueue(100, 'drop_oldest', bytes_per_sample=1)
+        await queue.put(bytes(80))
+        await queue.put(bytes(80))
+        assert queue.queued_samples == 80 and queue.dropped_samples == 80
+        assert await drain(queue) == [(GAP, 80), (AUDIO, bytes(80))]
+    asyncio.run(run())
+
+
+def test_close():
+    async def run():
+        queue = InboundQueue(100, 'block')
+        await queue.put(audio(100))
+        put = asyncio.create_task(queue.put(audio(10)))
+        await asyncio.sleep(0.01)
+        queue.close()
+        # a blocked reader is released and get() returns None
+        await asyncio.wait_for(put, 1)
+        assert await queue.get() is None
+
+        empty = InboundQueue(100)
+        waiting = asyncio.create_task(empty.get())
+        await asyncio.sleep(0.01)
+        empty.close()
+        assert await asyncio.wait_for(waiting, 1) is None
+    asyncio.run(run())
+
+
+def test_unknown_policy():
+    try:
+        InboundQueue(100, 'drop_newest')
+    except ValueError:
+        pass
+    else:
+        assert False, "unknown policies are refused"
+
+
+if __name__ == '__main__':
+    test_block()
+    test_drop_oldest()
+    test_catch_up()
+    test_bytes_per_sample()
+    test_close()
+    test_unknown_policy()
+    print('ok')
@@ -0,0 +1,92 @@
+"""Streaming resampling of the VAD server input (PolyphaseResampler, StreamingResampler)
+
+Run with `python -m pytest test_resampler.py` (or `python test_resampler.py`) from this directory.
+"""
+import numpy as np
+
+from resampler import PolyphaseResampler
+from silero.utils_vad import StreamingResampler
+
+try:
+    from scipy.signal import resample_poly
+except ImportError:  # optional, only the reference comparison needs it
+    resample_poly = None
+
+RATES = [(8000, 16000), (48000, 16000), (44100, 16000), (16000, 8000)]
+
+
+def resample(resampler, audio, chunk_sizes=None):
+    """Output of `audio` fed in chunks of `chunk_sizes` (cycled, default: all at once), with the flush"""
+    chunks = [audio]
+    if chunk_sizes is not None:
+        bounds = np.cumsum(np.resize(chunk_sizes, len(audio)))
+        chunks = np.split(audio, bounds[bounds < len(audio)])
+    return np.concatenate([*(resampler.process(chunk) for chunk in chunks), resampler.flush()])
+
+
+def test_chunking_doesnt_change_output():
+    rng = np.random.default_rng(0)
+    for input_rate, output_rate in RATES:
+        audio = rng.uniform(-0.5, 0.5, input_rate // 2).astype(np.float32)
+        expected = resample(StreamingResampler(input_rate, output_rate), audio)
+        assert len(expected) == -(-len(audio) * output_rate // input_rate)
+        for chunk_sizes in [[1], [0, 7, 160], [480, 1, 2], rng.integers(0, 3000, 20)]:
+            output = resample(StreamingResampler(input_rate, output_rate), audio, chunk_sizes)
+            assert np.allclose(output, expected, atol=1e-6)
+
+        int16 = np.rint(audio * 32767).astype(np.int16)
+        expected = resample(PolyphaseResampler(input_rate, output_rate), int16)
+        for chunk_sizes in [[1], [0, 7, 160], [480, 1, 2]]:
+            output = resample(PolyphaseResampler(input_rate, output_rate), int16, chunk_sizes)
+            assert np.array_equal(output, expected)
+
+
+def test_phase_and_gain():
+    # a tone in the passband comes out at the same amplitude and phase, as if it had been
+    # sampled at the output rate (no filter delay)
+    for input_rate, output_rate in [(8000, 16000), (48000, 16000)]:
+        for frequency in [100, 440, 1000, 3000]:
+            t = np.arange(input_rate) / input_rate
+            output = resample(StreamingResampler(input_rate, output_rate),
+                              (0.5 * np.sin(2 * np.pi * frequency * t + 0.3)).astype(np.float32))
+
+            # least squares fit of a sine at the output rate, away from the edges where the
+            # input starts and ends abruptly
+            t = np.arange(len(output)) / output_rate
+            inner = slice(output_rate // 10, -output_rate // 10)
+            basis = np.stack([np.sin(2 * np.pi * frequency * t), np.cos(2 * np.pi * frequency * t)], axis=1)
+            (a, b), *_ = np.linalg.lstsq(basis[inner], output[inner], rcond=None)
+            assert abs(np.hypot(a, b) / 0.5 - 1) < 2e-3  # passband ripple of the filter
+            assert abs(np.arctan2(b, a) - 0.3) < 1e-4
+
+
+def test_same_as_resample_poly():
+    if resample_poly is None:
+        print("scipy isn't installed, skipped the comparison with scipy.signal.resample_poly")
+        return
+    rng = np.random.default_rng(1)
+    for input_rate, output_rate in RATES:
+        audio = rng.uniform(-0.5, 0.5, input_rate // 2).astype(np.float32)
+        expected = resample_poly(audio.astype(np.float64), output_rate, input_rate)
+        output = resample(StreamingResampler(input_rate, output_rate), audio, [1000])
+        assert len(output) == len(expected)
+        assert np.abs(output - expected).max() < 1e-5
+
+
+def test_skip():
+    # skipped input counts as silence on the output clock
+    rng = np.random.default_rng(2)
+    audio = (rng.standard_normal(4800) * 3000).astype(np.int16)
+    resampler = PolyphaseResampler(48000, 16000)
+    reference = PolyphaseResampler(48000, 16000)
+    assert np.array_equal(resampler.process(audio[:1000]), reference.process(audio[:1000]))
+    assert resampler.skip(1000) == len(reference.process(np.zeros(1000, dtype=np.int16)))
+    assert np.array_equal(resampler.process(audio[2000:]), reference.process(audio[2000:]))
+
+
+if __name__ == '__main__':
+    test_chunking_doesnt_change_output()
+    test_phase_and_gain()
+    test_same_as_resample_poly()
+    test_skip()
+    print('ok')
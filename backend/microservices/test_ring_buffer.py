@@ -0,0 +1,94 @@
+"""Frame buffer of incoming PCM of the VAD server (PCMRingBuffer)
+
+Run with `python -m pytest test_ring_buffer.py` (or `python test_ring_buffer.py`) from this directory.
+"""
+import numpy as np
+
+from ring_buffer import INT16_SCALE, PCMRingBuffer
+
+FRAME_SIZE = 4
+
+
+def ramp(start, end):
+    return np.arange(start, end, dtype=np.int16)
+
+
+def read_frames(buffer):
+    return [frame.copy() for frame in buffer.frames()]
+
+
+def test_wraparound():
+    buffer = PCMRingBuffer(FRAME_SIZE, capacity_frames=3)
+    buffer.write(ramp(0, 10))
+    assert [frame.tolist() for frame in read_frames(buffer)] == \
+        [(ramp(0, 4) * INT16_SCALE).tolist(), (ramp(4, 8) * INT16_SCALE).tolist()]
+    assert len(buffer) == 2
+
+    # 2 samples left at the end of the buffer, the write wraps around to its start
+    buffer.write(ramp(10, 16))
+    assert len(buffer._buffer) == 3 * FRAME_SIZE
+    frames = list(buffer.frames())
+    # frames are views of the buffer, never split by its end
+    assert all(np.shares_memory(frame, buffer._buffer) for frame in frames)
+    assert np.array_equal(np.concatenate(frames), ramp(8, 16) * INT16_SCALE)
+    assert len(buffer) == 0
+
+
+def test_growth():
+    buffer = PCMRingBuffer(FRAME_SIZE, capacity_frames=2)
+    buffer.write(ramp(0, 7))
+    read_frames(buffer)
+    buffer.write(ramp(7, 10))  # unread samples wrap around now
+    assert buffer._read + len(buffer) > len(buffer._buffer)
+    # a write that doesn't fit grows the buffer, keeping the unread samples in order
+    buffer.write(ramp(10, 30))
+    assert len(buffer._buffer) > 2 * FRAME_SIZE and len(buffer._buffer) % FRAME_SIZE == 0
+    assert len(buffer) == 26
+    assert np.array_equal(np.concatenate(read_frames(buffer)), ramp(4, 28) * INT16_SCALE)
+    assert len(buffer) == 2
+    buffer.write(ramp(30, 32))
+    assert np.array_equal(np.concatenate(read_frames(buffer)), ramp(28, 32) * INT16_SCALE)
+
+
+def test_random_writes():
+    # any sequence of writes and reads hands out the written stream, frame by frame
+    rng = np.random.default_rng(0)
+    audio = rng.integers(-32768, 32768, 20000).astype(np.int16)
+    buffer = PCMRingBuffer(FRAME_SIZE, capacity_frames=8)
+    position, frames = 0, []
+    while position < len(audio):
+        size = int(rng.integers(0, 40))
+        buffer.write(audio[position:position + size])
+        position += size
+        if rng.random() < 0.7:
+            frames.extend(read_frames(buffer))
+    frames.extend(read_frames(buffer))
+    expected = audio[:len(audio) // FRAME_SIZE * FRAME_SIZE] * INT16_SCALE
+    assert np.array_equal(np.concatenate(frames), expected)
+
+
+def test_write_lookup():
+    table = (np.arange(256) - 128).astype(np.float32)
+    buffer = PCMRingBuffer(FRAME_SIZE, capacity_frames=2)
+    buffer.write_lookup(np.arange(6, dtype=np.uint8), table)
+    read_frames(buffer)
+    buffer.write_lookup(np.arange(6, 12, dtype=np.uint8), table)  # wraps around
+    assert np.array_equal(np.concatenate(read_frames(buffer)), table[4:12])
+
+
+def test_clear():
+    buffer = PCMRingBuffer(FRAME_SIZE, capacity_frames=2)
+    buffer.write(ramp(0, 7))
+    buffer.clear()
+    assert len(buffer) == 0 and read_frames(buffer) == []
+    buffer.write(ramp(7, 11))
+    assert np.array_equal(read_frames(buffer)[0], ramp(7, 11) * INT16_SCALE)
+
+
+if __name__ == '__main__':
+    test_wraparound()
+    test_growth()
+    test_random_writes()
+    test_write_lookup()
+    test_clear()
+    print('ok')
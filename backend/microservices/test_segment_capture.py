@@ -0,0 +1,174 @@
+"""Segment audio capture of the VAD server (SegmentCapture)
+
+Run with `python -m pytest test_segment_capture.py` (or `python test_segment_capture.py`) from this directory.
+"""
+import numpy as np
+
+from segment_capture import SegmentCapture
+
+# every sample is its position (mod 30000), so captured audio shows where it was cut from
+AUDIO = (np.arange(100000) % 30000).astype(np.int16)
+
+
+def feed(capture, start, end, processed=None):
+    """Write AUDIO[start:end] and release as if the VAD had processed up to `processed` (default: end)"""
+    capture.write(AUDIO[start:end])
+    capture.release(end if processed is None else processed)
+
+
+def test_end_mode():
+    capture = SegmentCapture('end', max_samples=10000, pre_roll=1000)
+    feed(capture, 0, 5000)
+    # the padded start lies in the pre-roll
+    capture.start_segment(4500)
+    feed(capture, 5000, 8000)
+    start, audio, truncated = capture.end_segment(7500)
+    assert start == 4500 and np.array_equal(audio, AUDIO[4500:7500]) and not truncated
+    assert capture.segment_start is None
+
+
+def test_end_mode_pauses():
+    capture = SegmentCapture('end', max_samples=10000, pre_roll=1000)
+    feed(capture, 0, 1000)
+    capture.start_segment(500)
+    # every pause hands out the audio since the previous piece, the end the rest
+    pieces = []
+    for position in range(1000, 9000, 1000):
+        feed(capture, position, position + 1000)
+        pieces.append(capture.peek_segment(position + 500)[:2])
+    pieces.append(capture.end_segment(8800)[:2])
+    for (start, audio), (next_start, _) in zip(pieces, pieces[1:]):
+        assert start + len(audio) == next_start
+    assert pieces[0][0] == 500 and np.array_equal(np.concatenate([audio for _, audio in pieces]), AUDIO[500:8800])
+
+
+def test_end_mode_split_before_pause():
+    capture = SegmentCapture('end', max_samples=10000, pre_roll=1000)
+    feed(capture, 0, 3000)
+    capture.start_segment(2200)
+    assert capture.peek_segment(2500)[0] == 2200
+    feed(capture, 3000, 4000)
+    # split at an earlier pause, after the pause piece went out: nothing is left of the
+    # segment, the next one continues after the audio handed out
+    start, audio, _ = capture.end_segment(2400)
+    assert start == 2400 and len(audio) == 0
+    capture.start_segment(2450)
+    start, audio, _ = capture.end_segment(3800)
+    assert start == 2500 and np.array_equal(audio, AUDIO[2500:3800])
+
+
+def test_start_before_pre_roll():
+    capture = SegmentCapture('end', max_samples=10000, pre_roll=1000)
+    feed(capture, 0, 5000)
+    capture.start_segment(3000)
+    start, audio, truncated = capture.end_segment(5000)
+    assert start == 4000 and np.array_equal(audio, AUDIO[4000:5000]) and truncated
+
+
+def test_truncation():
+    capture = SegmentCapture('end', max_samples=2000, pre_roll=500)
+    feed(capture, 0, 1000)
+    capture.start_segment(1000)
+    for position in range(1000, 9000, 700):
+        feed(capture, position, position + 700)
+    start, audio, truncated = capture.end_segment(capture.end)
+    # the newest max_samples of the segment are kept
+    assert truncated and len(audio) == 2000
+    assert start == capture.end - 2000 and np.array_equal(audio, AUDIO[start:capture.end])
+    # the next segment starts untruncated
+    capture.start_segment(capture.end)
+    feed(capture, capture.end, capture.end + 100)
+    assert not capture.end_segment(capture.end)[2]
+
+
+def test_skip():
+    capture = SegmentCapture('end')
+    capture.start_segment(0)
+    feed(capture, 0, 100)
+    capture.skip(50)
+    capture.write(AUDIO[150:200])
+    _, audio, _ = capture.end_segment(200)
+    assert np.array_equal(audio, np.concatenate([AUDIO[:100], np.zeros(50, dtype=np.int16), AUDIO[150:200]]))
+
+
+def streamed_segments(capture, steps):
+    """Audio handed out per segment in 'stream' mode, for steps of (write up to, events)"""
+    segments = []
+    position = 0
+    for end, events in steps:
+        feed(capture, position, end)
+        position = end
+        for kind, sample in events:
+            if kind == 'start':
+                capture.start_segment(sample)
+                segments.append([None, []])
+            else:
+                start, audio, _ = capture.end_segment(sample)
+                assert start <= sample
+                segments[-1][1].append((start, audio))
+        streamed = capture.take_streamed()
+        if streamed:
+            segments[-1][1].append(streamed)
+    return [[(start, audio) for start, audio in pieces] for _, pieces in segments]
+
+
+def test_stream_mode():
+    capture = SegmentCapture('stream', max_samples=10000, pre_roll=1000)
+    pieces, = streamed_segments(capture, [(2000, [('start', 1500)]), (3000, []), (4000, [('end', 3800)])])
+    # consecutive pieces covering the segment, nothing handed out twice
+    assert pieces[0][0] == 1500
+    for (start, audio), (next_start, _) in zip(pieces, pieces[1:]):
+        assert start + len(audio) == next_start
+    assert np.array_equal(np.concatenate([audio for _, audio in pieces]), AUDIO[1500:3800])
+
+
+def test_stream_mode_split():
+    capture = SegmentCapture('stream', max_samples=10000, pre_roll=1000)
+    # split in a past pause: the first segment ends at 2500, after 3000 was handed out,
+    # the next one starts at 2800 and its audio begins after the handed out audio
+    first, second = streamed_segments(capture, [(1000, [('start', 500)]),
+                                                (3000, []),
+                                                (3500, [('end', 2500), ('start', 2800)]),
+                                                (4000, [('end', 3900)])])
+    assert np.array_equal(np.concatenate([audio for _, audio in first]), AUDIO[500:3000])
+    assert second[0][0] == 3000
+    assert np.array_equal(np.concatenate([audio for _, audio in second]), AUDIO[3000:3900])
+
+
+def test_stream_mode_segment_inside_handed_out_audio():
+    # a segment starting and ending before the audio already handed out is empty, with start <= end
+    capture = SegmentCapture('stream', max_samples=10000, pre_roll=1000)
+    first, second, third = streamed_segments(capture, [(1000, [('start', 0)]),
+                                                       (3000, []),
+                                                       (3500, [('end', 2000), ('start', 2200), ('end', 2600)]),
+                                                       (4000, [('start', 3600), ('end', 3900)])])
+    assert second == [(2600, second[0][1])] and len(second[0][1]) == 0
+    # handed out audio isn't lost or repeated by the empty segment
+    assert np.array_equal(np.concatenate([audio for _, audio in first]), AUDIO[0:3000])
+    assert third[0][0] == 3600 and np.array_equal(np.concatenate([audio for _, audio in third]), AUDIO[3600:3900])
+
+
+def test_reset():
+    capture = SegmentCapture('stream')
+    feed(capture, 0, 1000)
+    capture.start_segment(500)
+    capture.take_streamed()
+    capture.reset()
+    assert capture.end == 0 and capture.segment_start is None and capture.take_streamed() is None
+    capture.start_segment(0)
+    feed(capture, 0, 100)
+    assert capture.take_streamed()[0] == 0
+
+
+if __name__ == '__main__':
+    test_end_mode()
+    test_end_mode_pauses()
+    test_end_mode_split_before_pause()
+    test_start_before_pre_roll()
+    test_truncation()
+    test_skip()
+    test_stream_mode()
+    test_stream_mode_split()
+    test_stream_mode_segment_inside_handed_out_audio()
+    test_reset()
+    print('ok')
@@ -0,0 +1,121 @@
+"""Wire formats of the VAD server (vad_protocol)
+
+Run with `python -m pytest test_vad_protocol.py` (or `python test_vad_protocol.py`) from this directory.
+"""
+import numpy as np
+
+from vad_protocol import (AUDIO_START, EVENT_RECORD, EVENT_TYPES, HEADER, KIND_AUDIO, KIND_EVENTS, KIND_PROBS,
+                          LEGACY_PROTOCOL, PROBS_START, VERSION, Protocol, ProbabilityStream, ProtocolError,
+                          encode_audio, encode_events, parse_protocol)
+
+EVENT_NAMES = {code: name for name, code in EVENT_TYPES.items()}
+
+
+def parse_message(message):
+    """(kind, count, body) of a binary message"""
+    version, kind, count = HEADER.unpack_from(message)
+    assert version == VERSION
+    return kind, count, message[HEADER.size:]
+
+
+def parse_events(message):
+    kind, count, body = parse_message(message)
+    assert kind == KIND_EVENTS and len(body) == count * EVENT_RECORD.size
+    return [(EVENT_NAMES[code], frame, sample) for code, frame, sample in EVENT_RECORD.iter_unpack(body)]
+
+
+def parse_probs(message):
+    kind, count, body = parse_message(message)
+    assert kind == KIND_PROBS
+    first_frame, = PROBS_START.unpack_from(body)
+    probs = np.frombuffer(body[PROBS_START.size:], dtype='<f2')
+    assert len(probs) == count
+    return first_frame, probs
+
+
+def test_parse_protocol():
+    assert parse_protocol('/') == Protocol(False, 0, None, False, 16000, 'pcm16') == LEGACY_PROTOCOL
+    assert parse_protocol('/?capture=end') != LEGACY_PROTOCOL
+    assert parse_protocol(None) == parse_protocol('/')
+    assert parse_protocol('/?protocol=binary&probs=4&capture=stream&pauses=1&rate=8000&encoding=alaw') == \
+        Protocol(True, 4, 'stream', True, 8000, 'alaw')
+    # the last value of a repeated parameter wins
+    assert parse_protocol('/?rate=8000&rate=48000').input_rate == 48000
+
+    for query in ['protocol=xml', 'protocol=binary&probs=x', 'protocol=binary&probs=5000', 'probs=4',
+                  'capture=all', 'pauses=yes', 'rate=fast', 'rate=4000', 'rate=200000', 'encoding=opus']:
+        try:
+            parse_protocol('/?' + query)
+        except ProtocolError:
+            pass
+        else:
+            assert False, f"{query} is refused"
+
+
+def test_events_round_trip():
+    events = [
+        {'type': 'speech_start', 'frame': 3, 'sample': 1024},
+        {'type': 'speech_pause', 'frame': 40, 'sample': 20000},
+        {'type': 'speech_resume', 'frame': 42, 'sample': 21000},
+        {'type': 'speech_end', 'frame': 2**32 - 1, 'sample': 2**40},
+    ]
+    # results without a speech event type aren't encoded
+    message = encode_events([{'speech_probability': 0.9, 'frame': 1, 'sample': 0}, *events])
+    assert parse_events(message) == [(e['type'], e['frame'], e['sample']) for e in events]
+    assert encode_events([]) is None
+    assert encode_events([{'speech_probability': 0.1, 'frame': 1, 'sample': 0}]) is None
+
+
+def test_audio_round_trip():
+    audio = np.array([0, 1, -1, 32767, -32768], dtype=np.int16)
+    for final in [False, True]:
+        for truncated in [False, True]:
+            kind, flags, body = parse_message(encode_audio(123456789012, audio, final, truncated))
+            assert kind == KIND_AUDIO and flags == final | truncated << 1
+            start, num_samples = AUDIO_START.unpack_from(body)
+            assert start == 123456789012 and num_samples == len(audio)
+            assert np.array_equal(np.frombuffer(body[AUDIO_START.size:], dtype='<i2'), audio)
+
+    _, _, body = parse_message(encode_audio(0, np.zeros(0, dtype=np.int16)))
+    assert AUDIO_START.unpack(body) == (0, 0)
+
+
+def test_probability_stream():
+    rng = np.random.default_rng(0)
+    probs = rng.uniform(0, 1, 50).astype(np.float32)
+    stream = ProbabilityStream(4)
+    messages = []
+    frame = 0
+    for size in [1, 3, 0, 7, 2, 9, 11, 17]:
+        messages.extend(stream.add(frame, probs[frame:frame + size]))
+        frame += size
+    messages.append(stream.flush())
+    assert stream.flush() is None
+
+    # full messages of 4 frames, then the rest, covering every frame once and in order
+    parsed = [parse_probs(message) for message in messages]
+    assert [len(p) for _, p in parsed] == [4] * 12 + [2]
+    assert [first for first, _ in parsed] == list(range(0, 50, 4))
+    assert np.array_equal(np.concatenate([p for _, p in parsed]), probs.astype(np.float16))
+
+
+def test_probability_stream_not_contiguous():
+    stream = ProbabilityStream(4)
+    assert stream.add(0, [0.1, 0.2]) == []
+    # frames skipped (e.g. audio dropped): what is pending goes out first
+    messages = stream.add(10, [0.3, 0.4, 0.5, 0.6])
+    assert [(first, p.tolist()) for first, p in map(parse_probs, messages)] == \
+        [(0, [np.float16(0.1), np.float16(0.2)]), (10, [np.float16(p) for p in [0.3, 0.4, 0.5, 0.6]])]
+    # after a reset, frames count from 0 again
+    stream.add(2, [0.7])
+    assert parse_probs(stream.add(0, [0.8])[0])[0] == 2
+    assert parse_probs(stream.flush())[0] == 0
+
+
+if __name__ == '__main__':
+    test_parse_protocol()
+    test_events_round_trip()
+    test_audio_round_trip()
+    test_probability_stream()
+    test_probability_stream_not_contiguous()
+    print('ok')
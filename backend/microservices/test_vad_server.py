@@ -0,0 +1,90 @@
+"""Per-connection detection of the VAD server (VADHandler)
+
+Run with `python -m pytest test_vad_server.py` (or `python test_vad_server.py`) from this directory.
+"""
+import asyncio
+from http import HTTPStatus
+
+import numpy as np
+
+import vad_server
+from segment_capture import SegmentCapture
+from vad_server import VADHandler
+
+FRAME = 512
+
+
+class ScriptedStream:
+    """Stand-in model stream returning `prob` for every frame it runs"""
+
+    sampling_rate = 16000
+
+    def __init__(self, prob=1.0):
+        self.prob = prob
+
+    def __call__(self, x, sr):
+        return np.array([[self.prob]], dtype=np.float32)
+
+    def reset_states(self):
+        pass
+
+    def skip(self, x):
+        pass
+
+
+def speech(num_frames):
+    return np.ones(num_frames * FRAME, dtype=np.int16).tobytes()
+
+
+def events(results):
+    return [(result['type'], result['sample']) for result in results]
+
+
+def test_gap_ends_speech():
+    handler = VADHandler(ScriptedStream(), capture=SegmentCapture('end'))
+    assert events(handler.process_audio(speech(10))) == [('speech_start', 0)]
+
+    # a second of audio dropped while speaking reads as silence: the segment ends in the gap,
+    # where the silence began (plus the padding)
+    results = handler.skip(16000)
+    assert events(results) == [('speech_end', 10 * FRAME + 480)]
+    assert handler.frames_processed == 10 + 31 and handler.speech_probs == []
+    (start, audio, final, _), = handler.captured_audio
+    assert final and start == 0 and len(audio) == 10 * FRAME + 480
+
+    # speech after the gap starts a new segment on the stream clock (31 frames and 128 samples later)
+    assert events(handler.process_audio(speech(10))) == [('speech_start', 41 * FRAME - 480)]
+
+
+def test_gap_without_speech():
+    handler = VADHandler(ScriptedStream(0.0))
+    assert handler.process_audio(speech(3)) == []
+    assert handler.skip(10 * FRAME + 100) == []
+    assert handler.frames_processed == 13 and handler.vad_iterator.current_sample == 13 * FRAME
+    assert len(handler.audio_buffer) == 100
+
+
+def test_ready_across_workers():
+    def probe():
+        status, _, _ = asyncio.run(vad_server.process_request(vad_server.READY_PATH, {}))
+        return status
+
+    try:
+        vad_server.server_ready = True
+        assert probe() == HTTPStatus.OK
+        # with --workers, whichever process answers reports whether all of them are ready
+        vad_server.worker_readiness = [1, 0]
+        assert probe() == HTTPStatus.SERVICE_UNAVAILABLE
+        vad_server.worker_readiness = [1, 1]
+        assert probe() == HTTPStatus.OK
+        vad_server.server_ready = False
+        assert probe() == HTTPStatus.SERVICE_UNAVAILABLE
+    finally:
+        vad_server.server_ready, vad_server.worker_readiness = False, None
+
+
+if __name__ == '__main__':
+    test_gap_ends_speech()
+    test_gap_without_speech()
+    test_ready_across_workers()
+    print('ok')
@@ -0,0 +1,207 @@
+"""Wire formats of VAD results sent to clients
+
+The format is negotiated with query parameters of the websocket URL:
+
+    ws://host:8765/                              JSON text events (default)
+    ws://host:8765/?protocol=binary              binary events
+    ws://host:8765/?protocol=binary&probs=4      binary events + speech probability stream,
+                                                 4 frames per message
+    ws://host:8765/?capture=end                  JSON events + the audio of every speech segment
+                                                 (capture=stream: streamed while speech goes on)
+    ws://host:8765/?pauses=1                     also speculative speech_pause / speech_resume events
+    ws://host:8765/?rate=48000                   input audio at 48kHz (default 16000)
+    ws://host:8765/?rate=8000&encoding=mulaw     G.711 µ-law input (alaw: A-law, default pcm16)
+
+Input audio is mono, 16-bit little-endian PCM or 8-bit G.711 codes (one byte per sample,
+half the bandwidth, usually at 8kHz). It is processed at the stream rate: 8kHz input runs
+natively on the model's 8kHz path (256 sample frames), any other rate is resampled to
+16kHz (512 sample frames). Event samples, frames and captured audio are on the stream rate
+clock, connection_ready carries it as `sample_rate` next to the input `rate`.
+
+Control messages (connection_ready, reset_ack, errors) are always JSON text frames,
+connection_ready echoes the negotiated format so clients can check it.
+
+Results produced from one inbound audio message go out in one websocket message: a JSON
+array of events, or the binary messages below back to back. Only the default format
+(no query parameters) sends a single event as a bare JSON object, as it always has.
+
+Binary messages are little-endian and start with a 4 byte header:
+
+    u8 version (1) | u8 kind | u16 count
+
+kind 1, events: `count` records of 16 bytes
+
+    u8 type | 3 bytes padding | u32 frame | u64 sample
+
+    type   1 = speech_start, 2 = speech_end, 3 = speech_pause, 4 = speech_resume
+    frame  index of the frame whose probability triggered the event (0 based, reset by `reset`)
+    sample sample index of the (padded) speech start / end in the stream, at the stream rate
+
+With pauses=1, speech_pause is sent on the first silent frame in speech, with the sample
+speech_end will have if the silence goes on for the min silence duration. It is followed
+either by that speech_end, or by speech_resume (sample where speech went on) if speech
+comes back before, which cancels it.
+
+kind 2, speech probabilities: u32 index of the first frame, then `count` float16
+probabilities of consecutive frames (frame n covers samples [n * 512, (n + 1) * 512), or
+[n * 256, (n + 1) * 256) at 8kHz). Probabilities short of a full message are sent on
+`reset` and when the server ends the connection, clients wanting all of them send a reset
+before closing.
+
+kind 3, captured audio (with either protocol, always a binary message): u64 sample index
+of the first sample and u32 number of samples, then the int16 samples. `count` holds flags:
+bit 0 set on the record that ends the segment, bit 1 when more of the segment than the
+capture window was waiting to be sent and the oldest of it is missing. It comes before the events of the same
+inbound message (with JSON events, as a separate binary frame sent first).
+The audio of a segment comes as consecutive records, each one starting where the previous
+one ended: clients join them in order, up to the record with bit 0 set.
+With capture=end there is one record per segment, [speech_start sample, speech_end sample),
+sent just before speech_end. With pauses=1 a record that doesn't end the segment also comes
+just before every speech_pause, with the audio since the previous record up to the
+speech_pause sample, so clients can start on the segment so far early. The final record
+then only holds the rest of the segment (empty when it ends at that pause).
+With capture=stream consecutive records carry the audio from the speech_start sample on
+as it arrives, the final one ends at the speech_end sample.
+Audio handed out before the final record may run past the speech_end sample (a segment
+split at an earlier pause), clients cut it off there.
+"""
+import struct
+from collections import namedtuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from g711 import ENCODINGS
+from segment_capture import CAPTURE_MODES
+
+VERSION = 1
+
+KIND_EVENTS = 1
+KIND_PROBS = 2
+KIND_AUDIO = 3
+
+AUDIO_FINAL = 1
+AUDIO_TRUNCATED = 2
+
+EVENT_TYPES = {'speech_start': 1, 'speech_end': 2, 'speech_pause': 3, 'speech_resume': 4}
+
+HEADER = struct.Struct('<BBH')
+EVENT_RECORD = struct.Struct('<BxxxIQ')
+PROBS_START = struct.Struct('<I')
+AUDIO_START = struct.Struct('<QI')
+
+MAX_PROBS_PER_MESSAGE = 1024
+
+MIN_INPUT_RATE = 8000
+MAX_INPUT_RATE = 192000
+
+# Format negotiated by a connection, see parse_protocol
+Protocol = namedtuple('Protocol', ['binary', 'probs_per_message', 'capture', 'pauses', 'input_rate', 'encoding'])
+
+# Format of connections without query parameters, which keeps the original JSON results
+LEGACY_PROTOCOL = Protocol(False, 0, None, False, 16000, 'pcm16')
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def parse_protocol(path):
+    """Protocol negotiated in the query string of the connection path
+
+    probs_per_message is 0 when the client didn't ask for the probability stream, capture
+    is None unless the client asked for segment audio.
+    """
+    query = parse_qs(urlparse(path or '/').query)
+    protocol = query.get('protocol', ['json'])[-1]
+    if protocol not in ('json', 'binary'):
+        raise ProtocolError(f"Unknown protocol {protocol!r}, expected 'json' or 'binary'")
+
+    probs = query.get('probs', ['0'])[-1]
+    try:
+        probs_per_message = int(probs)
+    except ValueError:
+        raise ProtocolError(f"Invalid probs {probs!r}, expected a number of frames per message")
+    if not 0 <= probs_per_message <= MAX_PROBS_PER_MESSAGE:
+        raise ProtocolError(f"probs must be between 0 and {MAX_PROBS_PER_MESSAGE}")
+    if probs_per_message and protocol != 'binary':
+        raise ProtocolError("The probability stream needs protocol=binary")
+
+    capture = query.get('capture', [None])[-1]
+    if capture is not None and capture not in CAPTURE_MODES:
+        raise ProtocolError(f"Unknown capture {capture!r}, expected one of {CAPTURE_MODES}")
+
+    pauses = query.get('pauses', ['0'])[-1]
+    if pauses not in ('0', '1'):
+        raise ProtocolError(f"Invalid pauses {pauses!r}, expected 0 or 1")
+
+    rate = query.get('rate', ['16000'])[-1]
+    try:
+        input_rate = int(rate)
+    except ValueError:
+        raise ProtocolError(f"Invalid rate {rate!r}, expected a sample rate in Hz")
+    if not MIN_INPUT_RATE <= input_rate <= MAX_INPUT_RATE:
+        raise ProtocolError(f"rate must be between {MIN_INPUT_RATE} and {MAX_INPUT_RATE}")
+
+    encoding = query.get('encoding', ['pcm16'])[-1]
+    if encoding not in ENCODINGS:
+        raise ProtocolError(f"Unknown encoding {encoding!r}, expected one of {ENCODINGS}")
+
+    return Protocol(protocol == 'binary', probs_per_message, capture, pauses == '1', input_rate, encoding)
+
+
+def encode_events(events):
+    """One binary message with the speech events, None if there are none"""
+    records = [event for event in events if event.get('type') in EVENT_TYPES]
+    if not records:
+        return None
+    message = bytearray(HEADER.size + EVENT_RECORD.size * len(records))
+    HEADER.pack_into(message, 0, VERSION, KIND_EVENTS, len(records))
+    for i, event in enumerate(records):
+        EVENT_RECORD.pack_into(message, HEADER.size + i * EVENT_RECORD.size,
+                               EVENT_TYPES[event['type']], event['frame'], event['sample'])
+    return bytes(message)
+
+
+def encode_audio(start, audio, final=False, truncated=False):
+    """Binary message with captured int16 audio starting at stream sample `start`"""
+    flags = (AUDIO_FINAL if final else 0) | (AUDIO_TRUNCATED if truncated else 0)
+    return (HEADER.pack(VERSION, KIND_AUDIO, flags)
+            + AUDIO_START.pack(start, len(audio))
+            + audio.astype('<i2', copy=False).tobytes())
+
+
+class ProbabilityStream:
+    """Packs per-frame speech probabilities as float16, `frames_per_message` frames per message"""
+
+    def __init__(self, frames_per_message):
+        self.frames_per_message = frames_per_message
+        self._probs = np.empty(frames_per_message, dtype=np.float16)
+        self._count = 0
+        self._first_frame = 0
+
+    def add(self, first_frame, probs):
+        """Add the probabilities of consecutive frames, return the messages that got full"""
+        messages = []
+        if self._count and first_frame != self._first_frame + self._count:
+            # not contiguous with what is pending (stream was reset, or audio was dropped)
+            messages.append(self.flush())
+
+        for i, prob in enumerate(probs):
+            if not self._count:
+                self._first_frame = first_frame + i
+            self._probs[self._count] = prob
+            self._count += 1
+            if self._count == self.frames_per_message:
+                messages.append(self.flush())
+        return messages
+
+    def flush(self):
+        """Message with the pending probabilities, None if there are none"""
+        if not self._count:
+            return None
+        message = (HEADER.pack(VERSION, KIND_PROBS, self._count)
+                   + PROBS_START.pack(self._first_frame)
+                   + self._probs[:self._count].astype('<f2').tobytes())
+        self._count = 0
+        return message
@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+from silero.utils_vad import load_silero_vad_onnx
+
+logger = logging.getLogger(__name__)
+
+
+def forward_frames(model, frames, state):
+    """Run consecutive frames of one stream, returns (speech probabilities, updated state, seconds spent)"""
+    started = time.perf_counter()
+    probs = [model.forward_numpy(frame, state).item() for frame in frames]
+    return probs, state, time.perf_counter() - started
+
+
+def forward_batch(model, frames, states):
+    """Run one frame for each of many streams in a single batch, returns (speech probabilities, updated states, seconds spent)"""
+    started = time.perf_counter()
+    probs = model.forward_batch(frames, states).tolist()
+    return probs, states, time.perf_counter() - started
+
+
+# Model of a process pool worker, every worker process loads its own session
+_worker_model = None
+
+
+def _init_worker(model_path=None):
+    global _worker_model
+    _worker_model = load_silero_vad_onnx(model_path)
+
+
+def _forward_frames_in_worker(frames, state):
+    return forward_frames(_worker_model, frames, state)
+
+
+def _forward_batch_in_worker(frames, states):
+    return forward_batch(_worker_model, frames, states)
+
+
+class InferenceExecutor:
+    """Runs VAD inference on a bounded pool so the event loop only handles I/O
+
+    By default inference runs on a thread pool sharing the process-wide model
+    (onnxruntime releases the GIL during session.run). With `use_processes` every
+    worker process loads its own model and the small per-stream state is shipped
+    along with the frames and copied back afterwards.
+
+    Callers await each call before submitting the next frames of the same stream,
+    which keeps per-stream frame order.
+    """
+
+    def __init__(self, model, max_workers=1, use_processes=False, model_path=None):
+        self.model = model
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+
+        if use_processes:
+            # spawn, so workers don't inherit the listening socket and other server state
+            self.pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                            initargs=(model_path,), mp_context=multiprocessing.get_context('spawn'))
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='vad-inference')
+
+    async def infer_frames(self, stream, frames, record=True):
+        """Speech probabilities of consecutive frames of one NumpyOnnxStream
+
+        `record=False` keeps the run out of the inference metrics (warm-up).
+        """
+        loop = asyncio.get_running_loop()
+        if self.use_processes:
+            probs, stream.stream, elapsed = await loop.run_in_executor(
+                self.pool, _forward_frames_in_worker, frames, stream.stream)
+        else:
+            probs, _, elapsed = await loop.run_in_executor(
+                self.pool, forward_frames, self.model, frames, stream.stream)
+
+        if record:
+            # one session run per frame, recorded as len(frames) runs of the mean duration
+            metrics.INFERENCE_SECONDS.observe(elapsed / len(frames), len(frames))
+            metrics.FRAMES.inc(len(frames))
+        return probs
+
+    async def infer_batch(self, streams, frames, record=True):
+        """Speech probabilities of one frame per NumpyOnnxStream, computed in a single batch
+
+        `record=False` keeps the run out of the inference metrics (warm-up).
+        """
+        loop = asyncio.get_running_loop()
+        states = [stream.stream for stream in streams]
+        if self.use_processes:
+            probs, states, elapsed = await loop.run_in_executor(
+                self.pool, _forward_batch_in_worker, frames, states)
+            for stream, state in zip(streams, states):
+                stream.stream = state
+        else:
+            probs, _, elapsed = await loop.run_in_executor(
+                self.pool, forward_batch, self.model, frames, states)
+
+        if record:
+            metrics.INFERENCE_SECONDS.observe(elapsed)
+            metrics.BATCH_SIZE.observe(len(frames))
+            metrics.FRAMES.inc(len(frames))
+        return probs
+
+    async def warm_up(self, sampling_rate, num_frames=10, batch_size=1):
+        """Run a few inferences before taking traffic
+
+        Loads the model of process pool workers and triggers onnxruntime's first-run
+        initialization (also for the batched input shape when batch_size > 1). With a
+        process pool one warm-up is submitted per worker, which reaches every worker as
+        long as they are all idle. Warm-up runs aren't recorded in the metrics, their
+        first-run latencies would skew the inference histograms.
+        """
+        num_samples = 512 if sampling_rate == 16000 else 256
+        rng = np.random.default_rng(0)
+        frames = [(rng.standard_normal(num_samples) * 0.1).astype(np.float32) for _ in range(num_frames)]
+
+        runs = self.max_workers if self.use_processes else 1
+        await asyncio.gather(*[
+            self.infer_frames(self.model.new_numpy_stream(sampling_rate), frames, record=False) for _ in range(runs)
+        ])
+        if batch_size > 1:
+            await asyncio.gather(*[
+                self.infer_batch([self.model.new_numpy_stream(sampling_rate) for _ in range(batch_size)],
+                                 frames[:1] * batch_size, record=False)
+                for _ in range(runs)
+            ])
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class BatchScheduler:
+    """Micro-batches VAD inference across connections
+
+    Handlers submit one ready frame at a time for their stream and await its speech
+    probability. Pending frames from different streams are collected until either
+    `max_batch_size` frames are waiting or `max_wait_ms` has passed since the first
+    one arrived, then run through the InferenceExecutor in a single batched call.
+    Up to `executor.max_workers` batches are in flight at once.
+
+    A stream never has more than one frame in the same batch, so per-stream frame
+    order (and recurrent state) is preserved. Frames of streams at different sample
+    rates go to separate batches.
+    """
+
+    def __init__(self, executor, max_batch_size=32, max_wait_ms=2.0):
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._pending = []  # (stream, frame, future) in arrival order
+        self._has_work = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._slots = asyncio.Semaphore(executor.max_workers)
+        self._batches = set()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def infer(self, stream, frame):
+        """Queue one frame (float32 numpy array) of `stream`, return a future of its speech probability"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((stream, frame, future))
+        self._has_work.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_full.set()
+        return future
+
+    def _take_batch(self):
+        batch = []
+        deferred = []
+        seen = set()
+        sampling_rate = self._pending[0][0].sampling_rate if self._pending else None
+        for item in self._pending:
+            stream = item[0]
+            if len(batch) >= self.max_batch_size or id(stream) in seen or stream.sampling_rate != sampling_rate:
+                deferred.append(item)
+                continue
+            seen.add(id(stream))
+            batch.append(item)
+
+        self._pending = deferred
+        if not deferred:
+            self._has_work.clear()
+        if len(deferred) < self.max_batch_size:
+            self._batch_full.clear()
+        return batch
+
+    async def _run_batch(self, batch):
+        try:
+            streams = [stream for stream, _, _ in batch]
+            frames = [frame for _, frame, _ in batch]
+            try:
+                probs = await self.executor.infer_batch(streams, frames)
+            except Exception as e:
+                logger.error(f"Batched VAD inference failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, _, future), prob in zip(batch, probs):
+                if not future.done():
+                    future.set_result(prob)
+        finally:
+            self._slots.release()
+
+    async def _run(self):
+        while True:
+            await self._has_work.wait()
+            if len(self._pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            await self._slots.acquire()
+            task = asyncio.create_task(self._run_batch(self._take_batch()))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
@@ -1,12 +1,28 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
 import json
+import os
+import signal
+import socket
+import time
 import numpy as np
 import websockets
-import torch
 
-from silero_vad import load_silero_vad, VADIterator
+from silero.utils_vad import load_silero_vad_onnx, VADIterator
+import metrics
+from vad_scheduler import BatchScheduler, InferenceExecutor
+from supervisor import WorkerSupervisor
+from ring_buffer import PCMRingBuffer
+from inbound_queue import AUDIO, GAP, OVERFLOW_POLICIES, InboundQueue
+from segment_capture import SegmentCapture
+from resampler import PolyphaseResampler
+from energy_gate import EnergyGate
+import g711
+from vad_protocol import (LEGACY_PROTOCOL, ProbabilityStream, ProtocolError, encode_audio, encode_events,
+                          parse_protocol)
 from datetime import datetime
+from http import HTTPStatus
 import logging
 
 import sys
@@ -19,112 +35,317 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Constants
-SAMPLING_RATE = 16000  # Silero VAD expects 16kHz
+SAMPLING_RATE = 16000  # Silero VAD expects 16kHz (or 8kHz)
 CHUNK_SIZE = 512       # Must be exactly 512 samples for 16kHz (32ms)
+FRAME_SIZES = {8000: 256, 16000: CHUNK_SIZE}  # frame size of each rate the model runs at
 
-# torch.set_num_threads(1)
+# Single onnx session shared by all connections, loaded once in main().
+# Each connection only gets a lightweight stream handle (see OnnxWrapper.new_numpy_stream)
+shared_model = None
 
-def int2float(sound):
-    """Convert int16 audio to float32"""
-    abs_max = np.abs(sound).max()
-    sound = sound.astype('float32')
-    if abs_max > 0:
-        sound *= 1/32768
-    sound = sound.squeeze()
-    return sound
+# Bounded pool running all inference, so the event loop only handles I/O
+inference_executor = None
+
+# Cross-connection micro-batching of inference, enabled with --max-batch-size > 1
+batch_scheduler = None
+
+# Messages buffered by the websockets library itself, before the InboundQueue takes them
+WEBSOCKET_MAX_QUEUE = 4
+
+# Per-connection inbound queue, set from the command line in main()
+max_queued_frames = 64
+overflow_policy = 'block'
+
+# Longest speech segment (in seconds) kept for connections capturing segment audio, set in main()
+capture_max_s = 30.0
+
+# Speech segments longer than this are split at their best pause, set in main()
+max_speech_duration_s = float('inf')
+
+# Keyword arguments of the EnergyGate of every connection, None when gating is off (set in main())
+energy_gate_options = None
+
+# HTTP paths answered on the websocket port, for the orchestrator's probes and Prometheus
+HEALTH_PATH = '/healthz'
+READY_PATH = '/ready'
+METRICS_PATH = '/metrics'
+
+# Set once the model is loaded and warmed up, cleared again when shutting down
+server_ready = False
+
+# Ready flag of every server process of --workers, shared with the supervisor (None with a single process)
+worker_readiness = None
+
+# Seconds sessions still open after draining get to send what they hold back before they are closed
+DRAIN_FLUSH_TIMEOUT = 2.0
+
+# (InboundQueue, VADHandler) of every open connection, read when metrics are scraped and draining
+connections = set()
+
+def buffered_samples():
+    """Audio samples of every connection waiting in its inbound queue or partial frame buffer"""
+    return [queue.queued_samples + len(handler.audio_buffer) for queue, handler in connections]
+
+metrics.REGISTRY.register(metrics.Gauge(
+    'vad_buffered_samples', 'Audio samples buffered by all connections', lambda: sum(buffered_samples())))
+metrics.REGISTRY.register(metrics.Gauge(
+    'vad_max_buffered_samples_per_connection', 'Most audio samples buffered by a single connection',
+    lambda: max(buffered_samples(), default=0)))
 
 class VADHandler:
     """Handles VAD for a single WebSocket connection"""
     
-    def __init__(self, model, use_iterator=True):
+    def __init__(self, model, use_iterator=True, capture=None, pause_events=False, resampler=None,
+                 encoding='pcm16'):
         self.model = model
         self.use_iterator = True
+
+        # The stream runs at the model stream's rate, input at other rates goes through `resampler`
+        self.sampling_rate = model.sampling_rate
+        self.frame_size = FRAME_SIZES[self.sampling_rate]
+        self.resampler = resampler
+        self.encoding = encoding
+
+        # Skips inference for quiet frames while not in speech (see EnergyGate)
+        self.energy_gate = None
+        if energy_gate_options is not None:
+            self.energy_gate = EnergyGate(self.frame_size / self.sampling_rate, **energy_gate_options)
         
         if use_iterator:
-            self.vad_iterator = VADIterator(model, sampling_rate=SAMPLING_RATE)
+            self.vad_iterator = VADIterator(model, sampling_rate=self.sampling_rate,
+                                            max_speech_duration_s=max_speech_duration_s,
+                                            speech_pause_events=pause_events)
         
-        # Buffer for incomplete chunks
-        self.audio_buffer = np.array([], dtype=np.int16)
+        # Buffer for incomplete chunks, already converted to float32
+        self.audio_buffer = PCMRingBuffer(self.frame_size)
         
         # Track speaking state
         self.is_speaking = False
         self.speech_start_time = None
         self.speech_end_time = None
         self.chunk_counter = 0
+
+        # Frames run through the model, and the probabilities of the last processed message
+        self.frames_processed = 0
+        self.first_frame = 0
+        self.speech_probs = []
+
+        # Optional SegmentCapture, and the (start, int16 audio, final, truncated) it produced
+        # for the last processed message
+        self.capture = capture
+        self.captured_audio = []
     
     def process_audio(self, audio_bytes):
-        """Process audio bytes and return detection results"""
+        """Process audio bytes and return detection results (inference runs inline)"""
+        started = time.perf_counter()
+        chunks, gated_probs = self._gate(list(self._split_chunks(audio_bytes)))
+        speech_probs = [
+            self.model(chunk_float32, self.sampling_rate).item()
+            for chunk_float32 in chunks
+        ]
+        if speech_probs:
+            elapsed = time.perf_counter() - started
+            metrics.INFERENCE_SECONDS.observe(elapsed / len(speech_probs), len(speech_probs))
+            metrics.FRAMES.inc(len(speech_probs))
+        return self._handle_speech_probs(gated_probs + speech_probs)
 
-        # Convert bytes to int16 numpy array
-        audio_int16 = np.frombuffer(audio_bytes, dtype=np.int16)
-        
-        # Add to buffer
-        self.audio_buffer = np.concatenate([self.audio_buffer, audio_int16])
-        
-        results = []
-        
-        # Process all complete chunks in buffer
-        while len(self.audio_buffer) >= CHUNK_SIZE:
-            # Extract chunk
-            chunk_int16 = self.audio_buffer[:CHUNK_SIZE]
-            self.audio_buffer = self.audio_buffer[CHUNK_SIZE:]
-            
-            # Convert to float32
-            chunk_float32 = int2float(chunk_int16)
+    async def process_audio_async(self, audio_bytes, executor, scheduler=None):
+        """Process audio bytes with inference off the event loop, on the executor or the BatchScheduler"""
+        chunks, gated_probs = self._gate(list(self._split_chunks(audio_bytes)))
+        if not chunks:
+            return self._handle_speech_probs(gated_probs)
+
+        if scheduler:
+            speech_probs = [await scheduler.infer(self.model, chunk_float32) for chunk_float32 in chunks]
+        else:
+            speech_probs = await executor.infer_frames(self.model, chunks)
+
+        return self._handle_speech_probs(gated_probs + speech_probs)
+
+    def _gate(self, chunks):
+        """(chunks that need inference, speech probabilities of the leading chunks skipped by the energy gate)
 
+        Skipped chunks count as silence (probability 0) and only become the context of the
+        next inferred chunk, the model's recurrent state is held over them.
+        """
+        if not self.energy_gate:
+            return chunks, []
+        skip = self.energy_gate.leading_quiet_frames(chunks, self.vad_iterator.triggered)
+        if not skip:
+            return chunks, []
+        self.model.skip(chunks[skip - 1])
+        metrics.GATED_FRAMES.inc(skip)
+        return chunks[skip:], [0.0] * skip
+
+    def _split_chunks(self, audio_bytes):
+        """Buffer audio bytes and yield every complete frame as float32"""
+        if self.encoding != 'pcm16' and not self.resampler and not self.capture:
+            # nothing needs int16 samples, expand G.711 codes straight into the float32 buffer
+            self.audio_buffer.write_lookup(np.frombuffer(audio_bytes, dtype=np.uint8),
+                                           g711.FLOAT32_TABLES[self.encoding])
+        else:
+            if self.encoding != 'pcm16':
+                audio_int16 = g711.decode(np.frombuffer(audio_bytes, dtype=np.uint8), self.encoding)
+            else:
+                # Convert bytes to int16 numpy array and add to buffer
+                audio_int16 = np.frombuffer(audio_bytes, dtype=np.int16)
+            if self.resampler:
+                audio_int16 = self.resampler.process(audio_int16)
+            self.audio_buffer.write(audio_int16)
+            if self.capture:
+                self.capture.write(audio_int16)
+
+        # Process all complete chunks in buffer (zero-copy views, valid until the next write)
+        for chunk_float32 in self.audio_buffer.frames():
             self.chunk_counter += 1
             # print_chunk_analysis(chunk_float32, self.chunk_counter)
+
+            yield chunk_float32
+
+    def _handle_speech_probs(self, speech_probs):
+        """Turn the speech probabilities of consecutive chunks into detection results"""
+        self.first_frame = self.frames_processed
+        self.speech_probs = speech_probs
+        self.captured_audio = []
+        results = []
+        for speech_prob in speech_probs:
+            results.extend(self._handle_speech_prob(speech_prob))
+            self.frames_processed += 1
+
+        if self.capture and self.use_iterator:
+            if self.capture.mode == 'stream':
+                streamed = self.capture.take_streamed()
+                if streamed:
+                    self.captured_audio.append((*streamed, False, self.capture.truncated))
+            self.capture.release(self.vad_iterator.current_sample)
+        return results
+
+    def _handle_speech_prob(self, speech_prob):
+        """Turn the speech probability of the next chunk into detection results"""
+        results = []
+
+        if self.use_iterator:
+            # Use VADIterator for automatic speech segment detection
+            # Returns: {'start': timestamp}, {'end': timestamp}, {'end': timestamp, 'start': timestamp},
+            # {'pause': timestamp}, {'resume': timestamp} or None
+            speech_dict = self.vad_iterator.process_speech_prob(speech_prob, self.frame_size)
+
+            if speech_dict:
+                # VADIterator returns dict with 'start' and/or 'end' key (in samples),
+                # both when a segment longer than the max duration is split while speech goes on.
+                # With pause events, a speculative 'pause' is later confirmed by 'end' or
+                # cancelled by 'resume' (both may come together with a split, then a 'pause'
+                # still ongoing carries over to the new segment)
+                if 'resume' in speech_dict:
+                    results.append({
+                        'type': 'speech_resume',
+                        'ts': round(speech_dict['resume'] / self.sampling_rate, 1),
+                        'sample': speech_dict['resume'],
+                        'frame': self.frames_processed
+                    })
+
+                if 'end' in speech_dict:
+                    if self.capture:
+                        start, audio, truncated = self.capture.end_segment(speech_dict['end'])
+                        self.captured_audio.append((start, audio, True, truncated))
+                    metrics.SPEECH_SEGMENTS.inc()
+                    self.is_speaking = False
+                    self.speech_end_time = round(speech_dict['end'] / self.sampling_rate, 1)
+                    results.append({
+                        'type': 'speech_end',
+                        'ts': self.speech_end_time,
+                        'sample': speech_dict['end'],
+                        'frame': self.frames_processed
+                    })
+
+                if 'start' in speech_dict:
+                    if self.capture:
+                        self.capture.start_segment(speech_dict['start'])
+                    self.is_speaking = True
+                    self.speech_start_time = round(speech_dict['start'] / self.sampling_rate, 1)
+                    results.append({
+                        'type': 'speech_start',
+                        'ts': self.speech_start_time,
+                        'sample': speech_dict['start'],
+                        'frame': self.frames_processed
+                    })
+
+                if 'pause' in speech_dict:
+                    if self.capture and self.capture.mode == 'end':
+                        start, audio, truncated = self.capture.peek_segment(speech_dict['pause'])
+                        self.captured_audio.append((start, audio, False, truncated))
+                    results.append({
+                        'type': 'speech_pause',
+                        'ts': round(speech_dict['pause'] / self.sampling_rate, 1),
+                        'sample': speech_dict['pause'],
+                        'frame': self.frames_processed
+                    })
+        else:
+            # Simple threshold-based detection
+            was_speaking = self.is_speaking
+            self.is_speaking = speech_prob > 0.5
+
+            if speech_prob > 0.5:
+                print(f"Speech probability: {speech_prob}")
             
-            if self.use_iterator:
-                # Use VADIterator for automatic speech segment detection
-                # Returns: {'start': timestamp}, {'end': timestamp}, or None
-                speech_dict = self.vad_iterator(chunk_float32, return_seconds=True)
-
-                if speech_dict:
-                    # VADIterator returns dict with either 'start' or 'end' key
-                    if 'start' in speech_dict:
-                        self.is_speaking = True
-                        self.speech_start_time = speech_dict['start']
-                        results.append({
-                            'type': 'speech_start',
-                            'ts': self.speech_start_time
-                        })
-                    
-                    elif 'end' in speech_dict:
-                        self.is_speaking = False
-                        self.speech_end_time = speech_dict['end']
-                        results.append({
-                            'type': 'speech_end',
-                            'ts': self.speech_end_time
-                        })
-            else:
-                # Just get speech probability
-                speech_prob = self.model(torch.from_numpy(chunk_float32), SAMPLING_RATE).item()
-                
-                # Simple threshold-based detection
-                was_speaking = self.is_speaking
-                self.is_speaking = speech_prob > 0.5
-
-                if speech_prob > 0.5:
-                    print(f"Speech probability: {speech_prob}")
-                
-                # TODO: re check timestamp
-                result = {
-                    'speech_probability': speech_prob,
-                    'is_speaking': self.is_speaking,
-                    'timestamp': datetime.utcnow().isoformat()
-                }
-                
-                # Detect state changes
-                if not was_speaking and self.is_speaking:
-                    result['type'] = 'speech_start'
-                elif was_speaking and not self.is_speaking:
-                    result['type'] = 'speech_end'
-                
-                results.append(result)
+            # TODO: re check timestamp
+            result = {
+                'speech_probability': speech_prob,
+                'is_speaking': self.is_speaking,
+                'timestamp': datetime.utcnow().isoformat(),
+                'sample': self.frames_processed * self.frame_size,
+                'frame': self.frames_processed
+            }
+            
+            # Detect state changes
+            if not was_speaking and self.is_speaking:
+                result['type'] = 'speech_start'
+            elif was_speaking and not self.is_speaking:
+                result['type'] = 'speech_end'
+                metrics.SPEECH_SEGMENTS.inc()
+            
+            results.append(result)
         
         return results
     
+    def skip(self, num_samples):
+        """Advance the stream clock over `num_samples` of input audio dropped before reaching the handler,
+        returns the detection results of the gap
+
+        Whole frames are skipped without inference and read as silence (probability 0), so
+        speech going on when the audio was dropped ends in the gap like it would in silence.
+        The partially buffered frame is dropped along with them and the remainder is filled
+        with silence, so the next audio starts at its right position on the stream clock.
+        """
+        if self.resampler:
+            num_samples = self.resampler.skip(num_samples)
+        if self.capture:
+            self.capture.skip(num_samples)
+
+        num_samples += len(self.audio_buffer)
+        self.audio_buffer.clear()
+        frames, remainder = divmod(num_samples, self.frame_size)
+        if remainder:
+            self.audio_buffer.write(np.zeros(remainder, dtype=np.int16))
+
+        self.chunk_counter += frames
+        self.first_frame = self.frames_processed
+        self.speech_probs = []
+        self.captured_audio = []
+        results = []
+        if self.use_iterator:
+            # only a segment in progress needs to see the silence, past its end (or with none)
+            # the gap just moves the clock
+            while frames and self.vad_iterator.triggered:
+                results.extend(self._handle_speech_prob(0.0))
+                self.frames_processed += 1
+                frames -= 1
+            self.vad_iterator.current_sample += frames * self.frame_size
+            if self.capture:
+                self.capture.release(self.vad_iterator.current_sample)
+        self.frames_processed += frames
+        return results
+
     def reset(self):
         """Reset VAD state"""
         if self.use_iterator:
@@ -132,26 +353,55 @@ class VADHandler:
         else:
             self.model.reset_states()
         
-        self.audio_buffer = np.array([], dtype=np.int16)
+        self.audio_buffer.clear()
+        if self.resampler:
+            self.resampler.reset()
+        if self.energy_gate:
+            self.energy_gate.reset()
         self.is_speaking = False
         self.speech_start_time = None
         self.speech_end_time = None
+        self.frames_processed = 0
+        self.first_frame = 0
+        self.speech_probs = []
+        if self.capture:
+            self.capture.reset()
+        self.captured_audio = []
 
 async def handle_connection(websocket, path):
     """Handle a WebSocket connection"""
     logger.info(f"New connection from {websocket.remote_address} to path {path}")
 
-    # https://claude.ai/chat/bad966c7-854d-41c6-b593-95873cb296c6
-    # TODO: it seems to be possible to share the model across connections to reduce memory usage
-    # but we need to rewrite the ONNXWrapper, we'll leave it for future
-    new_vad_model = load_silero_vad(onnx=True)
+    # Result format negotiated in the query string (see vad_protocol)
+    try:
+        protocol = parse_protocol(path)
+    except ProtocolError as e:
+        logger.warning(f"Rejected connection from {websocket.remote_address}: {e}")
+        await websocket.send(json.dumps({
+            'error': str(e),
+            'timestamp': datetime.utcnow().isoformat()
+        }))
+        await websocket.close(code=1008, reason='invalid protocol')
+        return
+    binary = protocol.binary
+    legacy = protocol == LEGACY_PROTOCOL
+    prob_stream = ProbabilityStream(protocol.probs_per_message) if protocol.probs_per_message else None
+
+    # 8kHz input runs natively on the model's 8kHz path, any other rate is resampled to 16kHz
+    input_rate = protocol.input_rate
+    sampling_rate = 8000 if input_rate == 8000 and 8000 in shared_model.sample_rates else SAMPLING_RATE
 
-    # TODO: preload to trigger download
-    
     # Send immediate connection acknowledgment
     try:
         await websocket.send(json.dumps({
             'type': 'connection_ready',
+            'protocol': 'binary' if binary else 'json',
+            'probs': protocol.probs_per_message,
+            'capture': protocol.capture,
+            'pauses': protocol.pauses,
+            'rate': input_rate,
+            'sample_rate': sampling_rate,
+            'encoding': protocol.encoding,
             'timestamp': datetime.utcnow().isoformat()
         }))
         logger.info(f"Connection established successfully with {websocket.remote_address}")
@@ -161,29 +411,70 @@ async def handle_connection(websocket, path):
     
     # Create handler for this connection using the pre-loaded model
 
-    handler = VADHandler(new_vad_model, use_iterator=True)
+    capture = None
+    if protocol.capture:
+        capture = SegmentCapture(protocol.capture, max_samples=int(capture_max_s * sampling_rate),
+                                 pre_roll=sampling_rate)
+    resampler = PolyphaseResampler(input_rate, sampling_rate) if input_rate != sampling_rate else None
+    handler = VADHandler(shared_model.new_numpy_stream(sampling_rate), use_iterator=True,
+                         capture=capture, pause_events=protocol.pauses, resampler=resampler,
+                         encoding=protocol.encoding)
+
+    # Read the websocket into a bounded queue while the handler works through it
+    # (sized in input samples, the frames are at the stream rate)
+    queue = InboundQueue(max_queued_frames * FRAME_SIZES[sampling_rate] * input_rate // sampling_rate,
+                         overflow_policy, bytes_per_sample=g711.bytes_per_sample(protocol.encoding))
+    reader = asyncio.create_task(receive_messages(websocket, queue))
+    connections.add((queue, handler))
+    metrics.ACTIVE_CONNECTIONS.inc()
     
     try:
-        async for message in websocket:
-            if isinstance(message, bytes):
-                # Process audio chunk
-                results = handler.process_audio(message)
+        while (item := await queue.get()) is not None:
+            kind, payload, received = item
+            if kind in (AUDIO, GAP):
+                if kind == GAP:
+                    # audio dropped by the queue, skipped on the stream clock as silence
+                    results = handler.skip(payload)
+                else:
+                    # Process audio chunk
+                    results = await handler.process_audio_async(payload, inference_executor, batch_scheduler)
+
+                # Everything produced from one inbound message goes out in one outbound message
+                # (captured audio, always binary, goes out first)
+                audio = [encode_audio(*captured) for captured in handler.captured_audio]
+                if binary:
+                    messages = [*audio, encode_events(results)]
+                    if prob_stream:
+                        messages.extend(prob_stream.add(handler.first_frame, handler.speech_probs))
+                    messages = [m for m in messages if m]
+                    if messages:
+                        await websocket.send(b''.join(messages))
+                        metrics.EVENT_LATENCY_SECONDS.observe(time.perf_counter() - received)
+                    continue
+
+                if audio:
+                    await websocket.send(b''.join(audio))
+
+                # Send all results as a JSON array (a single one on its own in the legacy format)
+                if results:
+                    await websocket.send(json.dumps(results[0] if len(results) == 1 and legacy else results))
+                    metrics.EVENT_LATENCY_SECONDS.observe(time.perf_counter() - received)
 
-                # Send all results
+                # Log important events
                 for result in results:
-                    await websocket.send(json.dumps(result))
-                    
-                    # Log important events
                     if 'event' in result:
                         logger.info(f"Event: {result['event']}")
                         
-            elif isinstance(message, str):
+            else:
                 # Handle commands
                 try:
-                    logger.info(f"Received message: {message}")
-                    command = json.loads(message)
+                    logger.info(f"Received message: {payload}")
+                    command = json.loads(payload)
                     
                     if command.get('type') == 'reset':
+                        # probabilities still pending belong to the stream being reset
+                        if prob_stream:
+                            await send_pending_probs(websocket, prob_stream)
                         handler.reset()
                         await websocket.send(json.dumps({
                             'type': 'reset_ack',
@@ -191,6 +482,15 @@ async def handle_connection(websocket, path):
                         }))
                         logger.info("VAD state reset")
 
+                    elif command.get('type') == 'stats':
+                        await websocket.send(json.dumps({
+                            'type': 'stats',
+                            'queued_samples': queue.queued_samples,
+                            'dropped_samples': queue.dropped_samples,
+                            'send_buffer_bytes': send_buffer_size(websocket),
+                            'timestamp': datetime.utcnow().isoformat()
+                        }))
+
                 except json.JSONDecodeError:
                     await websocket.send(json.dumps({
                         'error': 'Invalid JSON command',
@@ -210,19 +510,253 @@ async def handle_connection(websocket, path):
         except:
             logger.error(f"Failed to send error message to client")
     finally:
+        reader.cancel()
+        # the stream's last probabilities, short of a full message, while the connection is
+        # still open (ended by the server, e.g. stopping). A client closing it gets none
+        if prob_stream:
+            try:
+                await send_pending_probs(websocket, prob_stream)
+            except websockets.exceptions.ConnectionClosed:
+                pass
+        connections.discard((queue, handler))
+        metrics.ACTIVE_CONNECTIONS.dec()
+        if queue.dropped_samples:
+            logger.warning(f"Dropped {queue.dropped_samples / input_rate:.1f}s of audio from "
+                           f"{websocket.remote_address} (inbound queue full)")
         handler.reset()
 
-async def main():
+async def send_pending_probs(websocket, prob_stream):
+    """Send the probabilities `prob_stream` holds back until its message is full"""
+    probs = prob_stream.flush()
+    if probs and websocket.open:
+        await websocket.send(probs)
+
+async def receive_messages(websocket, queue):
+    """Move incoming messages into the connection's InboundQueue until the connection closes"""
+    dropped = 0
+    try:
+        async for message in websocket:
+            await queue.put(message)
+            if queue.dropped_samples > dropped:
+                if not dropped:
+                    logger.warning(f"Inbound queue of {websocket.remote_address} is full, dropping the oldest audio")
+                metrics.DROPPED_SAMPLES.inc(queue.dropped_samples - dropped)
+                dropped = queue.dropped_samples
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        queue.close()
+
+def send_buffer_size(websocket):
+    """Bytes written to the connection but not sent yet"""
+    transport = websocket.transport
+    return transport.get_write_buffer_size() if transport else 0
+
+async def process_request(path, request_headers):
+    """Answer probes and metrics scrapes over plain HTTP, let everything else upgrade to websocket"""
+    if path == METRICS_PATH:
+        return HTTPStatus.OK, [('Content-Type', metrics.CONTENT_TYPE)], metrics.REGISTRY.render().encode()
+    if path == HEALTH_PATH:
+        return HTTPStatus.OK, [], b'ok\n'
+    if path == READY_PATH:
+        # with several server processes any one of them answers the probe, for all of them
+        if server_ready and (worker_readiness is None or all(worker_readiness)):
+            return HTTPStatus.OK, [], b'ready\n'
+        return HTTPStatus.SERVICE_UNAVAILABLE, [], b'not ready\n'
+    return None
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Silero VAD WebSocket server")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--model-path', default=None,
+                        help="Onnx model file (default: the one bundled with the silero-vad package)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Server processes sharing the port with SO_REUSEPORT, under a supervisor "
+                             "restarting dead ones (1 runs the server in this process), "
+                             "/ready answers ready once all of them are")
+    parser.add_argument('--drain-timeout', type=float, default=20.0,
+                        help="Seconds open sessions get to finish after SIGTERM")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Also serve /metrics on this port (worker i of --workers on port + i), "
+                             "it is always available on the websocket port")
+    parser.add_argument('--inference-workers', type=int, default=None,
+                        help="Size of the inference thread (or process) pool of each server process "
+                             "(default: cores / workers)")
+    parser.add_argument('--process-pool', action='store_true',
+                        help="Run inference in worker processes (one model each) instead of threads")
+    parser.add_argument('--max-batch-size', type=int, default=1,
+                        help="Max frames from different connections per inference call (1 disables batching)")
+    parser.add_argument('--max-batch-wait-ms', type=float, default=2.0,
+                        help="Max time a frame waits for a batch to fill up")
+    parser.add_argument('--max-queued-frames', type=int, default=64,
+                        help="Audio frames a connection may have waiting for inference (64 = ~2s)")
+    parser.add_argument('--overflow-policy', choices=OVERFLOW_POLICIES, default='block',
+                        help="What to do when a client sends faster than its audio is processed")
+    parser.add_argument('--capture-max-s', type=float, default=30.0,
+                        help="Longest speech segment audio kept for clients connecting with capture=...")
+    parser.add_argument('--max-speech-s', type=float, default=float('inf'),
+                        help="Split speech segments longer than this at their longest pause, so "
+                             "transcription of long utterances can start early (default: no limit)")
+    parser.add_argument('--energy-gate', action='store_true',
+                        help="Skip inference for quiet frames (relative to the stream's noise floor) "
+                             "while the stream is not in speech")
+    parser.add_argument('--energy-gate-margin-db', type=float, default=10.0,
+                        help="Frames less than this above the noise floor count as quiet")
+    parser.add_argument('--energy-gate-max-db', type=float, default=-45.0,
+                        help="Frames louder than this (dBFS) always go through the model")
+    parser.add_argument('--warmup-frames', type=int, default=10,
+                        help="Inferences run at startup, before accepting connections")
+    return parser
+
+def parse_args():
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        parser.error("--workers > 1 needs SO_REUSEPORT, which this platform doesn't support")
+    args.worker_index = 0  # set by run_worker in the processes of --workers
+    if args.inference_workers is None:
+        args.inference_workers = max(1, (os.cpu_count() or 1) // args.workers)
+    return args
+
+def configure_streams(args):
+    """Apply the per-connection options of `args` to the VADHandlers and queues created from now on"""
+    global max_queued_frames, overflow_policy, capture_max_s, max_speech_duration_s, energy_gate_options
+    max_queued_frames = args.max_queued_frames
+    overflow_policy = args.overflow_policy
+    capture_max_s = args.capture_max_s
+    max_speech_duration_s = args.max_speech_s
+    energy_gate_options = None
+    if args.energy_gate:
+        energy_gate_options = {'margin_db': args.energy_gate_margin_db, 'max_db': args.energy_gate_max_db}
+        logger.info(f"Energy gate: skipping frames less than {args.energy_gate_margin_db}dB over the noise floor "
+                    f"and below {args.energy_gate_max_db}dBFS while not in speech")
+    logger.info(f"Inbound queue: {max_queued_frames} frames per connection, overflow policy {overflow_policy}")
+
+async def main(args):
     """Main server function"""
-    host = "localhost"
-    port = 8765
+    global shared_model, inference_executor, batch_scheduler
+    host = args.host
+    port = args.port
     
     logger.info(f"Starting Silero VAD WebSocket server on ws://{host}:{port}")
-    logger.info(f"Expecting audio format: 16-bit PCM, {SAMPLING_RATE}Hz, mono")
+    logger.info(f"Expecting audio format: 16-bit PCM, {SAMPLING_RATE}Hz (or ?rate=... in the URL), mono")
     logger.info(f"Chunk size: {CHUNK_SIZE} samples ({CHUNK_SIZE/SAMPLING_RATE*1000:.1f}ms)")
+
+    configure_streams(args)
+
+    shared_model = load_silero_vad_onnx(args.model_path)
+    logger.info("Silero VAD onnx model loaded")
+
+    inference_executor = InferenceExecutor(shared_model,
+                                           max_workers=args.inference_workers,
+                                           use_processes=args.process_pool,
+                                           model_path=args.model_path)
+    logger.info(f"Inference pool: {args.inference_workers} {'processes' if args.process_pool else 'threads'}")
+
+    if args.max_batch_size > 1:
+        batch_scheduler = BatchScheduler(inference_executor,
+                                         max_batch_size=args.max_batch_size,
+                                         max_wait_ms=args.max_batch_wait_ms)
+        batch_scheduler.start()
+        logger.info(f"Batched inference: up to {args.max_batch_size} frames, {args.max_batch_wait_ms}ms max wait")
     
-    async with websockets.serve(handle_connection, host, port):
-        await asyncio.Future()  # Run forever
+    # Load and initialize everything before the first connection can come in
+    started = time.perf_counter()
+    for sampling_rate in shared_model.sample_rates:
+        await inference_executor.warm_up(sampling_rate, num_frames=args.warmup_frames,
+                                         batch_size=args.max_batch_size)
+    logger.info(f"Warm-up done in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    # Run until SIGTERM (or Ctrl+C), then drain and clean up the inference pool
+    stop = asyncio.get_running_loop().create_future()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set_result, None)
+
+    lag_monitor = asyncio.create_task(metrics.monitor_event_loop_lag(metrics.EVENT_LOOP_LAG_SECONDS,
+                                                                     metrics.EVENT_LOOP_LAG_LAST))
+    metrics_server = None
+    if args.metrics_port is not None:
+        # with several server processes a scrape of the shared port reaches any one of them
+        metrics_port = args.metrics_port + args.worker_index
+        metrics_server = await asyncio.start_server(serve_metrics, host, metrics_port)
+        logger.info(f"Metrics on http://{host}:{metrics_port}{METRICS_PATH}")
+
+    try:
+        # with several server processes, each one binds the port and the kernel spreads connections
+        async with websockets.serve(handle_connection, host, port, process_request=process_request,
+                                    max_queue=WEBSOCKET_MAX_QUEUE, reuse_port=args.workers > 1) as server:
+            set_ready(args, True)
+            logger.info(f"Ready, probes on http://{host}:{port}{HEALTH_PATH} and {READY_PATH}")
+            await stop
+            set_ready(args, False)
+            await drain(server, args.drain_timeout)
+    finally:
+        lag_monitor.cancel()
+        if metrics_server:
+            metrics_server.close()
+        if batch_scheduler:
+            await batch_scheduler.stop()
+        inference_executor.shutdown()
+
+def set_ready(args, ready):
+    """Mark this server process (not) ready for /ready, in the supervisor's flags too with --workers"""
+    global server_ready
+    server_ready = ready
+    if worker_readiness is not None:
+        worker_readiness[args.worker_index] = ready
+
+async def drain(server, timeout):
+    """Stop accepting connections and give the open ones up to `timeout` seconds to finish
+
+    Sessions still open afterwards stop taking audio and get a moment to send what they
+    hold back (e.g. pending probabilities) before they are closed (code 1001) when the
+    server closes.
+    """
+    server.server.close()
+    handlers = [websocket.handler_task for websocket in server.websockets]
+    if not handlers:
+        return
+    logger.info(f"Draining {len(handlers)} open connections (up to {timeout:.0f}s)")
+    _, pending = await asyncio.wait(handlers, timeout=timeout)
+    if pending:
+        logger.warning(f"Closing {len(pending)} connections still open after draining")
+        for queue, _ in connections:
+            queue.close()
+        await asyncio.wait(pending, timeout=DRAIN_FLUSH_TIMEOUT)
+
+async def serve_metrics(reader, writer):
+    """Minimal HTTP server of the dedicated metrics port"""
+    try:
+        request_line = await reader.readline()
+        while await reader.readline() not in (b'\r\n', b'\n', b''):
+            pass  # skip the headers
+        parts = request_line.split()
+        if len(parts) >= 2 and parts[1].decode() == METRICS_PATH:
+            status, content_type, body = HTTPStatus.OK, metrics.CONTENT_TYPE, metrics.REGISTRY.render().encode()
+        else:
+            status, content_type, body = HTTPStatus.NOT_FOUND, 'text/plain', b'not found\n'
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    finally:
+        writer.close()
+
+def run_worker(args, worker_index, readiness):
+    """Entry point of a server process started by the supervisor"""
+    global worker_readiness
+    # Ctrl+C reaches the whole process group, let the supervisor decide when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    args.worker_index = worker_index
+    worker_readiness = readiness
+    asyncio.run(main(args))
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args()
+    if args.workers > 1:
+        logger.info(f"Starting {args.workers} server processes")
+        WorkerSupervisor(run_worker, (args,), args.workers, drain_timeout=args.drain_timeout).run()
+    else:
+        asyncio.run(main(args))
\ No newline at end of file
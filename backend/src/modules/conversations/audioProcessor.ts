@@ -7,51 +7,60 @@ import { UsageControl } from "@/modules/usage/usageControl";
 interface IAudioMessage {
   type: 'speech_start' | 'speech_end'
   ts: number
+  // sample index in the stream (16kHz), exact unlike ts which is rounded to 0.1s
+  sample: number
 }
 
-const DEFAULT_CONTEXT_WORDS = 20
-
-class AudioBuffer {
-  private buffer: Buffer[] = []
-
-  // each chunk is 100ms, sampling rate is 16000
-  addChunk(chunk: Buffer) {
-    this.buffer.push(chunk)
-  }
+interface ISpeechSegment {
+  startSample: number
+  audio: Buffer
+}
 
-  // Given start and end ts, extract the audio buffer
-  extractAudio(startMs: number, endMs: number): ArrayBuffer {
-    const chunkDurationMs = 100; // Each chunk is 100ms
-    const startChunkIndex = Math.floor(startMs / chunkDurationMs);
-    const endChunkIndex = Math.floor(endMs / chunkDurationMs);
+interface IAudioRecord extends ISpeechSegment {
+  // set on the record that ends the segment
+  final: boolean
+}
 
-    // Extract chunks that cover the range
-    const relevantChunks: Buffer[] = [];
-    for (let i = startChunkIndex; i <= endChunkIndex && i < this.buffer.length; i++) {
-      relevantChunks.push(this.buffer[i]);
+const DEFAULT_CONTEXT_WORDS = 20
+const SAMPLES_PER_MS = 16
+
+// Captured segment audio record of the VAD server (see vad_protocol.py, kind 3):
+// u8 version | u8 kind | u16 flags | u64 start sample | u32 number of samples | int16 samples
+// The records of a segment follow each other, up to the final one
+const AUDIO_RECORD_KIND = 3
+const AUDIO_RECORD_HEADER_BYTES = 16
+const AUDIO_RECORD_FINAL = 1
+
+function parseAudioRecords(data: Buffer): IAudioRecord[] {
+  const records: IAudioRecord[] = []
+  let offset = 0
+  while (offset + AUDIO_RECORD_HEADER_BYTES <= data.length) {
+    const kind = data.readUInt8(offset + 1)
+    const flags = data.readUInt16LE(offset + 2)
+    if (kind !== AUDIO_RECORD_KIND) {
+      break
     }
-
-    // Concatenate all relevant chunks
-    const concatenatedBuffer = Buffer.concat(relevantChunks);
-
-    // Clone the buffer to prevent issues if original buffer is deleted later
-    const clonedArrayBuffer = concatenatedBuffer.buffer.slice(
-      concatenatedBuffer.byteOffset,
-      concatenatedBuffer.byteOffset + concatenatedBuffer.byteLength
-    );
-    
-    return clonedArrayBuffer;
+    const startSample = Number(data.readBigUInt64LE(offset + 4))
+    const numSamples = data.readUInt32LE(offset + 12)
+    const audioStart = offset + AUDIO_RECORD_HEADER_BYTES
+    records.push({
+      startSample,
+      audio: data.subarray(audioStart, audioStart + 2 * numSamples),
+      final: (flags & AUDIO_RECORD_FINAL) !== 0,
+    })
+    offset = audioStart + 2 * numSamples
   }
-
+  return records
 }
+
 export class AudioProcessor {
   private ws: WebSocket | null = null
   private sessionId: string
   private onTranscription: (event: SpeechEvent) => void
-  // TODO: clean up already processed buffers to reduce memory
-  private audioBuffer: AudioBuffer = new AudioBuffer()
-  private startTs: number = 0
-  private endTs: number = 0
+  // audio of the last speech segment, cut by the VAD server and sent right before speech_end
+  private lastSegment: ISpeechSegment | null = null
+  // records of the segment still going on, joined into lastSegment by its final record
+  private segmentRecords: IAudioRecord[] = []
   private transcriptionService: TranscriptionService
   private usageControl: UsageControl
 
@@ -69,16 +78,27 @@ export class AudioProcessor {
 
   async init () {
     return new Promise((resolve, reject) => {
-      this.ws = new WebSocket(`ws://${process.env.VAD_SERVER}/`)
+      // capture=end: the server sends the (padded) audio of every speech segment with speech_end
+      this.ws = new WebSocket(`ws://${process.env.VAD_SERVER}/?capture=end`)
 
       this.ws.on('open', () => {
         logger.info('Connected to VAD server for session', { sessionId: this.sessionId })
         resolve(true)
       })
 
-      this.ws.on('message', (data: Buffer) => {
-        const message: IAudioMessage = JSON.parse(data.toString())
-        this.handleMessage(message)
+      this.ws.on('message', (data: Buffer, isBinary: boolean) => {
+        if (isBinary) {
+          for (const record of parseAudioRecords(data)) {
+            this.addAudioRecord(record)
+          }
+          return
+        }
+
+        // events produced from the same audio chunk arrive together, as an array
+        const parsed: IAudioMessage | IAudioMessage[] = JSON.parse(data.toString())
+        for (const message of Array.isArray(parsed) ? parsed : [parsed]) {
+          this.handleMessage(message)
+        }
       })
 
       this.ws.on('error', (error) => {
@@ -92,18 +112,40 @@ export class AudioProcessor {
     this.ws?.close()
   }
 
+  addAudioRecord(record: IAudioRecord) {
+    this.segmentRecords.push(record)
+    if (!record.final) {
+      return
+    }
+    const records = this.segmentRecords
+    this.segmentRecords = []
+    // (concat copies, so the segment doesn't keep the websocket messages alive)
+    this.lastSegment = {
+      startSample: records[0].startSample,
+      audio: Buffer.concat(records.map(r => r.audio)),
+    }
+  }
+
   handleMessage(message: IAudioMessage) {
     if (message.type === 'speech_start') {
-      this.startTs = message.ts
       this.onTranscription({
         type: 'start-speech',
       })
     } else if (message.type === 'speech_end') {
-      this.endTs = message.ts
-      const speechSegment = this.audioBuffer.extractAudio(this.startTs * 1000, this.endTs * 1000)
-
-      // do not await this
-      this.transcriptionService.startTranscription(Buffer.from(speechSegment), this.startTs * 1000, this.endTs * 1000)
+      const segment = this.lastSegment
+      this.lastSegment = null
+      if (!segment) {
+        logger.error('No audio received for speech segment', { sessionId: this.sessionId, sample: message.sample })
+      } else {
+        // audio sent before the end may run past it
+        const audio = segment.audio.subarray(0, 2 * Math.max(0, message.sample - segment.startSample))
+        // do not await this
+        this.transcriptionService.startTranscription(
+          audio,
+          segment.startSample / SAMPLES_PER_MS,
+          message.sample / SAMPLES_PER_MS
+        )
+      }
 
       this.onTranscription({
         type: 'end-speech',
@@ -116,7 +158,6 @@ export class AudioProcessor {
       throw new Error('WebSock {et not ready')
     }
 
-    this.audioBuffer.addChunk(chunk)
     this.ws.send(chunk)
   }
 }